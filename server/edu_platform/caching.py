@@ -0,0 +1,177 @@
+"""
+Shared response/payload cache for hot read endpoints.
+
+Entries are keyed on a scope (view and action), the user and role, the host
+and the query string, plus the current generation of every tag the payload
+depends on ("lessons", "assignments", "student:<id>", ...). Writes never
+delete entries: they bump tag generations, which orphans every entry built
+from the old ones (orphans expire by TTL). Generations live in the default
+cache, so with a shared backend (Redis, file) a bump in one worker is seen
+by all of them.
+
+Model saves/deletes bump tags through the receivers connected by
+``connect_model_invalidation``; code that writes with bulk_create,
+bulk_update or queryset.update() must call ``bump_cache_tags`` itself.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+GENERATION_PREFIX = "cachetag:"
+ENTRY_PREFIX = "cached:"
+
+Tags = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+
+def cache_is_shared() -> bool:
+    """
+    True when the default cache is Redis: shared by every worker, with atomic
+    incr. State that must stay correct (not just fresh) only lives in the
+    cache then; the file and locmem caches cull entries and are per host or
+    per process.
+    """
+    return "redis" in settings.CACHES["default"]["BACKEND"].lower()
+
+
+def response_cache_seconds() -> int:
+    """0 disables response caching."""
+    return max(0, int(getattr(settings, "RESPONSE_CACHE_SECONDS", 300)))
+
+
+def tag_generations(tags: Iterable[str]) -> List:
+    tags = list(tags)
+    keys = [GENERATION_PREFIX + tag for tag in tags]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Start at a fresh value, so an entry built before an eviction cannot match again.
+        start = time.time_ns()
+        for key in missing:
+            cache.add(key, start, timeout=None)
+        found.update(cache.get_many(missing))
+    return [found.get(key) for key in keys]
+
+
+def _bump(tags: List[str]) -> None:
+    for tag in tags:
+        key = GENERATION_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_cache_tags(*tags: str) -> None:
+    """
+    Invalidate everything cached under these tags. Bumps now (for reads later
+    in this transaction) and again on commit, in case another worker cached
+    the pre-commit rows in between.
+    """
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def cache_key(scope: str, parts: Iterable, tags: Iterable[str]) -> str:
+    tags = list(tags)
+    raw = json.dumps([scope, list(parts), tags, tag_generations(tags)], default=str, separators=(",", ":"))
+    return ENTRY_PREFIX + scope + ":" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cached_payload(scope: str, parts: Iterable, tags: Iterable[str], compute: Callable, timeout: Optional[int] = None):
+    """compute() through the cache; a None result is not cached."""
+    timeout = response_cache_seconds() if timeout is None else timeout
+    if timeout <= 0:
+        return compute()
+    key = cache_key(scope, parts, tags)
+    payload = cache.get(key)
+    if payload is None:
+        payload = compute()
+        if payload is not None:
+            cache.set(key, payload, timeout)
+    return payload
+
+
+def request_cache_parts(request) -> list:
+    user = request.user
+    return [
+        request.get_host(),
+        getattr(user, "pk", None),
+        getattr(user, "role", None),
+        sorted(request.query_params.lists()),
+    ]
+
+
+def cache_response(tags: Tags, timeout: Optional[Union[int, Callable[[], int]]] = None):
+    """
+    Cache a DRF view method's 200 response data per user, role and query
+    string. ``tags`` is a list or ``callable(view, request) -> list``; the
+    timeout defaults to RESPONSE_CACHE_SECONDS.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            seconds = timeout() if callable(timeout) else timeout
+            seconds = response_cache_seconds() if seconds is None else seconds
+            if seconds <= 0:
+                return method(view, request, *args, **kwargs)
+            scope = f"{view.__class__.__name__}.{method.__name__}"
+            key = cache_key(
+                scope,
+                request_cache_parts(request) + [sorted(kwargs.items())],
+                tags(view, request) if callable(tags) else tags,
+            )
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, seconds)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _student_tag(instance) -> List[str]:
+    return [f"student:{instance.student_id}"]
+
+
+# model label -> tags, or callable(instance) -> tags, bumped on save and delete.
+MODEL_TAGS: Dict[str, Union[List[str], Callable]] = {
+    # Lesson titles appear in assignment, live session and trajectory payloads.
+    "lessons.Lesson": ["lessons", "assignments", "live_sessions"],
+    "lessons.Enrollment": ["lessons", "assignments"],
+    "lessons.Assignment": ["assignments"],
+    "lessons.AssignmentAssignee": ["assignments"],
+    # effective_assignment_type is read from the template.
+    "slide.SlideTemplate": ["assignments"],
+    "live.LiveSession": ["live_sessions"],
+    "users.StudentProfile": _student_tag,
+    "users.LearningTrajectoryNode": _student_tag,
+}
+
+
+def connect_model_invalidation() -> None:
+    for label, tags in MODEL_TAGS.items():
+        model = apps.get_model(label)
+
+        def receiver(sender, instance, _tags=tags, **kwargs):
+            bump_cache_tags(*(_tags(instance) if callable(_tags) else _tags))
+
+        uid = f"cache-tags:{label}"
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 import importlib.util
 from urllib.parse import urlparse
 
@@ -104,8 +105,33 @@ if dj_database_url and os.getenv("DATABASE_URL"):
         ssl_require=env_bool("DATABASE_SSL_REQUIRE", True),
     )
 
+# Shared cache (response cache tags, adaptive rule table, live deck snapshots).
+# redis://host:6379/0 in production, so every gunicorn worker sees the same entries;
+# file:///path shares a cache between local processes; locmem:// is per process.
+# Default: a file cache in the temp dir. It may cull entries and its incr is not
+# atomic, so live state stores only use the cache when it is Redis
+# (edu_platform.caching.cache_is_shared). Test runs get a private locmem cache
+# from TEST_RUNNER.
+CACHE_URL = os.getenv("CACHE_URL", "")
+if CACHE_URL.startswith("locmem://"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+elif CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": urlparse(CACHE_URL).path or os.path.join(tempfile.gettempdir(), "edu_platform_cache"),
+        }
+    }
+# Cached read endpoints (edu_platform.caching) keep entries this long; writes invalidate
+# them earlier through cache tags. 0 disables response caching.
+RESPONSE_CACHE_SECONDS = int(os.getenv("RESPONSE_CACHE_SECONDS", "300"))
+
 AUTH_USER_MODEL = 'users.User'
 
+TEST_RUNNER = "edu_platform.test_runner.TestRunner"
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -169,5 +195,57 @@ LOGGING = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Live push events (edu_platform.asgi, /ws/live/sessions/<id>/). Empty picks
+# live.events.RedisChannelLayer (pub/sub across workers) with a Redis CACHE_URL and
+# live.events.InProcessChannelLayer (sockets of the same process only) otherwise.
+LIVE_CHANNEL_LAYER = os.getenv("LIVE_CHANNEL_LAYER", "")
+
+# Live participant presence: heartbeats land in this store and reach
+# LiveParticipant.last_seen_at in one bulk UPDATE at most every N seconds.
+LIVE_PRESENCE_STORE = os.getenv("LIVE_PRESENCE_STORE", "live.presence.LocalPresenceStore")
+LIVE_PRESENCE_FLUSH_SECONDS = int(os.getenv("LIVE_PRESENCE_FLUSH_SECONDS", "10"))
+# Set when the site runs as one worker process: per-process live stores are
+# then the whole truth. With several workers and no Redis CACHE_URL, slide and
+# timer changes go straight to the LiveSession row instead.
+LIVE_SINGLE_PROCESS = env_bool("LIVE_SINGLE_PROCESS", False)
+# Hot state of active live sessions (slide, timer, answer counts). Empty picks
+# live.state.CacheLiveStateStore with a Redis CACHE_URL, LocalLiveStateStore
+# with LIVE_SINGLE_PROCESS, no store otherwise (live.state.get_live_state_store).
+# Rows are updated write-behind every N seconds and at session end.
+LIVE_STATE_STORE = os.getenv("LIVE_STATE_STORE", "")
+# Flush from a thread in each web process; turn off when
+# `python manage.py flush_live_state --loop` runs instead.
+LIVE_BACKGROUND_FLUSH = env_bool("LIVE_BACKGROUND_FLUSH", True)
+LIVE_STATE_FLUSH_SECONDS = int(os.getenv("LIVE_STATE_FLUSH_SECONDS", "10"))
+LIVE_STATE_TTL_SECONDS = int(os.getenv("LIVE_STATE_TTL_SECONDS", str(12 * 60 * 60)))
+# Live leaderboards are kept sorted in this store per process; a shared version
+# (Redis cache, or the LiveSession row without one) tells workers when to reload.
+LIVE_LEADERBOARD_STORE = os.getenv("LIVE_LEADERBOARD_STORE", "live.leaderboard.LocalLeaderboardStore")
+# GET /api/live/sessions/active/ is cached this long (timers and presence move on their own).
+LIVE_ACTIVE_SESSIONS_CACHE_SECONDS = int(os.getenv("LIVE_ACTIVE_SESSIONS_CACHE_SECONDS", "5"))
+
+# PPTX -> PDF preview conversions run on this many background threads per web process.
+# Set to 0 to leave the queue to `python manage.py process_pptx_conversions`.
+LIVE_PPTX_CONVERSION_WORKERS = int(os.getenv("LIVE_PPTX_CONVERSION_WORKERS", "2"))
+# host:port of `python manage.py run_office_server` (warm soffice instances).
+# Empty = spawn a fresh soffice per conversion.
+LIVE_OFFICE_SERVER = os.getenv("LIVE_OFFICE_SERVER", "")
+LIVE_OFFICE_JOB_TIMEOUT = int(os.getenv("LIVE_OFFICE_JOB_TIMEOUT", "120"))
+
+# DOCX quiz uploads larger than this are imported by a background job (slide.docx_import).
+SLIDE_DOCX_ASYNC_BYTES = int(os.getenv("SLIDE_DOCX_ASYNC_BYTES", str(2 * 1024 * 1024)))
+# In-process import threads; 0 = only `python manage.py process_docx_imports` runs them.
+SLIDE_DOCX_IMPORT_WORKERS = int(os.getenv("SLIDE_DOCX_IMPORT_WORKERS", "1"))
+# Compiled template answer keys kept per process (LRU, keyed by template id and version).
+SLIDE_ANSWER_KEY_CACHE_SIZE = int(os.getenv("SLIDE_ANSWER_KEY_CACHE_SIZE", "1024"))
+
+# Student profile recomputes triggered within this window are coalesced (lessons.recompute).
+# 0 = recompute inline in the request, as before.
+ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS = float(os.getenv("ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS", "5"))
+# In-process recompute threads; 0 = only `python manage.py process_profile_recomputes` runs them.
+ADAPTIVE_RECOMPUTE_WORKERS = int(os.getenv("ADAPTIVE_RECOMPUTE_WORKERS", "1"))
+# How long reads that need a fresh profile wait for a recompute already in progress.
+ADAPTIVE_RECOMPUTE_WAIT_SECONDS = float(os.getenv("ADAPTIVE_RECOMPUTE_WAIT_SECONDS", "5"))
+
 # Live PDF preview-ды iframe ішінде көрсету үшін (student live page)
 X_FRAME_OPTIONS = "SAMEORIGIN"
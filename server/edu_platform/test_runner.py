@@ -0,0 +1,25 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs tests against a private in-process cache whatever CACHE_URL says, so
+    no test run reads entries left behind by another one, as a single live
+    worker without the background flusher thread.
+    """
+
+    test_settings = {
+        "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        "LIVE_SINGLE_PROCESS": True,
+        "LIVE_BACKGROUND_FLUSH": False,
+    }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**self.test_settings)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
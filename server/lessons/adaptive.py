@@ -1,23 +1,20 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from datetime import timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDate
 from django.utils import timezone
 
+from edu_platform.caching import bump_cache_tags, cached_payload
 from lessons.models import Assignment, Enrollment, Reward, Submission as LessonSubmission
+from lessons.recompute import is_deferred, schedule_recompute, wait_for_recompute
+from lessons.rules import RuleLike, RuleTable, rule_table
 from slide.models import Submission as SlideSubmission
-from users.models import AdaptiveRule, LearningTrajectoryNode, StudentProfile, User
-
-
-@dataclass
-class RuleLike:
-    min_success_rate: float
-    max_success_rate: float
-    min_attempts: int
-    action: str
-    recommendation_template: str
+from users.models import LearningTrajectoryNode, StudentProfile, StudentTopicStat, User
 
 
 def _topic_from_lesson_title(topic: str, title: str) -> str:
@@ -45,62 +42,8 @@ def _safe_score(value: Any) -> Optional[float]:
     return max(0.0, min(score, 1.0))
 
 
-def _active_rules() -> List[RuleLike]:
-    db_rules = list(AdaptiveRule.objects.filter(is_active=True).order_by("min_success_rate", "id"))
-    if db_rules:
-        return [
-            RuleLike(
-                min_success_rate=r.min_success_rate,
-                max_success_rate=r.max_success_rate,
-                min_attempts=r.min_attempts,
-                action=r.action,
-                recommendation_template=r.recommendation_template,
-            )
-            for r in db_rules
-        ]
-
-    return [
-        RuleLike(
-            min_success_rate=0.0,
-            max_success_rate=0.55,
-            min_attempts=1,
-            action="decrease_difficulty",
-            recommendation_template="Базалық деңгейдегі тапсырмаларды қайталаңыз.",
-        ),
-        RuleLike(
-            min_success_rate=0.55,
-            max_success_rate=0.8,
-            min_attempts=2,
-            action="reinforce_topic",
-            recommendation_template="Әлсіз тақырыптарға қосымша жаттығу берілді.",
-        ),
-        RuleLike(
-            min_success_rate=0.8,
-            max_success_rate=1.01,
-            min_attempts=2,
-            action="increase_difficulty",
-            recommendation_template="Күрделірек тапсырмаға көшуге дайынсыз.",
-        ),
-    ]
-
-
-def _pick_rule(overall_score: float, attempts: int) -> RuleLike:
-    rules = _active_rules()
-    matching_by_score = [
-        rule
-        for rule in rules
-        if rule.min_success_rate <= overall_score < rule.max_success_rate
-    ]
-    if matching_by_score:
-        for rule in matching_by_score:
-            if attempts >= rule.min_attempts:
-                return rule
-        return matching_by_score[0]
-
-    for rule in rules:
-        if attempts >= rule.min_attempts and rule.min_success_rate <= overall_score < rule.max_success_rate:
-            return rule
-    return rules[0]
+def _pick_rule(overall_score: float, attempts: int, table: Optional[RuleTable] = None) -> RuleLike:
+    return (table or rule_table()).pick(overall_score, attempts)
 
 
 def _learning_level(average_score: float) -> str:
@@ -111,69 +54,92 @@ def _learning_level(average_score: float) -> str:
     return "beginner"
 
 
+def _lesson_submission_entry(student: User, submission: LessonSubmission) -> Dict[str, Any]:
+    lesson = submission.assignment.lesson
+    return {
+        "student_id": student.id,
+        "student_username": student.username,
+        "topic": _topic_from_lesson_title(lesson.topic, lesson.title),
+        "score": _safe_score(submission.score),
+        "duration_seconds": _safe_int(submission.duration_seconds),
+        "created_at": submission.submitted_at,
+        "source": "assignment_submission",
+    }
+
+
+def _slide_submission_entry(
+    student: User,
+    submission: SlideSubmission,
+    assignment: Optional[Assignment],
+) -> Dict[str, Any]:
+    topic = "General"
+    if assignment is not None:
+        topic = _topic_from_lesson_title(assignment.lesson.topic, assignment.lesson.title)
+    elif submission.slide_id and submission.slide and submission.slide.lesson_id:
+        lesson = submission.slide.lesson
+        topic = _topic_from_lesson_title(lesson.topic, lesson.title)
+    elif submission.template:
+        topic = submission.template.title
+
+    payload = submission.data if isinstance(submission.data, dict) else {}
+    return {
+        "student_id": student.id,
+        "student_username": student.username,
+        "topic": topic,
+        "score": _safe_score(submission.score),
+        "duration_seconds": _safe_int(submission.duration_seconds or payload.get("duration_seconds")),
+        "created_at": submission.created_at,
+        "source": "interactive_submission",
+    }
+
+
 def _collect_student_entries(student: User) -> List[Dict[str, Any]]:
-    entries: List[Dict[str, Any]] = []
-    assignment_by_template: Dict[int, Assignment] = {}
+    return _collect_entries_by_student([student])[student.id]
 
+
+def _collect_entries_by_student(students: List[User]) -> Dict[int, List[Dict[str, Any]]]:
+    """Every submission of each student as adaptive entries, with a fixed number of queries."""
+    by_id = {student.id: student for student in students}
+    entries: Dict[int, List[Dict[str, Any]]] = {student_id: [] for student_id in by_id}
+
+    students_by_lesson: Dict[int, List[int]] = defaultdict(list)
+    for student_id, lesson_id in Enrollment.objects.filter(student_id__in=by_id).values_list("student_id", "lesson_id"):
+        students_by_lesson[lesson_id].append(student_id)
+
+    # Per student: the first assignment (by id) of an enrolled lesson that points at each template.
+    assignment_by_template: Dict[int, Dict[int, Assignment]] = defaultdict(dict)
     enrolled_assignments = (
-        Assignment.objects.filter(lesson__enrollments__student=student)
+        Assignment.objects.filter(lesson_id__in=students_by_lesson, content_id__isnull=False)
         .select_related("lesson")
         .order_by("id")
     )
     for assignment in enrolled_assignments:
-        if assignment.content_id and assignment.content_id not in assignment_by_template:
-            assignment_by_template[assignment.content_id] = assignment
+        if not assignment.content_id:
+            continue
+        for student_id in students_by_lesson[assignment.lesson_id]:
+            assignment_by_template[student_id].setdefault(assignment.content_id, assignment)
 
     lesson_submissions = (
-        LessonSubmission.objects.filter(student=student)
+        LessonSubmission.objects.filter(student_id__in=by_id)
         .select_related("assignment__lesson")
         .order_by("submitted_at", "id")
     )
     for submission in lesson_submissions:
-        assignment = submission.assignment
-        lesson = assignment.lesson
-        entries.append(
-            {
-                "student_id": student.id,
-                "student_username": student.username,
-                "topic": _topic_from_lesson_title(lesson.topic, lesson.title),
-                "score": _safe_score(submission.score),
-                "duration_seconds": _safe_int(submission.duration_seconds),
-                "created_at": submission.submitted_at,
-                "source": "assignment_submission",
-            }
-        )
+        entries[submission.student_id].append(_lesson_submission_entry(by_id[submission.student_id], submission))
 
     slide_submissions = (
-        SlideSubmission.objects.filter(user=student)
+        SlideSubmission.objects.filter(user_id__in=by_id)
         .select_related("template", "slide__lesson")
         .order_by("created_at", "id")
     )
     for submission in slide_submissions:
-        topic = "General"
-        if submission.template_id and submission.template_id in assignment_by_template:
-            assignment = assignment_by_template[submission.template_id]
-            topic = _topic_from_lesson_title(assignment.lesson.topic, assignment.lesson.title)
-        elif submission.slide_id and submission.slide and submission.slide.lesson_id:
-            lesson = submission.slide.lesson
-            topic = _topic_from_lesson_title(lesson.topic, lesson.title)
-        elif submission.template:
-            topic = submission.template.title
+        assignments = assignment_by_template[submission.user_id]
+        assignment = assignments.get(submission.template_id) if submission.template_id else None
+        entries[submission.user_id].append(_slide_submission_entry(by_id[submission.user_id], submission, assignment))
 
-        payload = submission.data if isinstance(submission.data, dict) else {}
-        entries.append(
-            {
-                "student_id": student.id,
-                "student_username": student.username,
-                "topic": topic,
-                "score": _safe_score(submission.score),
-                "duration_seconds": _safe_int(submission.duration_seconds or payload.get("duration_seconds")),
-                "created_at": submission.created_at,
-                "source": "interactive_submission",
-            }
-        )
-
-    entries.sort(key=lambda item: (item.get("created_at") or timezone.now(), item.get("source", "")))
+    now = timezone.now()
+    for student_entries in entries.values():
+        student_entries.sort(key=lambda item: (item.get("created_at") or now, item.get("source", "")))
     return entries
 
 
@@ -203,126 +169,231 @@ def _topic_metrics(entries: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any
     return buckets
 
 
+_NODE_FIELDS = ["topic", "order_index", "mastery", "status", "recommendation", "unlocked_at", "completed_at"]
+
+
+def _advance_node(
+    node: LearningTrajectoryNode,
+    idx: int,
+    topic: str,
+    metric: Dict[str, Any],
+    prev_completed: bool,
+    now,
+) -> None:
+    """Set a trajectory node's position, mastery, status and recommendation from the topic metrics."""
+    attempts = int(metric.get("attempts", 0))
+    mastery = float(metric.get("avg_score", 0.0))
+    node.topic = topic
+    node.order_index = idx
+    node.mastery = mastery
+
+    can_access = idx == 1 or prev_completed
+    is_completed = attempts > 0 and mastery >= node.required_score
+    if is_completed:
+        node.status = "completed"
+        if node.completed_at is None:
+            node.completed_at = now
+    else:
+        node.completed_at = None
+        if not can_access:
+            node.status = "locked"
+        elif attempts == 0:
+            node.status = "unlocked"
+        elif mastery < 0.5:
+            node.status = "review"
+        else:
+            node.status = "in_progress"
+
+    if node.status in {"unlocked", "in_progress", "review", "completed"} and node.unlocked_at is None:
+        node.unlocked_at = now
+
+    if node.status == "locked":
+        node.recommendation = "Алдыңғы модульді аяқтағанда бұл тақырып ашылады."
+    elif node.status == "review":
+        node.recommendation = "Қайта қарау қажет: жеңіл тапсырмадан бастаңыз."
+    elif node.status == "in_progress":
+        node.recommendation = "Прогрессті арттыру үшін қосымша тапсырма орындаңыз."
+    elif node.status == "completed":
+        node.recommendation = "Модуль сәтті аяқталды."
+    else:
+        node.recommendation = "Модуль ашық, орындауды бастауға болады."
+
+
+def _serialize_node(node: LearningTrajectoryNode, lesson) -> Dict[str, Any]:
+    return {
+        "id": node.id,
+        "lesson": lesson.id,
+        "lesson_title": lesson.title,
+        "topic": node.topic,
+        "order_index": node.order_index,
+        "required_score": node.required_score,
+        "mastery": round(node.mastery, 4),
+        "status": node.status,
+        "recommendation": node.recommendation,
+        "unlocked_at": node.unlocked_at,
+        "completed_at": node.completed_at,
+    }
+
+
+def _trajectory_result(serialized_nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    completed = sum(1 for node in serialized_nodes if node["status"] == "completed")
+    total = len(serialized_nodes)
+    return {
+        "nodes": serialized_nodes,
+        "completion_rate": (completed / total * 100.0) if total else 0.0,
+    }
+
+
 def sync_learning_trajectory(student: User, topic_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-    enrollments = (
-        Enrollment.objects.filter(student=student)
+    return _sync_trajectories([student], {student.id: topic_stats})[student.id]
+
+
+def _sync_trajectories(
+    students: List[User],
+    stats_by_student: Dict[int, Dict[str, Dict[str, Any]]],
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Rebuild the trajectory of each student from their enrollments. Existing
+    nodes are read in one query; new nodes are bulk-created and only nodes
+    whose state changed are bulk-updated (and get a new updated_at).
+    """
+    student_ids = [student.id for student in students]
+    enrollments_by_student: Dict[int, list] = defaultdict(list)
+    for enrollment in (
+        Enrollment.objects.filter(student_id__in=student_ids)
         .select_related("lesson")
         .order_by("joined_at", "lesson_id")
-    )
-    lesson_ids = [en.lesson_id for en in enrollments]
-    LearningTrajectoryNode.objects.filter(student=student).exclude(lesson_id__in=lesson_ids).delete()
+    ):
+        enrollments_by_student[enrollment.student_id].append(enrollment)
+
+    existing: Dict[tuple, LearningTrajectoryNode] = {}
+    stale_ids: List[int] = []
+    enrolled = {(en.student_id, en.lesson_id) for ens in enrollments_by_student.values() for en in ens}
+    for node in LearningTrajectoryNode.objects.filter(student_id__in=student_ids):
+        key = (node.student_id, node.lesson_id)
+        if key in enrolled:
+            existing[key] = node
+        else:
+            stale_ids.append(node.id)
 
     now = timezone.now()
-    prev_completed = True
-    completed = 0
-    total = 0
-    serialized_nodes: List[Dict[str, Any]] = []
-
-    for idx, enrollment in enumerate(enrollments, start=1):
-        lesson = enrollment.lesson
-        topic = _topic_from_lesson_title(lesson.topic, lesson.title)
-        metric = topic_stats.get(topic, {})
-        attempts = int(metric.get("attempts", 0))
-        mastery = float(metric.get("avg_score", 0.0))
-
-        node, _ = LearningTrajectoryNode.objects.get_or_create(
-            student=student,
-            lesson=lesson,
-            defaults={
-                "topic": topic,
-                "order_index": idx,
-                "status": "unlocked" if idx == 1 else "locked",
-            },
-        )
-        node.topic = topic
-        node.order_index = idx
-        node.mastery = mastery
-
-        can_access = idx == 1 or prev_completed
-        is_completed = attempts > 0 and mastery >= node.required_score
-        if is_completed:
-            node.status = "completed"
-            if node.completed_at is None:
-                node.completed_at = now
-        else:
-            node.completed_at = None
-            if not can_access:
-                node.status = "locked"
-            elif attempts == 0:
-                node.status = "unlocked"
-            elif mastery < 0.5:
-                node.status = "review"
+    to_create: List[LearningTrajectoryNode] = []
+    to_update: List[LearningTrajectoryNode] = []
+    planned: Dict[int, list] = {}
+    for student_id in student_ids:
+        stats = stats_by_student.get(student_id, {})
+        prev_completed = True
+        planned[student_id] = []
+        for idx, enrollment in enumerate(enrollments_by_student[student_id], start=1):
+            lesson = enrollment.lesson
+            topic = _topic_from_lesson_title(lesson.topic, lesson.title)
+            node = existing.get((student_id, lesson.id))
+            if node is None:
+                node = LearningTrajectoryNode(student_id=student_id, lesson=lesson)
+                _advance_node(node, idx, topic, stats.get(topic, {}), prev_completed, now)
+                to_create.append(node)
             else:
-                node.status = "in_progress"
-
-        if node.status in {"unlocked", "in_progress", "review", "completed"} and node.unlocked_at is None:
-            node.unlocked_at = now
-
-        if node.status == "locked":
-            node.recommendation = "Алдыңғы модульді аяқтағанда бұл тақырып ашылады."
-        elif node.status == "review":
-            node.recommendation = "Қайта қарау қажет: жеңіл тапсырмадан бастаңыз."
-        elif node.status == "in_progress":
-            node.recommendation = "Прогрессті арттыру үшін қосымша тапсырма орындаңыз."
-        elif node.status == "completed":
-            node.recommendation = "Модуль сәтті аяқталды."
-        else:
-            node.recommendation = "Модуль ашық, орындауды бастауға болады."
-
-        node.save(
-            update_fields=[
-                "topic",
-                "order_index",
-                "mastery",
-                "status",
-                "recommendation",
-                "unlocked_at",
-                "completed_at",
-                "updated_at",
-            ]
-        )
+                before = [getattr(node, field) for field in _NODE_FIELDS]
+                _advance_node(node, idx, topic, stats.get(topic, {}), prev_completed, now)
+                if [getattr(node, field) for field in _NODE_FIELDS] != before:
+                    node.updated_at = now
+                    to_update.append(node)
+            prev_completed = node.status == "completed"
+            planned[student_id].append((node, lesson))
+
+    if stale_ids or to_create or to_update:
+        touched = {node.student_id for node in to_create + to_update}
+        with transaction.atomic():
+            if stale_ids:
+                LearningTrajectoryNode.objects.filter(id__in=stale_ids).delete()
+            if to_create:
+                LearningTrajectoryNode.objects.bulk_create(to_create, batch_size=500)
+            if to_update:
+                LearningTrajectoryNode.objects.bulk_update(to_update, [*_NODE_FIELDS, "updated_at"], batch_size=500)
+        # Stale deletes fire post_delete; bulk writes skip the signals that invalidate cached payloads.
+        bump_cache_tags(*(f"student:{student_id}" for student_id in touched))
 
-        total += 1
-        if node.status == "completed":
-            completed += 1
-        prev_completed = node.status == "completed"
+    return {
+        student_id: _trajectory_result([_serialize_node(node, lesson) for node, lesson in nodes])
+        for student_id, nodes in planned.items()
+    }
 
-        serialized_nodes.append(
-            {
-                "id": node.id,
-                "lesson": lesson.id,
-                "lesson_title": lesson.title,
-                "topic": node.topic,
-                "order_index": node.order_index,
-                "required_score": node.required_score,
-                "mastery": round(node.mastery, 4),
-                "status": node.status,
-                "recommendation": node.recommendation,
-                "unlocked_at": node.unlocked_at,
-                "completed_at": node.completed_at,
-            }
-        )
 
-    completion_rate = (completed / total * 100.0) if total else 0.0
+def _progress_point(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    created_at = entry.get("created_at")
+    if created_at is None or entry.get("score") is None:
+        return None
     return {
-        "nodes": serialized_nodes,
-        "completion_rate": completion_rate,
+        "date": created_at.date().isoformat(),
+        "topic": entry.get("topic", "General"),
+        "score": round(float(entry["score"]) * 100.0, 2),
     }
 
 
-def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
-    if getattr(student, "role", None) != "student":
-        return None
+def _stored_topic_metrics(student: User) -> Dict[str, Dict[str, Any]]:
+    stats: Dict[str, Dict[str, Any]] = {}
+    for row in StudentTopicStat.objects.filter(student=student):
+        if row.attempts <= 0:
+            continue
+        stats[row.topic] = {
+            "attempts": row.attempts,
+            "scored_attempts": row.scored_attempts,
+            "score_sum": row.score_sum,
+            "avg_score": (row.score_sum / row.scored_attempts) if row.scored_attempts > 0 else 0.0,
+            "total_time_seconds": row.total_time_seconds,
+        }
+    return stats
 
-    profile, _ = StudentProfile.objects.get_or_create(student=student)
-    entries = _collect_student_entries(student)
-    stats = _topic_metrics(entries)
 
-    scored_entries = [entry for entry in entries if entry.get("score") is not None]
-    scored_attempts = len(scored_entries)
-    score_sum = sum(float(entry["score"]) for entry in scored_entries)
+def _apply_entry(student: User, entry: Dict[str, Any], sign: int = 1) -> None:
+    _apply_entries(student, [entry], sign=sign)
+
+
+def _apply_entries(student: User, entries: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+    """Add (or with sign=-1 remove) entries to the stored aggregates with one UPDATE per topic."""
+    for topic, values in _topic_metrics(entries).items():
+        stat, _ = StudentTopicStat.objects.get_or_create(student=student, topic=topic)
+        StudentTopicStat.objects.filter(pk=stat.pk).update(
+            attempts=F("attempts") + sign * values["attempts"],
+            scored_attempts=F("scored_attempts") + sign * values["scored_attempts"],
+            score_sum=F("score_sum") + sign * values["score_sum"],
+            total_time_seconds=F("total_time_seconds") + sign * values["total_time_seconds"],
+            updated_at=timezone.now(),
+        )
+
+
+def _same_contribution(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return (
+        a["topic"] == b["topic"]
+        and a.get("score") == b.get("score")
+        and _safe_int(a.get("duration_seconds")) == _safe_int(b.get("duration_seconds"))
+    )
+
+
+_PROFILE_FIELDS = [
+    "learning_level",
+    "average_score",
+    "completion_rate",
+    "total_points",
+    "total_time_seconds",
+    "weak_topics",
+    "strong_topics",
+    "last_recommendation",
+]
+
+
+def _apply_profile_state(
+    profile: StudentProfile,
+    stats: Dict[str, Dict[str, Any]],
+    trajectory: Dict[str, Any],
+    reward_count: int,
+    table: Optional[RuleTable] = None,
+) -> Dict[str, Any]:
+    """Set the computed profile fields (unsaved) and return the personalization payload."""
+    scored_attempts = sum(int(values["scored_attempts"]) for values in stats.values())
+    score_sum = sum(float(values["score_sum"]) for values in stats.values())
     average_score = (score_sum / scored_attempts) if scored_attempts else 0.0
-    total_time_seconds = sum(_safe_int(entry.get("duration_seconds")) for entry in entries)
+    total_time_seconds = sum(_safe_int(values.get("total_time_seconds")) for values in stats.values())
 
     weak_topics = sorted(
         [
@@ -341,11 +412,10 @@ def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
         key=lambda item: (-item["avg_score"], -item["attempts"]),
     )
 
-    trajectory = sync_learning_trajectory(student, stats)
     nodes = trajectory["nodes"]
     completion_rate = float(trajectory["completion_rate"])
 
-    rule = _pick_rule(average_score, scored_attempts)
+    rule = _pick_rule(average_score, scored_attempts, table)
     first_locked = next((n for n in nodes if n["status"] == "locked"), None)
 
     recommendation = rule.recommendation_template
@@ -359,21 +429,8 @@ def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
             f"Келесі модульге көшуге болады: {first_locked['topic']}."
         )
 
-    progress_history = []
-    for entry in scored_entries[-30:]:
-        created_at = entry.get("created_at")
-        if created_at is None:
-            continue
-        progress_history.append(
-            {
-                "date": created_at.date().isoformat(),
-                "topic": entry.get("topic", "General"),
-                "score": round(float(entry["score"]) * 100.0, 2),
-            }
-        )
-
-    reward_points = Reward.objects.filter(student=student).count() * 25
-    base_points = int(sum(max(float(entry["score"]), 0.0) * 100.0 for entry in scored_entries))
+    reward_points = reward_count * 25
+    base_points = int(max(score_sum, 0.0) * 100.0)
 
     profile.learning_level = _learning_level(average_score)
     profile.average_score = average_score
@@ -382,22 +439,7 @@ def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
     profile.total_time_seconds = total_time_seconds
     profile.weak_topics = weak_topics
     profile.strong_topics = strong_topics
-    profile.progress_history = progress_history
     profile.last_recommendation = recommendation.strip()
-    profile.save(
-        update_fields=[
-            "learning_level",
-            "average_score",
-            "completion_rate",
-            "total_points",
-            "total_time_seconds",
-            "weak_topics",
-            "strong_topics",
-            "progress_history",
-            "last_recommendation",
-            "updated_at",
-        ]
-    )
 
     return {
         "profile_id": profile.id,
@@ -415,12 +457,283 @@ def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
     }
 
 
+def _save_profile(
+    student: User,
+    profile: StudentProfile,
+    stats: Dict[str, Dict[str, Any]],
+    extra_fields: Iterable[str] = (),
+) -> Dict[str, Any]:
+    trajectory = sync_learning_trajectory(student, stats)
+    payload = _apply_profile_state(profile, stats, trajectory, Reward.objects.filter(student=student).count())
+    profile.save(
+        update_fields=[
+            *_PROFILE_FIELDS,
+            "updated_at",
+            # progress_history is appended by the request that scored; a deferred recompute must not overwrite it.
+            *extra_fields,
+        ]
+    )
+    return payload
+
+
+def rebuild_student_profile(student: User, profile: Optional[StudentProfile] = None) -> Optional[Dict[str, Any]]:
+    """Full rescan of every submission; repairs and backfills the StudentTopicStat aggregates."""
+    if getattr(student, "role", None) != "student":
+        return None
+
+    if profile is None:
+        profile, _ = StudentProfile.objects.get_or_create(student=student)
+    entries = _collect_student_entries(student)
+    stats = _topic_metrics(entries)
+
+    with transaction.atomic():
+        StudentTopicStat.objects.filter(student=student).delete()
+        StudentTopicStat.objects.bulk_create(
+            [
+                StudentTopicStat(
+                    student=student,
+                    topic=topic,
+                    attempts=values["attempts"],
+                    scored_attempts=values["scored_attempts"],
+                    score_sum=values["score_sum"],
+                    total_time_seconds=values["total_time_seconds"],
+                )
+                for topic, values in stats.items()
+            ]
+        )
+
+    scored_entries = [entry for entry in entries if entry.get("score") is not None]
+    points = (_progress_point(entry) for entry in scored_entries[-30:])
+    profile.progress_history = [point for point in points if point is not None]
+    profile.topic_stats_built_at = timezone.now()
+    return _save_profile(student, profile, stats, extra_fields=("progress_history", "topic_stats_built_at"))
+
+
+def rebuild_student_profiles(students: Iterable[User]) -> int:
+    """
+    rebuild_student_profile for many students at once: submissions, nodes and
+    rewards are read in a fixed number of queries and profiles, topic stats
+    and trajectory nodes are written in bulk. Returns the number rebuilt.
+    """
+    students = [student for student in students if getattr(student, "role", None) == "student"]
+    if not students:
+        return 0
+    student_ids = [student.id for student in students]
+
+    entries_by_student = _collect_entries_by_student(students)
+    stats_by_student = {sid: _topic_metrics(entries) for sid, entries in entries_by_student.items()}
+    now = timezone.now()
+
+    with transaction.atomic():
+        StudentTopicStat.objects.filter(student_id__in=student_ids).delete()
+        StudentTopicStat.objects.bulk_create(
+            [
+                StudentTopicStat(
+                    student_id=sid,
+                    topic=topic,
+                    attempts=values["attempts"],
+                    scored_attempts=values["scored_attempts"],
+                    score_sum=values["score_sum"],
+                    total_time_seconds=values["total_time_seconds"],
+                )
+                for sid, stats in stats_by_student.items()
+                for topic, values in stats.items()
+            ],
+            batch_size=500,
+        )
+        StudentProfile.objects.bulk_create(
+            [StudentProfile(student_id=sid) for sid in student_ids], ignore_conflicts=True
+        )
+
+    profiles = {profile.student_id: profile for profile in StudentProfile.objects.filter(student_id__in=student_ids)}
+    trajectories = _sync_trajectories(students, stats_by_student)
+    reward_counts = dict(
+        Reward.objects.filter(student_id__in=student_ids)
+        .order_by()
+        .values("student_id")
+        .annotate(count=Count("id"))
+        .values_list("student_id", "count")
+    )
+    table = rule_table()
+
+    for sid in student_ids:
+        profile = profiles[sid]
+        scored_entries = [entry for entry in entries_by_student[sid] if entry.get("score") is not None]
+        points = (_progress_point(entry) for entry in scored_entries[-30:])
+        profile.progress_history = [point for point in points if point is not None]
+        profile.topic_stats_built_at = now
+        profile.updated_at = now
+        _apply_profile_state(profile, stats_by_student[sid], trajectories[sid], reward_counts.get(sid, 0), table)
+    StudentProfile.objects.bulk_update(
+        list(profiles.values()),
+        [*_PROFILE_FIELDS, "progress_history", "topic_stats_built_at", "updated_at"],
+        batch_size=500,
+    )
+    bump_cache_tags(*(f"student:{sid}" for sid in profiles))
+    return len(profiles)
+
+
+def _refresh_profile(student: User, profile: StudentProfile, history_changed: bool = False) -> Dict[str, Any]:
+    """After the aggregates changed: recompute now, or save the history and leave the rest to the scheduler."""
+    if not is_deferred():
+        return _save_profile(student, profile, _stored_topic_metrics(student), extra_fields=("progress_history",))
+    if history_changed:
+        profile.save(update_fields=["progress_history", "updated_at"])
+    schedule_recompute(student)
+    payload = _stored_personalization(student, profile)
+    payload["recompute_pending"] = True
+    return payload
+
+
+def recompute_student_profile(student: User) -> Optional[Dict[str, Any]]:
+    if getattr(student, "role", None) != "student":
+        return None
+
+    profile, _ = StudentProfile.objects.get_or_create(student=student)
+    if profile.topic_stats_built_at is None:
+        return rebuild_student_profile(student, profile=profile)
+    return _save_profile(student, profile, _stored_topic_metrics(student))
+
+
+def record_student_entry(
+    student: User,
+    entry: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Fold one new (or changed, when ``previous`` is given) submission into the stored aggregates."""
+    if getattr(student, "role", None) != "student":
+        return None
+
+    profile, _ = StudentProfile.objects.get_or_create(student=student)
+    if profile.topic_stats_built_at is None:
+        # The rescan already sees this submission.
+        return rebuild_student_profile(student, profile=profile)
+
+    if previous is not None and _same_contribution(previous, entry):
+        return _refresh_profile(student, profile)
+
+    with transaction.atomic():
+        if previous is not None:
+            _apply_entry(student, previous, sign=-1)
+        _apply_entry(student, entry)
+
+    point = _progress_point(entry)
+    if point is not None and (previous is None or previous.get("score") != entry.get("score")):
+        profile.progress_history = (list(profile.progress_history or []) + [point])[-30:]
+        return _refresh_profile(student, profile, history_changed=True)
+    return _refresh_profile(student, profile)
+
+
+def record_student_entries(student: User, entries: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """record_student_entry for a batch of new submissions: one aggregate update, one profile save."""
+    if getattr(student, "role", None) != "student" or not entries:
+        return None
+
+    profile, _ = StudentProfile.objects.get_or_create(student=student)
+    if profile.topic_stats_built_at is None:
+        return rebuild_student_profile(student, profile=profile)
+
+    with transaction.atomic():
+        _apply_entries(student, entries)
+
+    points = [point for point in map(_progress_point, entries) if point is not None]
+    if points:
+        profile.progress_history = (list(profile.progress_history or []) + points)[-30:]
+    return _refresh_profile(student, profile, history_changed=bool(points))
+
+
+def discard_student_entry(student: User, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if getattr(student, "role", None) != "student":
+        return None
+
+    profile, _ = StudentProfile.objects.get_or_create(student=student)
+    if profile.topic_stats_built_at is None:
+        return rebuild_student_profile(student, profile=profile)
+    _apply_entry(student, entry, sign=-1)
+    return _refresh_profile(student, profile)
+
+
+def lesson_student_ids(lesson_id: int) -> Set[int]:
+    """Students whose submissions are attributed to a lesson's topic (enrolled or submitted to it)."""
+    student_ids = set(Enrollment.objects.filter(lesson_id=lesson_id).values_list("student_id", flat=True))
+    student_ids.update(
+        LessonSubmission.objects.filter(assignment__lesson_id=lesson_id).values_list("student_id", flat=True)
+    )
+    student_ids.update(
+        SlideSubmission.objects.filter(slide__lesson_id=lesson_id, user__isnull=False).values_list("user_id", flat=True)
+    )
+    return student_ids
+
+
+def lesson_submission_entry(submission: LessonSubmission) -> Dict[str, Any]:
+    return _lesson_submission_entry(submission.student, submission)
+
+
+def slide_submission_entry(submission: SlideSubmission) -> Dict[str, Any]:
+    student = submission.user
+    assignment = None
+    if submission.template_id:
+        assignment = (
+            Assignment.objects.filter(lesson__enrollments__student=student, content_id=submission.template_id)
+            .select_related("lesson")
+            .order_by("id")
+            .first()
+        )
+    return _slide_submission_entry(student, submission, assignment)
+
+
+def slide_submission_entries(submissions: List[SlideSubmission]) -> List[Dict[str, Any]]:
+    """slide_submission_entry for one student's submissions, resolving each template's assignment once."""
+    assignments: Dict[int, Optional[Assignment]] = {}
+    entries = []
+    for submission in submissions:
+        template_id = submission.template_id
+        if template_id and template_id not in assignments:
+            assignments[template_id] = (
+                Assignment.objects.filter(lesson__enrollments__student=submission.user, content_id=template_id)
+                .select_related("lesson")
+                .order_by("id")
+                .first()
+            )
+        entries.append(_slide_submission_entry(submission.user, submission, assignments.get(template_id)))
+    return entries
+
+
+def record_lesson_submission(
+    submission: LessonSubmission,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    return record_student_entry(submission.student, lesson_submission_entry(submission), previous=previous)
+
+
+def record_slide_submission(
+    submission: SlideSubmission,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    if submission.user is None:
+        return None
+    return record_student_entry(submission.user, slide_submission_entry(submission), previous=previous)
+
+
+def record_slide_submissions(student: User, submissions: List[SlideSubmission]) -> Optional[Dict[str, Any]]:
+    return record_student_entries(student, slide_submission_entries(submissions))
+
+
 def get_student_personalization(student: User, refresh: bool = False) -> Optional[Dict[str, Any]]:
     if getattr(student, "role", None) != "student":
         return None
     if refresh or not hasattr(student, "student_profile"):
         return recompute_student_profile(student)
-    profile = student.student_profile
+    wait_for_recompute(student)
+    return cached_payload(
+        "adaptive.personalization",
+        [student.id],
+        [f"student:{student.id}", "lessons"],
+        lambda: _stored_personalization(student, StudentProfile.objects.get(student=student)),
+    )
+
+
+def _stored_personalization(student: User, profile: StudentProfile) -> Dict[str, Any]:
     nodes = list(
         LearningTrajectoryNode.objects.filter(student=student)
         .select_related("lesson")
@@ -456,15 +769,31 @@ def get_student_personalization(student: User, refresh: bool = False) -> Optiona
     }
 
 
-def _entries_for_teacher(
+def _new_bucket() -> Dict[str, Any]:
+    return {"attempts": 0, "scored_attempts": 0, "score_sum": 0.0}
+
+
+def _bucket_average(bucket: Dict[str, Any]) -> float:
+    return bucket["score_sum"] / bucket["scored_attempts"] if bucket["scored_attempts"] else 0.0
+
+
+def _add_group(bucket: Dict[str, Any], row: Dict[str, Any]) -> None:
+    bucket["attempts"] += row["attempts"]
+    bucket["scored_attempts"] += row["scored_attempts"]
+    bucket["score_sum"] += row["score_sum"] or 0.0
+
+
+def _teacher_aggregates(
     teacher: User,
     lesson_id: Optional[int] = None,
     student_id: Optional[int] = None,
 ) -> Dict[str, Any]:
-    assignments = Assignment.objects.filter(lesson__owner=teacher).select_related("lesson")
-    if lesson_id:
-        assignments = assignments.filter(lesson_id=lesson_id)
-
+    """
+    Attempt, score and time totals per student, topic and day for a teacher's
+    students. Submissions are grouped in the database, once by (student,
+    lesson or template) and once by day; only the group rows reach Python. Topics keep the order in
+    which they first appear in the submission history.
+    """
     enrollments = Enrollment.objects.filter(lesson__owner=teacher).select_related("student", "lesson")
     if lesson_id:
         enrollments = enrollments.filter(lesson_id=lesson_id)
@@ -473,68 +802,99 @@ def _entries_for_teacher(
 
     students = {enrollment.student_id: enrollment.student for enrollment in enrollments}
     student_ids = list(students.keys())
+    aggregates: Dict[str, Any] = {
+        "students": students,
+        "student_ids": student_ids,
+        "per_student": {sid: dict(_new_bucket(), total_time_seconds=0) for sid in student_ids},
+        "topics": {},
+        "days": defaultdict(_new_bucket),
+        "totals": _new_bucket(),
+    }
     if not student_ids:
-        return {"entries": [], "students": {}, "student_ids": []}
+        return aggregates
+
+    assignments = Assignment.objects.filter(lesson__owner=teacher)
+    if lesson_id:
+        assignments = assignments.filter(lesson_id=lesson_id)
+    topic_by_lesson: Dict[int, str] = {}
+    topic_by_template: Dict[int, str] = {}
+    for assignment_lesson_id, content_id, lesson_topic, lesson_title in assignments.values_list(
+        "lesson_id", "content_id", "lesson__topic", "lesson__title"
+    ):
+        topic = _topic_from_lesson_title(lesson_topic, lesson_title)
+        topic_by_lesson[assignment_lesson_id] = topic
+        if content_id and content_id not in topic_by_template:
+            topic_by_template[content_id] = topic
+
+    clamped = Least(Greatest("score", Value(0.0)), Value(1.0))
+    totals = {
+        "attempts": Count("id"),
+        "scored_attempts": Count("score"),
+        "score_sum": Sum(clamped, filter=Q(score__isnull=False)),
+    }
 
-    assignment_by_template: Dict[int, Assignment] = {}
-    assignment_list = list(assignments)
-    for assignment in assignment_list:
-        if assignment.content_id and assignment.content_id not in assignment_by_template:
-            assignment_by_template[assignment.content_id] = assignment
+    def by_target(queryset, owner_field: str, target_field: str, created_field: str):
+        return (
+            queryset.order_by()
+            .values(owner_field, target_field)
+            .annotate(
+                **totals,
+                duration=Sum("duration_seconds"),
+                first_at=Min(created_field),
+                first_id=Min("id"),
+            )
+        )
 
-    entries: List[Dict[str, Any]] = []
+    def by_day(queryset, created_field: str):
+        return (
+            queryset.order_by()
+            .annotate(day=TruncDate(created_field, tzinfo=dt_timezone.utc))
+            .values("day")
+            .annotate(**totals)
+        )
 
-    lesson_submissions = (
-        LessonSubmission.objects.filter(assignment__in=assignment_list, student_id__in=student_ids)
-        .select_related("assignment__lesson", "student")
-        .order_by("submitted_at", "id")
+    lesson_submissions = LessonSubmission.objects.filter(
+        assignment__lesson__owner=teacher, student_id__in=student_ids
     )
-    for submission in lesson_submissions:
-        topic = _topic_from_lesson_title(submission.assignment.lesson.topic, submission.assignment.lesson.title)
-        entries.append(
-            {
-                "student_id": submission.student_id,
-                "student_username": submission.student.username,
-                "topic": topic,
-                "score": _safe_score(submission.score),
-                "duration_seconds": _safe_int(submission.duration_seconds),
-                "created_at": submission.submitted_at,
-                "source": "assignment_submission",
-            }
-        )
+    if lesson_id:
+        lesson_submissions = lesson_submissions.filter(assignment__lesson_id=lesson_id)
+    groups = [
+        (0, row["student_id"], topic_by_lesson[row["assignment__lesson_id"]], row)
+        for row in by_target(lesson_submissions, "student_id", "assignment__lesson_id", "submitted_at")
+    ]
+    day_rows = list(by_day(lesson_submissions, "submitted_at"))
 
-    template_ids = [template_id for template_id in assignment_by_template.keys()]
+    template_ids = list(topic_by_template.keys())
     if template_ids:
-        slide_submissions = (
-            SlideSubmission.objects.filter(user_id__in=student_ids, template_id__in=template_ids)
-            .select_related("template", "user")
-            .order_by("created_at", "id")
+        slide_submissions = SlideSubmission.objects.filter(user_id__in=student_ids, template_id__in=template_ids)
+        groups.extend(
+            (1, row["user_id"], topic_by_template[row["template_id"]], row)
+            for row in by_target(slide_submissions, "user_id", "template_id", "created_at")
         )
-        for submission in slide_submissions:
-            topic = "General"
-            assignment = assignment_by_template.get(submission.template_id)
-            if assignment:
-                topic = _topic_from_lesson_title(assignment.lesson.topic, assignment.lesson.title)
-            elif submission.template:
-                topic = submission.template.title
-            payload = submission.data if isinstance(submission.data, dict) else {}
-            entries.append(
-                {
-                    "student_id": submission.user_id,
-                    "student_username": submission.user.username if submission.user else f"student-{submission.user_id}",
-                    "topic": topic,
-                    "score": _safe_score(submission.score),
-                    "duration_seconds": _safe_int(submission.duration_seconds or payload.get("duration_seconds")),
-                    "created_at": submission.created_at,
-                    "source": "interactive_submission",
-                }
-            )
-
-    return {
-        "entries": entries,
-        "students": students,
-        "student_ids": student_ids,
-    }
+        day_rows.extend(by_day(slide_submissions, "created_at"))
+        # A zero duration column falls back to the duration reported in the payload.
+        for user_id, data in slide_submissions.filter(
+            duration_seconds=0, data__has_key="duration_seconds"
+        ).values_list("user_id", "data"):
+            aggregates["per_student"][user_id]["total_time_seconds"] += _safe_int(data.get("duration_seconds"))
+
+    first_seen: Dict[str, tuple] = {}
+    topics: Dict[str, Dict[str, Any]] = defaultdict(_new_bucket)
+    for source, sid, topic, row in groups:
+        student_row = aggregates["per_student"][sid]
+        _add_group(student_row, row)
+        student_row["total_time_seconds"] += row["duration"] or 0
+        _add_group(topics[topic], row)
+        _add_group(aggregates["totals"], row)
+        seen = (source, row["first_at"], row["first_id"])
+        if topic not in first_seen or seen < first_seen[topic]:
+            first_seen[topic] = seen
+    for row in day_rows:
+        if row["day"]:
+            _add_group(aggregates["days"][row["day"].isoformat()], row)
+
+    aggregates["topics"] = {topic: topics[topic] for topic in sorted(topics, key=first_seen.__getitem__)}
+    return aggregates
 
 
 def build_teacher_analytics(
@@ -542,84 +902,27 @@ def build_teacher_analytics(
     lesson_id: Optional[int] = None,
     student_id: Optional[int] = None,
 ) -> Dict[str, Any]:
-    collected = _entries_for_teacher(teacher=teacher, lesson_id=lesson_id, student_id=student_id)
-    entries = collected["entries"]
-    students: Dict[int, User] = collected["students"]
-    student_ids: List[int] = collected["student_ids"]
-
-    per_student: Dict[int, Dict[str, Any]] = {
-        sid: {
-            "student_id": sid,
-            "username": students[sid].username,
-            "attempts": 0,
-            "scored_attempts": 0,
-            "score_sum": 0.0,
-            "avg_score": 0.0,
-            "total_time_seconds": 0,
-            "topics": defaultdict(int),
-        }
-        for sid in student_ids
-    }
-    topic_stats: Dict[str, Dict[str, Any]] = defaultdict(
-        lambda: {"attempts": 0, "scored_attempts": 0, "score_sum": 0.0, "avg_score": 0.0}
-    )
-    progress_by_day: Dict[str, Dict[str, Any]] = defaultdict(
-        lambda: {"attempts": 0, "scored_attempts": 0, "score_sum": 0.0}
-    )
-
-    total_scored = 0
-    total_score_sum = 0.0
-
-    for entry in entries:
-        sid = entry["student_id"]
-        topic = entry["topic"]
-        score = entry.get("score")
-        duration = _safe_int(entry.get("duration_seconds"))
-        created_at = entry.get("created_at")
-        day_key = created_at.date().isoformat() if created_at else None
-
-        student_row = per_student[sid]
-        student_row["attempts"] += 1
-        student_row["total_time_seconds"] += duration
-        student_row["topics"][topic] += 1
-
-        topic_stats[topic]["attempts"] += 1
-        if day_key:
-            progress_by_day[day_key]["attempts"] += 1
-
-        if score is not None:
-            student_row["scored_attempts"] += 1
-            student_row["score_sum"] += float(score)
-
-            topic_stats[topic]["scored_attempts"] += 1
-            topic_stats[topic]["score_sum"] += float(score)
-
-            total_scored += 1
-            total_score_sum += float(score)
-
-            if day_key:
-                progress_by_day[day_key]["scored_attempts"] += 1
-                progress_by_day[day_key]["score_sum"] += float(score)
+    aggregates = _teacher_aggregates(teacher=teacher, lesson_id=lesson_id, student_id=student_id)
+    return _teacher_analytics_payload(aggregates, student_id=student_id)
 
-    for row in per_student.values():
-        if row["scored_attempts"]:
-            row["avg_score"] = row["score_sum"] / row["scored_attempts"]
 
-    for metric in topic_stats.values():
-        if metric["scored_attempts"]:
-            metric["avg_score"] = metric["score_sum"] / metric["scored_attempts"]
+def _teacher_analytics_payload(aggregates: Dict[str, Any], student_id: Optional[int] = None) -> Dict[str, Any]:
+    students: Dict[int, User] = aggregates["students"]
+    student_ids: List[int] = aggregates["student_ids"]
+    per_student: Dict[int, Dict[str, Any]] = aggregates["per_student"]
+    totals = aggregates["totals"]
 
     profile_by_student = {
         profile.student_id: profile
         for profile in StudentProfile.objects.filter(student_id__in=student_ids)
     }
-    for sid in student_ids:
-        if sid not in profile_by_student:
-            recompute_student_profile(students[sid])
-    profile_by_student = {
-        profile.student_id: profile
-        for profile in StudentProfile.objects.filter(student_id__in=student_ids)
-    }
+    missing = [students[sid] for sid in student_ids if sid not in profile_by_student]
+    if missing:
+        rebuild_student_profiles(missing)
+        profile_by_student = {
+            profile.student_id: profile
+            for profile in StudentProfile.objects.filter(student_id__in=student_ids)
+        }
 
     students_result = []
     for sid, row in per_student.items():
@@ -627,10 +930,10 @@ def build_teacher_analytics(
         students_result.append(
             {
                 "student_id": sid,
-                "username": row["username"],
+                "username": students[sid].username,
                 "attempts": row["attempts"],
                 "scored_attempts": row["scored_attempts"],
-                "average_score": round(row["avg_score"] * 100.0, 2),
+                "average_score": round(_bucket_average(row) * 100.0, 2),
                 "total_time_seconds": row["total_time_seconds"],
                 "learning_level": profile.learning_level if profile else None,
                 "weak_topics": profile.weak_topics if profile else [],
@@ -640,21 +943,21 @@ def build_teacher_analytics(
     students_result.sort(key=lambda item: (-item["average_score"], -item["attempts"], item["username"]))
 
     hardest_topics = []
-    for topic, metric in topic_stats.items():
+    for topic, metric in aggregates["topics"].items():
         if not metric["scored_attempts"]:
             continue
         hardest_topics.append(
             {
                 "topic": topic,
                 "attempts": metric["attempts"],
-                "average_score": round(metric["avg_score"] * 100.0, 2),
+                "average_score": round(_bucket_average(metric) * 100.0, 2),
             }
         )
     hardest_topics.sort(key=lambda item: (item["average_score"], -item["attempts"]))
 
     progress = []
-    for day, metric in sorted(progress_by_day.items()):
-        avg = (metric["score_sum"] / metric["scored_attempts"] * 100.0) if metric["scored_attempts"] else 0.0
+    for day, metric in sorted(aggregates["days"].items()):
+        avg = _bucket_average(metric) * 100.0
         progress.append(
             {
                 "date": day,
@@ -664,13 +967,13 @@ def build_teacher_analytics(
         )
 
     total_time = sum(row["total_time_seconds"] for row in per_student.values())
-    group_average = (total_score_sum / total_scored * 100.0) if total_scored else 0.0
+    group_average = _bucket_average(totals) * 100.0
 
     payload = {
         "summary": {
             "students_count": len(student_ids),
-            "attempts_count": len(entries),
-            "scored_attempts": total_scored,
+            "attempts_count": totals["attempts"],
+            "scored_attempts": totals["scored_attempts"],
             "group_average_score": round(group_average, 2),
             "total_time_seconds": total_time,
         },
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class LessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lessons'
+
+    def ready(self):
+        from edu_platform.caching import connect_model_invalidation
+
+        from . import rules  # noqa: F401  (adaptive rule generation signal receivers)
+
+        connect_model_invalidation()
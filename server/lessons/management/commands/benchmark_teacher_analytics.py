@@ -0,0 +1,221 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from lessons.adaptive import (
+    _new_bucket,
+    _safe_int,
+    _safe_score,
+    _teacher_aggregates,
+    _teacher_analytics_payload,
+    _topic_from_lesson_title,
+)
+from lessons.models import Assignment, Enrollment, Lesson, Submission as LessonSubmission
+from slide.models import SlideTemplate, Submission as SlideSubmission
+from users.models import StudentProfile, User
+
+
+def _row_wise_aggregates(teacher, lesson_id=None, student_id=None):
+    """The previous aggregation: every submission loaded as a model instance and folded in Python."""
+    assignments = Assignment.objects.filter(lesson__owner=teacher).select_related("lesson")
+    if lesson_id:
+        assignments = assignments.filter(lesson_id=lesson_id)
+    enrollments = Enrollment.objects.filter(lesson__owner=teacher).select_related("student", "lesson")
+    if lesson_id:
+        enrollments = enrollments.filter(lesson_id=lesson_id)
+    if student_id:
+        enrollments = enrollments.filter(student_id=student_id)
+
+    students = {enrollment.student_id: enrollment.student for enrollment in enrollments}
+    student_ids = list(students.keys())
+    aggregates = {
+        "students": students,
+        "student_ids": student_ids,
+        "per_student": {sid: dict(_new_bucket(), total_time_seconds=0) for sid in student_ids},
+        "topics": defaultdict(_new_bucket),
+        "days": defaultdict(_new_bucket),
+        "totals": _new_bucket(),
+    }
+    if not student_ids:
+        return aggregates
+
+    assignment_list = list(assignments)
+    assignment_by_template = {}
+    for assignment in assignment_list:
+        if assignment.content_id and assignment.content_id not in assignment_by_template:
+            assignment_by_template[assignment.content_id] = assignment
+
+    entries = []
+    for submission in (
+        LessonSubmission.objects.filter(assignment__in=assignment_list, student_id__in=student_ids)
+        .select_related("assignment__lesson", "student")
+        .order_by("submitted_at", "id")
+    ):
+        lesson = submission.assignment.lesson
+        entries.append(
+            (
+                submission.student_id,
+                _topic_from_lesson_title(lesson.topic, lesson.title),
+                _safe_score(submission.score),
+                _safe_int(submission.duration_seconds),
+                submission.submitted_at,
+            )
+        )
+    if assignment_by_template:
+        for submission in (
+            SlideSubmission.objects.filter(user_id__in=student_ids, template_id__in=list(assignment_by_template))
+            .select_related("template", "user")
+            .order_by("created_at", "id")
+        ):
+            lesson = assignment_by_template[submission.template_id].lesson
+            payload = submission.data if isinstance(submission.data, dict) else {}
+            entries.append(
+                (
+                    submission.user_id,
+                    _topic_from_lesson_title(lesson.topic, lesson.title),
+                    _safe_score(submission.score),
+                    _safe_int(submission.duration_seconds or payload.get("duration_seconds")),
+                    submission.created_at,
+                )
+            )
+
+    for sid, topic, score, duration, created_at in entries:
+        aggregates["per_student"][sid]["total_time_seconds"] += duration
+        buckets = [aggregates["per_student"][sid], aggregates["topics"][topic], aggregates["totals"]]
+        if created_at:
+            buckets.append(aggregates["days"][created_at.date().isoformat()])
+        for bucket in buckets:
+            bucket["attempts"] += 1
+            if score is not None:
+                bucket["scored_attempts"] += 1
+                bucket["score_sum"] += score
+    return aggregates
+
+
+class Command(BaseCommand):
+    help = "Time teacher analytics aggregation (grouped vs row-wise) on synthetic submissions (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=200)
+        parser.add_argument("--lessons", type=int, default=10)
+        parser.add_argument("--slide-submissions", type=int, default=50000)
+        parser.add_argument("--days", type=int, default=45)
+        parser.add_argument("--skip-baseline", action="store_true", help="Do not time the row-wise aggregation.")
+
+    def _timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label:<28} {(time.perf_counter() - started) * 1000:10.0f} ms")
+        return result
+
+    def _seed(self, rng, options):
+        teacher = User.objects.create(username="bench_analytics_teacher", role="teacher")
+        students = User.objects.bulk_create(
+            [User(username=f"bench_analytics_student_{i}", role="student") for i in range(options["students"])]
+        )
+        # Profiles up front so the payload does not recompute anyone.
+        StudentProfile.objects.bulk_create([StudentProfile(student=student) for student in students])
+        lessons = Lesson.objects.bulk_create(
+            [
+                Lesson(owner=teacher, title=f"Lesson {i}", topic="" if i % 3 == 0 else f"Topic {i % 4}")
+                for i in range(options["lessons"])
+            ]
+        )
+        Enrollment.objects.bulk_create(
+            [Enrollment(student=student, lesson=lesson) for student in students for lesson in lessons]
+        )
+        templates = SlideTemplate.objects.bulk_create(
+            [
+                SlideTemplate(title=f"Bench template {i}", author=teacher, template_type="quiz", data={})
+                for i in range(options["lessons"] * 2)
+            ]
+        )
+        Assignment.objects.bulk_create(
+            [Assignment(lesson=lesson, title=f"Homework {lesson.id}") for lesson in lessons]
+            + [
+                Assignment(lesson=lessons[i % len(lessons)], content_id=template.id, assignment_type="quiz")
+                for i, template in enumerate(templates)
+            ]
+        )
+
+        def score():
+            roll = rng.random()
+            return None if roll < 0.1 else rng.uniform(-0.2, 1.2)
+
+        now = timezone.now()
+        homework = list(Assignment.objects.filter(lesson__in=lessons, content_id__isnull=True))
+        LessonSubmission.objects.bulk_create(
+            [
+                LessonSubmission(
+                    assignment=assignment,
+                    student=student,
+                    score=score(),
+                    duration_seconds=rng.randint(0, 900),
+                )
+                for student in students
+                for assignment in homework
+                if rng.random() < 0.7
+            ],
+            batch_size=2000,
+        )
+        # submitted_at is auto_now_add: spread it over the window afterwards.
+        ids = list(LessonSubmission.objects.filter(student__in=students).values_list("id", flat=True))
+        for day in range(options["days"]):
+            LessonSubmission.objects.filter(id__in=ids[day :: options["days"]]).update(
+                submitted_at=now - timedelta(days=day, minutes=rng.randint(0, 600))
+            )
+
+        def slide_data():
+            roll = rng.random()
+            if roll < 0.2:
+                return {"duration_seconds": rng.choice([30, "45", 12.5, -3, "n/a"])}
+            return {"answer": "A"}
+
+        SlideSubmission.objects.bulk_create(
+            (
+                SlideSubmission(
+                    template=rng.choice(templates),
+                    user=rng.choice(students),
+                    data=slide_data(),
+                    score=score(),
+                    duration_seconds=0 if rng.random() < 0.3 else rng.randint(1, 600),
+                    created_at=now - timedelta(days=rng.randrange(options["days"]), seconds=rng.randrange(86400)),
+                )
+                for _ in range(options["slide_submissions"])
+            ),
+            batch_size=5000,
+        )
+        return teacher, lessons, students
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            teacher, lessons, students = self._seed(rng, options)
+            self.stdout.write(
+                f"{len(students)} students, {len(lessons)} lessons, "
+                f"{LessonSubmission.objects.filter(student__in=students).count()} lesson + "
+                f"{options['slide_submissions']} slide submissions"
+            )
+
+            scopes = [
+                ("all students", {}),
+                ("one lesson", {"lesson_id": lessons[0].id}),
+                ("one student", {"student_id": students[0].id}),
+            ]
+            for label, scope in scopes:
+                grouped = self._timed(f"grouped ({label})", lambda: _teacher_aggregates(teacher, **scope))
+                if options["skip_baseline"]:
+                    continue
+                row_wise = self._timed(f"row-wise ({label})", lambda: _row_wise_aggregates(teacher, **scope))
+                student_id = scope.get("student_id")
+                if _teacher_analytics_payload(grouped, student_id) != _teacher_analytics_payload(row_wise, student_id):
+                    raise CommandError(f"Grouped and row-wise analytics payloads differ ({label}).")
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (data rolled back)."))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lessons.recompute import debounce_seconds, due_student_ids, run_recompute_job
+
+
+class Command(BaseCommand):
+    help = "Recompute student profiles marked dirty by the deferred adaptive scheduler."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting.")
+        parser.add_argument("--interval", type=float, default=None, help="Seconds between polls with --loop.")
+        parser.add_argument("--all", action="store_true", help="Also run students still inside the debounce window.")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] if options["interval"] is not None else max(debounce_seconds(), 1.0)
+        done = 0
+        # A failed recompute leaves the student dirty; it is not retried until the next poll.
+        skipped = set()
+        while True:
+            ids = due_student_ids(limit=100, force=options["all"], exclude=skipped)
+            for student_id in ids:
+                if run_recompute_job(student_id):
+                    done += 1
+                else:
+                    skipped.add(student_id)
+            if not ids:
+                if not options["loop"]:
+                    break
+                skipped.clear()
+                time.sleep(interval)
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed student profiles: {done}, skipped: {len(skipped)}"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from lessons.adaptive import rebuild_student_profiles
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild student profiles and topic aggregates from a full rescan of submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            action="append",
+            default=[],
+            help="Student id or username to rebuild (repeatable). Defaults to every student.",
+        )
+        parser.add_argument("--batch-size", type=int, default=200, help="Students rebuilt per bulk pass.")
+
+    def handle(self, *args, **options):
+        students = User.objects.filter(role="student").order_by("id")
+        selectors = options["student"]
+        if selectors:
+            ids = [int(value) for value in selectors if str(value).isdigit()]
+            names = [value for value in selectors if not str(value).isdigit()]
+            students = students.filter(id__in=ids) | students.filter(username__in=names)
+
+        rebuilt = 0
+        batch = []
+        for student in students.iterator():
+            batch.append(student)
+            if len(batch) >= options["batch_size"]:
+                rebuilt += rebuild_student_profiles(batch)
+                batch = []
+        if batch:
+            rebuilt += rebuild_student_profiles(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt student profiles: {rebuilt}"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0007_alter_assignment_assignment_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='deck_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
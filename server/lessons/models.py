@@ -23,6 +23,8 @@ class Lesson(models.Model):
 
     is_shared = models.BooleanField(default=False)
     share_code = models.CharField(max_length=32, blank=True, null=True, unique=True)
+    # Bumped whenever a slide or slide object of the lesson changes (live deck snapshot cache key).
+    deck_version = models.PositiveIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
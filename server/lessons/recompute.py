@@ -0,0 +1,224 @@
+"""
+Deferred student profile recomputation.
+
+Writes fold their StudentTopicStat deltas synchronously (cheap) and call
+``schedule_recompute``; the expensive part (trajectory sync, recommendation,
+profile save) runs later. A student triggered several times within
+ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS is recomputed once. The dirty mark lives
+on StudentProfile.recompute_requested_at, so any process (or
+``python manage.py process_profile_recomputes``) can pick the work up.
+"""
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from users.models import StudentProfile, User
+
+logger = logging.getLogger(__name__)
+
+
+def debounce_seconds() -> float:
+    """0 disables deferral: every trigger recomputes inline, as before."""
+    return max(0.0, float(getattr(settings, "ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS", 5)))
+
+
+def recompute_workers() -> int:
+    return max(0, int(getattr(settings, "ADAPTIVE_RECOMPUTE_WORKERS", 1)))
+
+
+def is_deferred() -> bool:
+    return debounce_seconds() > 0
+
+
+def _mark_dirty(student_ids: List[int]) -> None:
+    now = timezone.now()
+    # Already-dirty profiles keep their first request time: that is the coalescing.
+    StudentProfile.objects.filter(student_id__in=student_ids, recompute_requested_at__isnull=True).update(
+        recompute_requested_at=now
+    )
+    existing = set(StudentProfile.objects.filter(student_id__in=student_ids).values_list("student_id", flat=True))
+    missing = [sid for sid in student_ids if sid not in existing]
+    if missing:
+        StudentProfile.objects.bulk_create(
+            [StudentProfile(student_id=sid, recompute_requested_at=now) for sid in missing],
+            ignore_conflicts=True,
+        )
+    if recompute_workers() > 0:
+        due = time.monotonic() + debounce_seconds()
+        transaction.on_commit(lambda: _get_scheduler().submit(student_ids, due))
+
+
+def schedule_recompute(student: User) -> Optional[dict]:
+    """
+    Request a profile recompute for a student. Inline mode returns the fresh
+    personalization payload; deferred mode returns None.
+    """
+    if getattr(student, "role", None) != "student":
+        return None
+    if not is_deferred():
+        from .adaptive import recompute_student_profile
+
+        return recompute_student_profile(student)
+    _mark_dirty([student.id])
+    return None
+
+
+def schedule_recompute_many(student_ids: Iterable[int]) -> None:
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+    if not is_deferred():
+        for student in User.objects.filter(id__in=student_ids, role="student"):
+            schedule_recompute(student)
+        return
+    _mark_dirty(list(User.objects.filter(id__in=student_ids, role="student").values_list("id", flat=True)))
+
+
+def schedule_rebuild_many(student_ids: Iterable[int]) -> None:
+    """
+    schedule_recompute_many with a full rescan: for writes that move
+    submissions to another topic or drop them without the record/discard
+    calls (lesson renames and deletes, enrollment and assignment changes).
+    """
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+    # The recompute rebuilds StudentTopicStat from every submission while this is unset.
+    StudentProfile.objects.filter(student_id__in=student_ids).update(topic_stats_built_at=None)
+    schedule_recompute_many(student_ids)
+
+
+# --- running ----------------------------------------------------------------
+
+_running: Dict[int, threading.Event] = {}
+_running_lock = threading.Lock()
+
+
+def run_recompute(student_id: int) -> bool:
+    """Recompute one dirty student. False if the student was clean or another worker took the job."""
+    from .adaptive import recompute_student_profile
+
+    claimed = StudentProfile.objects.filter(student_id=student_id, recompute_requested_at__isnull=False).update(
+        recompute_requested_at=None
+    )
+    if not claimed:
+        return False
+
+    done = threading.Event()
+    with _running_lock:
+        _running[student_id] = done
+    try:
+        student = User.objects.get(pk=student_id)
+        recompute_student_profile(student)
+    except Exception:
+        # Leave the student dirty so the next pass retries.
+        StudentProfile.objects.filter(student_id=student_id, recompute_requested_at__isnull=True).update(
+            recompute_requested_at=timezone.now()
+        )
+        raise
+    finally:
+        with _running_lock:
+            _running.pop(student_id, None)
+        done.set()
+    return True
+
+
+def wait_for_recompute(student: User, timeout: Optional[float] = None) -> bool:
+    """
+    Make the stored profile fresh before a read: wait (up to `timeout`) for a
+    recompute already running in this process, then recompute inline if the
+    student is still dirty or was never computed. False if the wait timed out.
+    """
+    if getattr(student, "role", None) != "student":
+        return True
+    if timeout is None:
+        timeout = float(getattr(settings, "ADAPTIVE_RECOMPUTE_WAIT_SECONDS", 5))
+    with _running_lock:
+        running = _running.get(student.id)
+    if running is not None and not running.wait(timeout):
+        return False
+
+    profile = (
+        StudentProfile.objects.filter(student=student)
+        .only("recompute_requested_at", "topic_stats_built_at")
+        .first()
+    )
+    if profile is None or profile.topic_stats_built_at is None:
+        from .adaptive import recompute_student_profile
+
+        recompute_student_profile(student)
+    elif profile.recompute_requested_at is not None:
+        run_recompute(student.id)
+    return True
+
+
+def due_student_ids(limit: Optional[int] = None, force: bool = False, exclude: Iterable[int] = ()) -> List[int]:
+    qs = StudentProfile.objects.filter(recompute_requested_at__isnull=False)
+    if exclude:
+        qs = qs.exclude(student_id__in=list(exclude))
+    if not force:
+        qs = qs.filter(recompute_requested_at__lte=timezone.now() - timedelta(seconds=debounce_seconds()))
+    qs = qs.order_by("recompute_requested_at", "id").values_list("student_id", flat=True)
+    if limit:
+        qs = qs[:limit]
+    return list(qs)
+
+
+def run_recompute_job(student_id: int) -> bool:
+    """Entry point for pool threads: each thread owns, and finally closes, its DB connection."""
+    try:
+        return run_recompute(student_id)
+    except Exception:
+        logger.exception("Profile recompute for student %s failed", student_id)
+        return False
+    finally:
+        connection.close()
+
+
+class _Scheduler:
+    """Holds student ids until their debounce window ends, then hands them to the pool."""
+
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="adaptive-recompute")
+        self._heap: List[tuple] = []
+        self._queued = set()
+        self._cond = threading.Condition()
+        threading.Thread(target=self._loop, name="adaptive-recompute-timer", daemon=True).start()
+
+    def submit(self, student_ids: Iterable[int], due: float):
+        with self._cond:
+            for student_id in student_ids:
+                if student_id not in self._queued:
+                    self._queued.add(student_id)
+                    heapq.heappush(self._heap, (due, student_id))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(timeout=(self._heap[0][0] - time.monotonic()) if self._heap else None)
+                _, student_id = heapq.heappop(self._heap)
+                self._queued.discard(student_id)
+            self._pool.submit(run_recompute_job, student_id)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _get_scheduler() -> _Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = _Scheduler(max(1, recompute_workers()))
+    return _scheduler
@@ -0,0 +1,133 @@
+"""
+Process-wide compiled adaptive rule table.
+
+AdaptiveRule rows change rarely, so each process compiles them once into a
+RuleTable and reuses it until the generation of the "adaptive_rules" cache
+tag moves (edu_platform.caching); saving or deleting an AdaptiveRule bumps
+it in every worker that shares the cache backend.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from edu_platform.caching import bump_cache_tags, tag_generations
+from users.models import AdaptiveRule
+
+RULES_TAG = "adaptive_rules"
+
+
+@dataclass
+class RuleLike:
+    min_success_rate: float
+    max_success_rate: float
+    min_attempts: int
+    action: str
+    recommendation_template: str
+
+
+DEFAULT_RULES = [
+    RuleLike(
+        min_success_rate=0.0,
+        max_success_rate=0.55,
+        min_attempts=1,
+        action="decrease_difficulty",
+        recommendation_template="Базалық деңгейдегі тапсырмаларды қайталаңыз.",
+    ),
+    RuleLike(
+        min_success_rate=0.55,
+        max_success_rate=0.8,
+        min_attempts=2,
+        action="reinforce_topic",
+        recommendation_template="Әлсіз тақырыптарға қосымша жаттығу берілді.",
+    ),
+    RuleLike(
+        min_success_rate=0.8,
+        max_success_rate=1.01,
+        min_attempts=2,
+        action="increase_difficulty",
+        recommendation_template="Күрделірек тапсырмаға көшуге дайынсыз.",
+    ),
+]
+
+
+def load_active_rules() -> List[RuleLike]:
+    db_rules = list(AdaptiveRule.objects.filter(is_active=True).order_by("min_success_rate", "id"))
+    if not db_rules:
+        return list(DEFAULT_RULES)
+    return [
+        RuleLike(
+            min_success_rate=r.min_success_rate,
+            max_success_rate=r.max_success_rate,
+            min_attempts=r.min_attempts,
+            action=r.action,
+            recommendation_template=r.recommendation_template,
+        )
+        for r in db_rules
+    ]
+
+
+class RuleTable:
+    """
+    Rules (in min_success_rate, id order) split into the score intervals
+    between their boundaries. Every interval keeps the rules covering it as
+    (negated min_attempts, rule) steps with strictly growing keys, so a
+    lookup is two bisections.
+
+    pick() returns the first rule covering the score whose min_attempts is
+    met, else the first rule covering the score, else the first rule.
+    """
+
+    def __init__(self, rules: Sequence[RuleLike]):
+        self.rules = list(rules)
+        self._bounds = sorted({r.min_success_rate for r in rules} | {r.max_success_rate for r in rules})
+        self._segments: List[Tuple[List[int], List[RuleLike], Optional[RuleLike]]] = []
+        for start in self._bounds:
+            covering = [r for r in self.rules if r.min_success_rate <= start < r.max_success_rate]
+            keys: List[int] = []
+            steps: List[RuleLike] = []
+            for rule in covering:
+                if not keys or -rule.min_attempts > keys[-1]:
+                    keys.append(-rule.min_attempts)
+                    steps.append(rule)
+            self._segments.append((keys, steps, covering[0] if covering else None))
+
+    def pick(self, score: float, attempts: int) -> RuleLike:
+        idx = bisect_right(self._bounds, score) - 1
+        if idx < 0:
+            return self.rules[0]
+        keys, steps, first = self._segments[idx]
+        if first is None:
+            return self.rules[0]
+        step = bisect_left(keys, -attempts)
+        return steps[step] if step < len(steps) else first
+
+
+_table: Optional[RuleTable] = None
+_table_generation = None
+_table_lock = threading.Lock()
+
+
+def rule_table() -> RuleTable:
+    global _table, _table_generation
+    generation = tag_generations([RULES_TAG])[0]
+    table = _table
+    if table is None or generation != _table_generation:
+        with _table_lock:
+            # Read the generation before the rows: a bump that races the load forces another compile.
+            table = RuleTable(load_active_rules())
+            _table, _table_generation = table, generation
+    return table
+
+
+def bump_rules_generation() -> None:
+    bump_cache_tags(RULES_TAG)
+
+
+@receiver(post_save, sender=AdaptiveRule)
+@receiver(post_delete, sender=AdaptiveRule)
+def _rule_changed(sender, **kwargs):
+    bump_rules_generation()
@@ -1,12 +1,25 @@
+import random
 from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APIClient
 
-from lessons.models import Assignment, Enrollment, Experiment, ExperimentParticipant, Lesson, Submission
-from slide.models import SlideTemplate
+from lessons import adaptive
+from lessons.adaptive import get_student_personalization, rebuild_student_profile
+from lessons.recompute import due_student_ids, run_recompute
+from lessons.rules import RuleLike, RuleTable, bump_rules_generation, rule_table
+from lessons.models import Assignment, Enrollment, Experiment, ExperimentParticipant, Lesson, Reward, Submission
+from slide.models import SlideTemplate, Submission as SlideSubmission
+from users.models import LearningTrajectoryNode, StudentProfile, StudentTopicStat
 
 
 User = get_user_model()
@@ -247,3 +260,380 @@ class AssignmentContentTests(TestCase):
         response = self.client.get(f"/api/slide/templates/{template.id}/")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data.get("id"), template.id)
+
+
+class IncrementalProfileTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_inc", password="pass1234", role="teacher")
+        self.student = User.objects.create_user(username="student_inc", password="pass1234", role="student")
+        self.lesson = Lesson.objects.create(owner=self.teacher, title="SQL", topic="SQL")
+        Enrollment.objects.create(student=self.student, lesson=self.lesson)
+        self.template = SlideTemplate.objects.create(
+            title="SQL quiz",
+            author=self.teacher,
+            template_type="quiz",
+            data={"question": "SELECT?", "options": ["Оқу", "Жою"], "answer": "Оқу"},
+        )
+        Assignment.objects.create(
+            lesson=self.lesson,
+            title="SQL quiz",
+            assignment_type="quiz",
+            content_id=self.template.id,
+            is_published=True,
+        )
+
+    def _submit(self, answer):
+        response = self.client.post(
+            "/api/slide/submissions/",
+            {"template": self.template.id, "data": {"answer": answer}, "duration_seconds": 10},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["adaptive_feedback"]
+
+    def test_incremental_updates_match_full_rebuild(self):
+        self.client.force_authenticate(self.student)
+        self._submit("Оқу")
+        self._submit("Жою")
+        feedback = self._submit("Оқу")
+        # The profile itself is recomputed after the debounce window; reads wait for it.
+        self.assertTrue(feedback["recompute_pending"])
+
+        stat = StudentTopicStat.objects.get(student=self.student, topic="SQL")
+        self.assertEqual(stat.attempts, 3)
+        self.assertEqual(stat.scored_attempts, 3)
+        self.assertAlmostEqual(stat.score_sum, 2.0)
+        self.assertEqual(stat.total_time_seconds, 30)
+
+        feedback = get_student_personalization(self.student)
+        rebuilt = rebuild_student_profile(self.student)
+        for key in ("average_score", "total_points", "total_time_seconds", "weak_topics", "progress_history"):
+            self.assertEqual(feedback[key], rebuilt[key])
+
+    def test_repeated_triggers_are_coalesced_into_one_recompute(self):
+        self.client.force_authenticate(self.student)
+        self._submit("Оқу")
+        with mock.patch("lessons.adaptive._save_profile", wraps=adaptive._save_profile) as save_profile:
+            self._submit("Жою")
+            self._submit("Оқу")
+            self.assertEqual(save_profile.call_count, 0)
+            self.assertEqual(due_student_ids(force=True), [self.student.id])
+
+            self.assertTrue(run_recompute(self.student.id))
+            self.assertFalse(run_recompute(self.student.id))
+        self.assertEqual(save_profile.call_count, 1)
+        self.assertEqual(due_student_ids(force=True), [])
+        self.assertAlmostEqual(StudentProfile.objects.get(student=self.student).average_score, 2 / 3)
+
+    @override_settings(ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS=0)
+    def test_zero_debounce_recomputes_inline(self):
+        self.client.force_authenticate(self.student)
+        self._submit("Оқу")
+        feedback = self._submit("Жою")
+        self.assertNotIn("recompute_pending", feedback)
+        self.assertEqual(feedback["average_score"], 50.0)
+        self.assertEqual(due_student_ids(force=True), [])
+
+    def test_command_skips_a_failing_student_instead_of_looping(self):
+        other = User.objects.create_user(username="student_inc_2", password="pass1234", role="student")
+        StudentProfile.objects.update_or_create(student=self.student, defaults={"recompute_requested_at": timezone.now()})
+        StudentProfile.objects.update_or_create(student=other, defaults={"recompute_requested_at": timezone.now()})
+        real_recompute = adaptive.recompute_student_profile
+
+        def recompute(student):
+            if student.id == self.student.id:
+                raise RuntimeError("broken profile")
+            return real_recompute(student)
+
+        out = StringIO()
+        # run_recompute_job closes its connection after each job; here that would be the test transaction.
+        with mock.patch.object(adaptive, "recompute_student_profile", side_effect=recompute), mock.patch(
+            "lessons.recompute.connection"
+        ), self.assertLogs("lessons.recompute", "ERROR"):
+            call_command("process_profile_recomputes", "--all", stdout=out)
+        self.assertIn("Recomputed student profiles: 1, skipped: 1", out.getvalue())
+        self.assertEqual(due_student_ids(force=True), [self.student.id])
+
+    def _topics(self):
+        return dict(StudentTopicStat.objects.filter(student=self.student).values_list("topic", "attempts"))
+
+    @override_settings(ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS=0)
+    def test_deleting_an_assignment_moves_its_submissions_to_the_template_topic(self):
+        self.client.force_authenticate(self.student)
+        self._submit("Оқу")
+        self.assertEqual(self._topics(), {"SQL": 1})
+
+        self.client.force_authenticate(self.teacher)
+        assignment = Assignment.objects.get(lesson=self.lesson)
+        self.assertEqual(self.client.delete(f"/api/lessons/assignments/{assignment.id}/").status_code, 204)
+        self.assertEqual(self._topics(), {"SQL quiz": 1})
+
+    @override_settings(ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS=0)
+    def test_renaming_a_lesson_keeps_its_progress(self):
+        second = Lesson.objects.create(owner=self.teacher, title="Joins", topic="Joins")
+        Enrollment.objects.create(student=self.student, lesson=second)
+        self.client.force_authenticate(self.student)
+        for _ in range(3):
+            self._submit("Оқу")
+
+        def trajectory():
+            nodes = LearningTrajectoryNode.objects.filter(student=self.student).order_by("order_index", "id")
+            return [(node.lesson_id, node.topic, node.status) for node in nodes]
+
+        self.assertEqual(trajectory(), [(self.lesson.id, "SQL", "completed"), (second.id, "Joins", "unlocked")])
+        self.client.force_authenticate(self.teacher)
+        response = self.client.patch(f"/api/lessons/lessons/{self.lesson.id}/", {"topic": "Databases"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._topics(), {"Databases": 3})
+        self.assertEqual(
+            trajectory(), [(self.lesson.id, "Databases", "completed"), (second.id, "Joins", "unlocked")]
+        )
+
+    @override_settings(ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS=0)
+    def test_deleting_a_lesson_drops_its_submissions_from_the_profile(self):
+        second = Lesson.objects.create(owner=self.teacher, title="Joins", topic="Joins")
+        Enrollment.objects.create(student=self.student, lesson=second)
+        for lesson, score in ((self.lesson, 0.1), (second, 0.9)):
+            assignment = Assignment.objects.create(lesson=lesson, title="Essay", assignment_type="other")
+            adaptive.record_lesson_submission(
+                Submission.objects.create(assignment=assignment, student=self.student, score=score)
+            )
+        self.assertAlmostEqual(StudentProfile.objects.get(student=self.student).average_score, 0.5)
+
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.delete(f"/api/lessons/lessons/{self.lesson.id}/").status_code, 204)
+        profile = StudentProfile.objects.get(student=self.student)
+        self.assertAlmostEqual(profile.average_score, 0.9)
+        self.assertEqual(profile.learning_level, "advanced")
+        self.assertEqual(self._topics(), {"Joins": 1})
+
+    @override_settings(ADAPTIVE_RECOMPUTE_DEBOUNCE_SECONDS=0)
+    def test_moving_a_submission_to_another_template_moves_its_topic(self):
+        other = SlideTemplate.objects.create(
+            title="Joins quiz",
+            author=self.teacher,
+            template_type="quiz",
+            data={"question": "JOIN?", "options": ["Иә", "Жоқ"], "answer": "Иә"},
+        )
+        self.client.force_authenticate(self.student)
+        self._submit("Оқу")
+        submission = SlideSubmission.objects.get(user=self.student)
+        response = self.client.patch(f"/api/slide/submissions/{submission.id}/", {"template": other.id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._topics(), {"SQL": 0, "Joins quiz": 1})
+
+    def test_trajectory_sync_writes_only_changed_nodes(self):
+        second = Lesson.objects.create(owner=self.teacher, title="Joins", topic="Joins")
+        Enrollment.objects.create(student=self.student, lesson=second)
+        stats = {"SQL": {"attempts": 2, "avg_score": 0.4}}
+        adaptive.sync_learning_trajectory(self.student, stats)
+        nodes = {node.lesson_id: node for node in LearningTrajectoryNode.objects.filter(student=self.student)}
+        self.assertEqual([nodes[self.lesson.id].status, nodes[second.id].status], ["review", "locked"])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = adaptive.sync_learning_trajectory(self.student, stats)
+        self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith(("UPDATE", "INSERT"))])
+        self.assertEqual([node["id"] for node in result["nodes"]], [nodes[self.lesson.id].id, nodes[second.id].id])
+
+        adaptive.sync_learning_trajectory(self.student, {"SQL": {"attempts": 3, "avg_score": 0.9}})
+        refreshed = {node.lesson_id: node for node in LearningTrajectoryNode.objects.filter(student=self.student)}
+        self.assertEqual([refreshed[self.lesson.id].status, refreshed[second.id].status], ["completed", "unlocked"])
+        self.assertGreater(refreshed[self.lesson.id].updated_at, nodes[self.lesson.id].updated_at)
+
+    def test_teacher_grading_replaces_previous_contribution(self):
+        assignment = Assignment.objects.create(lesson=self.lesson, title="Essay", assignment_type="other")
+        submission = Submission.objects.create(assignment=assignment, student=self.student, score=0.2)
+        self.client.force_authenticate(self.student)
+        self.client.get("/api/lessons/assignments/mine/")
+
+        self.client.force_authenticate(self.teacher)
+        response = self.client.patch(
+            f"/api/lessons/submissions/{submission.id}/",
+            {"score": 0.9},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        stat = StudentTopicStat.objects.get(student=self.student, topic="SQL")
+        self.assertEqual(stat.attempts, 1)
+        self.assertAlmostEqual(stat.score_sum, 0.9)
+
+
+class TeacherAnalyticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_analytics", password="pass1234", role="teacher")
+        self.student = User.objects.create_user(username="student_analytics", password="pass1234", role="student")
+        self.lesson = Lesson.objects.create(owner=self.teacher, title="Intro", topic="")
+        Enrollment.objects.create(student=self.student, lesson=self.lesson)
+        self.template = SlideTemplate.objects.create(
+            title="Quiz", author=self.teacher, template_type="quiz", data={"answer": "A"}
+        )
+        homework = Assignment.objects.create(lesson=self.lesson, title="Homework", assignment_type="other")
+        Assignment.objects.create(lesson=self.lesson, title="Quiz", content_id=self.template.id)
+        Submission.objects.create(assignment=homework, student=self.student, score=1.4, duration_seconds=60)
+
+    def test_grouped_totals(self):
+        SlideSubmission.objects.create(template=self.template, user=self.student, score=0.5, duration_seconds=30)
+        SlideSubmission.objects.create(template=self.template, user=self.student, data={"duration_seconds": "15"})
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get("/api/lessons/insights/teacher/")
+        self.assertEqual(response.status_code, 200)
+
+        summary = response.data["summary"]
+        self.assertEqual(summary["attempts_count"], 3)
+        self.assertEqual(summary["scored_attempts"], 2)
+        # 1.4 is clamped to 1.0 before averaging.
+        self.assertEqual(summary["group_average_score"], 75.0)
+        self.assertEqual(summary["total_time_seconds"], 105)
+        self.assertEqual(response.data["hardest_topics"], [{"topic": "Intro", "attempts": 3, "average_score": 75.0}])
+
+    def _profile_snapshot(self, student):
+        profile = StudentProfile.objects.get(student=student)
+        return (
+            [getattr(profile, field) for field in adaptive._PROFILE_FIELDS + ["progress_history"]],
+            list(StudentTopicStat.objects.filter(student=student).values_list("topic", "attempts", "score_sum")),
+            list(
+                LearningTrajectoryNode.objects.filter(student=student)
+                .order_by("order_index")
+                .values_list("lesson_id", "topic", "status", "mastery", "recommendation")
+            ),
+        )
+
+    def test_missing_profiles_are_built_in_bulk(self):
+        other = User.objects.create_user(username="student_analytics_2", password="pass1234", role="student")
+        second_lesson = Lesson.objects.create(owner=self.teacher, title="Next", topic="Loops")
+        for student in (self.student, other):
+            Enrollment.objects.create(student=student, lesson=second_lesson)
+        Enrollment.objects.create(student=other, lesson=self.lesson)
+        SlideSubmission.objects.create(template=self.template, user=other, score=0.3, duration_seconds=20)
+        SlideSubmission.objects.create(template=self.template, user=other, score=0.4)
+        Reward.objects.create(student=other, title="Star")
+
+        self.client.force_authenticate(self.teacher)
+        with mock.patch.object(adaptive, "recompute_student_profile", side_effect=AssertionError):
+            response = self.client.get("/api/lessons/insights/teacher/")
+        self.assertEqual(response.status_code, 200)
+        bulk = [self._profile_snapshot(student) for student in (self.student, other)]
+
+        for student in (self.student, other):
+            rebuild_student_profile(student)
+        self.assertEqual(bulk, [self._profile_snapshot(student) for student in (self.student, other)])
+        self.assertEqual([node[2] for node in bulk[1][2]], ["unlocked", "locked"])
+
+    def test_benchmark_payloads_match_row_wise_aggregation(self):
+        call_command(
+            "benchmark_teacher_analytics",
+            students=8,
+            lessons=4,
+            slide_submissions=400,
+            days=5,
+            stdout=StringIO(),
+        )
+
+
+def _linear_pick(rules, score, attempts):
+    """The previous _pick_rule scan, kept as the reference for RuleTable."""
+    matching = [rule for rule in rules if rule.min_success_rate <= score < rule.max_success_rate]
+    for rule in matching:
+        if attempts >= rule.min_attempts:
+            return rule
+    return matching[0] if matching else rules[0]
+
+
+class AdaptiveRuleTableTests(TestCase):
+    def setUp(self):
+        self.addCleanup(bump_rules_generation)
+
+    def test_table_matches_linear_scan(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            rules = []
+            for idx in range(rng.randint(1, 8)):
+                low = rng.choice([0.0, 0.2, 0.5, 0.55, 0.8, rng.random()])
+                rules.append(
+                    RuleLike(low, low + rng.choice([0.1, 0.3, 0.5, 1.01]), rng.randint(0, 4), f"a{idx}", "")
+                )
+            rules.sort(key=lambda rule: rule.min_success_rate)
+            table = RuleTable(rules)
+            for score in [rng.uniform(-0.1, 1.6) for _ in range(20)] + [r.min_success_rate for r in rules]:
+                attempts = rng.randint(0, 5)
+                self.assertIs(table.pick(score, attempts), _linear_pick(rules, score, attempts))
+
+    def test_rule_writes_invalidate_the_compiled_table(self):
+        teacher = User.objects.create_user(username="teacher_rules", password="pass1234", role="teacher")
+        self.assertEqual(rule_table().pick(0.9, 5).action, "increase_difficulty")
+
+        client = APIClient()
+        client.force_authenticate(teacher)
+        response = client.post(
+            "/api/auth/adaptive-rules/",
+            {
+                "name": "Always reinforce",
+                "min_success_rate": 0.0,
+                "max_success_rate": 1.01,
+                "min_attempts": 1,
+                "action": "reinforce_topic",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(rule_table().pick(0.9, 5).action, "reinforce_topic")
+
+        with CaptureQueriesContext(connection) as queries:
+            rule_table()
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        client.delete(f"/api/auth/adaptive-rules/{response.data['id']}/")
+        self.assertEqual(rule_table().pick(0.9, 5).action, "increase_difficulty")
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_cache", password="pass1234", role="teacher")
+        self.student = User.objects.create_user(username="student_cache", password="pass1234", role="student")
+        self.lesson = Lesson.objects.create(owner=self.teacher, title="Fractions", topic="Fractions")
+        Enrollment.objects.create(student=self.student, lesson=self.lesson)
+
+    def test_lesson_list_is_cached_per_user_and_invalidated_by_writes(self):
+        self.client.force_authenticate(self.teacher)
+        first = self.client.get("/api/lessons/lessons/")
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get("/api/lessons/lessons/")
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual([row["title"] for row in self.client.get("/api/lessons/lessons/").data], ["Fractions"])
+
+        self.client.force_authenticate(self.teacher)
+        self.client.patch(f"/api/lessons/lessons/{self.lesson.id}/", {"title": "Decimals"}, format="json")
+        self.assertEqual([row["title"] for row in self.client.get("/api/lessons/lessons/").data], ["Decimals"])
+        self.client.force_authenticate(self.student)
+        self.assertEqual([row["title"] for row in self.client.get("/api/lessons/lessons/").data], ["Decimals"])
+
+    def test_my_assignments_follow_new_assignments_and_trajectory(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get("/api/lessons/assignments/mine/").data, [])
+
+        assignment = Assignment.objects.create(lesson=self.lesson, title="Worksheet", assignment_type="other")
+        adaptive.recompute_student_profile(self.student)
+        self.assertEqual(
+            [row["id"] for row in self.client.get("/api/lessons/assignments/mine/").data], [assignment.id]
+        )
+
+    def test_personalization_is_cached_until_the_profile_changes(self):
+        get_student_personalization(self.student)  # builds the profile
+        first = get_student_personalization(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_student_personalization(self.student), first)
+        self.assertFalse([q for q in queries.captured_queries if "learning_trajectory" in q["sql"]])
+
+        Submission.objects.create(
+            assignment=Assignment.objects.create(lesson=self.lesson, title="Quiz"), student=self.student, score=1.0
+        )
+        rebuild_student_profile(self.student)
+        self.assertEqual(get_student_personalization(self.student)["average_score"], 100.0)
@@ -31,12 +31,18 @@ from .serializers import (
     ExperimentSerializer,
     ExperimentParticipantSerializer,
 )
+from edu_platform.caching import cache_response, cached_payload, request_cache_parts
 from users.models import LearningTrajectoryNode, User
 from .adaptive import (
     build_teacher_analytics,
+    discard_student_entry,
     get_student_personalization,
+    lesson_student_ids,
+    lesson_submission_entry,
     recompute_student_profile,
+    record_lesson_submission,
 )
+from .recompute import schedule_rebuild_many, schedule_recompute, wait_for_recompute
 from .assignment_content import build_assignment_description, normalize_assignment_type
 
 try:
@@ -308,11 +314,29 @@ class LessonViewSet(viewsets.ModelViewSet):
             Q(enrollments__student=u) | Q(is_shared=True)
         ).distinct().order_by("-id")
 
+    @cache_response(tags=["lessons"])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         if not is_teacher(self.request.user):
             raise PermissionDenied("Only teachers can create lessons.")
         serializer.save(owner=self.request.user)
 
+    def perform_update(self, serializer):
+        previous = (serializer.instance.title, serializer.instance.topic)
+        lesson = serializer.save()
+        # Trajectory topics are derived from the lesson title/topic, and so are the stored
+        # per-topic aggregates: rescan instead of recomputing from the old topic's rows.
+        if (lesson.title, lesson.topic) != previous:
+            schedule_rebuild_many(lesson_student_ids(lesson.id))
+
+    def perform_destroy(self, instance):
+        student_ids = lesson_student_ids(instance.id)
+        super().perform_destroy(instance)
+        # The cascade removes submissions without discarding them from the aggregates.
+        schedule_rebuild_many(student_ids)
+
     @action(detail=True, methods=["post"])
     def share(self, request, pk=None):
         lesson = self.get_object()
@@ -333,7 +357,7 @@ class LessonViewSet(viewsets.ModelViewSet):
         if not lesson:
             return Response({"detail": "Lesson not found"}, status=404)
         Enrollment.objects.get_or_create(student=request.user, lesson=lesson)
-        recompute_student_profile(request.user)
+        schedule_recompute(request.user)
         return Response(LessonSerializer(lesson).data, status=201)
 
     @action(detail=True, methods=["post"], url_path="enroll")
@@ -364,7 +388,7 @@ class LessonViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Student not found"}, status=404)
 
         enrollment, _ = Enrollment.objects.get_or_create(student=student, lesson=lesson)
-        recompute_student_profile(student)
+        schedule_recompute(student)
         return Response(EnrollmentSerializer(enrollment).data, status=201)
 
 
@@ -389,6 +413,13 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         if not is_student(self.request.user):
             raise PermissionDenied("Only students can enroll.")
         serializer.save(student=self.request.user)
+        schedule_recompute(self.request.user)
+
+    def perform_destroy(self, instance):
+        student = instance.student
+        super().perform_destroy(instance)
+        # Slide submissions were attributed to this lesson's assignments through the enrollment.
+        schedule_rebuild_many([student.id])
 
 
 # ===================== ASSIGNMENT (TEACHER ONLY) =====================
@@ -432,17 +463,42 @@ class AssignmentViewSet(viewsets.ModelViewSet):
                 lesson_topic=lesson.topic,
             )
 
-        serializer.save(
+        assignment = serializer.save(
             assignment_type=assignment_type,
             description=description,
         )
+        if assignment.content_id:
+            # Earlier submissions of the template now count towards this lesson's topic.
+            schedule_rebuild_many(lesson_student_ids(lesson.id))
+
+    def perform_update(self, serializer):
+        previous = (serializer.instance.lesson_id, serializer.instance.content_id)
+        assignment = serializer.save()
+        if (assignment.lesson_id, assignment.content_id) != previous:
+            schedule_rebuild_many(lesson_student_ids(previous[0]) | lesson_student_ids(assignment.lesson_id))
+
+    def perform_destroy(self, instance):
+        student_ids = lesson_student_ids(instance.lesson_id)
+        super().perform_destroy(instance)
+        schedule_rebuild_many(student_ids)
 
     @action(detail=False, methods=["get"], url_path="mine")
     def my_assignments(self, request):
         u = request.user
         if not is_student(u):
             raise PermissionDenied("Only students can access this endpoint.")
-        recompute_student_profile(u)
+        # Unlocked lessons come from the trajectory, so finish any pending recompute first.
+        wait_for_recompute(u)
+        data = cached_payload(
+            "assignments.mine",
+            request_cache_parts(request),
+            ["assignments", f"student:{u.id}"],
+            lambda: self._my_assignments_data(request),
+        )
+        return Response(data)
+
+    def _my_assignments_data(self, request):
+        u = request.user
         lesson_id = request.query_params.get("lesson")
         include_locked_raw = str(request.query_params.get("include_locked", "")).strip().lower()
         include_locked = include_locked_raw in {"1", "true", "yes", "on"}
@@ -462,8 +518,7 @@ class AssignmentViewSet(viewsets.ModelViewSet):
                 qs = qs.filter(lesson_id__in=unlocked_lessons)
             else:
                 qs = qs.none()
-        data = AssignmentSerializer(qs, many=True).data
-        return Response(data)
+        return AssignmentSerializer(qs, many=True).data
 
     @action(detail=True, methods=["post"])
     def assign(self, request, pk=None):
@@ -525,12 +580,12 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         if not ok:
             raise PermissionDenied("This assignment is not assigned to you.")
 
-        serializer.save(student=u)
+        self.created_submission = serializer.save(student=u)
 
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
         if is_student(request.user):
-            feedback = recompute_student_profile(request.user)
+            feedback = record_lesson_submission(self.created_submission)
             if isinstance(response.data, dict):
                 response.data["adaptive_feedback"] = feedback
         return response
@@ -541,10 +596,12 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             # students cannot set score/feedback
             if "score" in request.data or "feedback" in request.data:
                 raise PermissionDenied("Students cannot set score/feedback.")
+        previous = lesson_submission_entry(self.get_object())
         response = super().update(request, *args, **kwargs)
-        student = self.get_object().student
+        submission = self.get_object()
+        student = submission.student
         if student and is_student(student):
-            feedback = recompute_student_profile(student)
+            feedback = record_lesson_submission(submission, previous=previous)
             if isinstance(response.data, dict):
                 response.data["adaptive_feedback"] = feedback
         return response
@@ -554,13 +611,15 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         if is_student(u):
             if "score" in request.data or "feedback" in request.data:
                 raise PermissionDenied("Students cannot set score/feedback.")
-        response = super().partial_update(request, *args, **kwargs)
-        student = self.get_object().student
+        # ModelViewSet.partial_update delegates to update(), which folds the change in.
+        return super().partial_update(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        student = instance.student
+        entry = lesson_submission_entry(instance)
+        super().perform_destroy(instance)
         if student and is_student(student):
-            feedback = recompute_student_profile(student)
-            if isinstance(response.data, dict):
-                response.data["adaptive_feedback"] = feedback
-        return response
+            discard_student_entry(student, entry)
 
 
 # ===================== REWARDS =====================
@@ -585,7 +644,7 @@ class RewardViewSet(viewsets.ModelViewSet):
         if not ok:
             raise PermissionDenied("Student not in your lessons.")
         reward = serializer.save()
-        recompute_student_profile(reward.student)
+        schedule_recompute(reward.student)
 
     @action(detail=False, methods=["get"], url_path="leaderboard")
     def leaderboard(self, request):
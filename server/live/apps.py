@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LiveConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'live'
+
+    def ready(self):
+        from . import deck  # noqa: F401  (deck version signal receivers)
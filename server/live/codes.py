@@ -0,0 +1,81 @@
+"""
+Live session join codes.
+
+Codes are 6 characters over CODE_ALPHABET. The n-th allocation gets the code
+at position permute(n) of the code space: permute is a keyed Feistel
+permutation (key derived from SECRET_KEY), so consecutive sessions get
+unrelated-looking codes and two allocations never share one until the whole
+space (33**6, about 1.3 billion) has been handed out.
+
+Lookups compare normalize_live_code() forms: case, spacing and the Cyrillic
+letters that look like Latin ones do not matter.
+"""
+import hashlib
+
+from django.conf import settings
+
+CODE_ALPHABET = "ABCDEFGHIJKLMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 6
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+
+CLEAR_CODE_TRANSLATION = str.maketrans(
+    {
+        "А": "A",
+        "В": "B",
+        "С": "C",
+        "Е": "E",
+        "Н": "H",
+        "К": "K",
+        "М": "M",
+        "О": "O",
+        "Р": "P",
+        "Т": "T",
+        "У": "Y",
+        "Х": "X",
+        "І": "I",
+    }
+)
+
+_HALF_BITS = 16
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def normalize_live_code(value: str) -> str:
+    raw = (value or "").strip().upper().translate(CLEAR_CODE_TRANSLATION)
+    return "".join(ch for ch in raw if ch.isalnum())
+
+
+def _round_keys():
+    digest = hashlib.sha256(("live-code:" + settings.SECRET_KEY).encode("utf-8")).digest()
+    return [int.from_bytes(digest[i * 4 : i * 4 + 4], "big") for i in range(_ROUNDS)]
+
+
+def _feistel(value: int, keys) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in keys:
+        mixed = hashlib.blake2b(right.to_bytes(2, "big"), digest_size=2, key=key.to_bytes(4, "big")).digest()
+        left, right = right, left ^ int.from_bytes(mixed, "big")
+    return (left << _HALF_BITS) | right
+
+
+def permute(index: int) -> int:
+    """Bijection of range(CODE_SPACE) onto itself (cycle-walking a 32-bit Feistel network)."""
+    keys = _round_keys()
+    value = index % CODE_SPACE
+    while True:
+        value = _feistel(value, keys)
+        if value < CODE_SPACE:
+            return value
+
+
+def encode_live_code(position: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        position, digit = divmod(position, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def live_code_for(sequence: int) -> str:
+    return encode_live_code(permute(sequence))
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LiveSession
+from .office import ConversionFailed, render_pdf_pages
+
+logger = logging.getLogger(__name__)
+
+# A job left "running" longer than this is assumed to belong to a dead worker.
+STALE_RUNNING_SECONDS = 15 * 60
+# Phone and projector/laptop sizes of the per-page slide images.
+PAGE_WIDTHS = (640, 1280)
+
+
+def pptx_sha256(live: LiveSession) -> str:
+    digest = hashlib.sha256()
+    live.pptx_file.open("rb")
+    try:
+        for chunk in live.pptx_file.chunks():
+            digest.update(chunk)
+    finally:
+        live.pptx_file.close()
+    return digest.hexdigest()
+
+
+def _cached_preview(live: LiveSession) -> Optional[Tuple[str, dict]]:
+    """PDF name and page images of an already converted deck with the same PPTX content, if any."""
+    if not live.pptx_sha256:
+        return None
+    return (
+        LiveSession.objects.filter(
+            pptx_sha256=live.pptx_sha256,
+            pptx_preview_status=LiveSession.PREVIEW_DONE,
+        )
+        .exclude(pk=live.pk)
+        .exclude(pptx_preview_pdf="")
+        .exclude(pptx_preview_pdf__isnull=True)
+        .order_by("-pptx_preview_updated_at")
+        .values_list("pptx_preview_pdf", "pptx_pages")
+        .first()
+    )
+
+
+def _reuse_cached(live: LiveSession, cached: Tuple[str, dict], extra_fields=()):
+    live.pptx_preview_pdf.name, live.pptx_pages = cached
+    _set_status(live, LiveSession.PREVIEW_DONE, ["pptx_preview_pdf", "pptx_pages", *extra_fields])
+
+
+def render_preview_pages(live: LiveSession) -> bool:
+    """Split the preview PDF into per-page images under MEDIA_ROOT, shared by decks with the same hash."""
+    widths = list(getattr(settings, "LIVE_PPTX_PAGE_WIDTHS", PAGE_WIDTHS))
+    prefix = f"live/pptx_pages/{live.pptx_sha256 or live.pk}"
+    temp_dir = tempfile.mkdtemp(prefix="live_pages_")
+    try:
+        ext, rendered = render_pdf_pages(live.pptx_preview_pdf.path, temp_dir, widths)
+        count = min(len(paths) for paths in rendered.values()) if rendered else 0
+        for width, paths in rendered.items():
+            for number, path in enumerate(paths[:count], start=1):
+                name = f"{prefix}/{width}/{number}.{ext}"
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                with open(path, "rb") as fh:
+                    default_storage.save(name, File(fh))
+    except (ConversionFailed, OSError):
+        logger.exception("Rendering preview pages failed for live session %s", live.pk)
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    live.pptx_pages = {"count": count, "widths": widths, "ext": ext, "prefix": prefix}
+    live.save(update_fields=["pptx_pages"])
+    return count > 0
+
+
+def preview_page_urls(live: LiveSession, page_index: int) -> Optional[Dict[str, str]]:
+    """Storage URLs of one rendered page keyed by width, or None if the page does not exist."""
+    pages = live.pptx_pages or {}
+    if not 0 <= page_index < pages.get("count", 0):
+        return None
+    return {
+        str(width): default_storage.url(f"{pages['prefix']}/{width}/{page_index + 1}.{pages['ext']}")
+        for width in pages["widths"]
+    }
+
+
+def _set_status(live: LiveSession, status: str, extra_fields=()):
+    live.pptx_preview_status = status
+    live.pptx_preview_updated_at = timezone.now()
+    live.save(update_fields=["pptx_preview_status", "pptx_preview_updated_at", *extra_fields])
+
+
+def enqueue_pptx_preview(live: LiveSession) -> str:
+    """
+    Queue the session's PPTX for PDF conversion and return the resulting status.
+    Re-uploads of an already converted deck are served from the content-hash cache.
+    """
+    if not live.pptx_file:
+        return live.pptx_preview_status
+    if live.pptx_preview_status in (LiveSession.PREVIEW_PENDING, LiveSession.PREVIEW_RUNNING):
+        return live.pptx_preview_status
+
+    if not live.pptx_sha256:
+        live.pptx_sha256 = pptx_sha256(live)
+    cached = _cached_preview(live)
+    if cached:
+        _reuse_cached(live, cached, ["pptx_sha256"])
+        return live.pptx_preview_status
+
+    _set_status(live, LiveSession.PREVIEW_PENDING, ["pptx_sha256"])
+    if conversion_workers() > 0:
+        live_id = live.pk
+        transaction.on_commit(lambda: _get_executor().submit(run_conversion_job, live_id))
+    return live.pptx_preview_status
+
+
+def _claim(live_id: int) -> bool:
+    """Move a job to "running"; the conditional UPDATE is the per-session lock."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_RUNNING_SECONDS)
+    claimable = Q(pptx_preview_status=LiveSession.PREVIEW_PENDING) | Q(
+        pptx_preview_status=LiveSession.PREVIEW_RUNNING,
+        pptx_preview_updated_at__lt=stale,
+    )
+    claimed = LiveSession.objects.filter(claimable, pk=live_id).update(
+        pptx_preview_status=LiveSession.PREVIEW_RUNNING,
+        pptx_preview_updated_at=now,
+    )
+    return claimed == 1
+
+
+def convert_pptx_preview(live_id: int) -> Optional[str]:
+    """Run one queued conversion. Returns the final status, or None if another worker owns the job."""
+    if not _claim(live_id):
+        return None
+    live = LiveSession.objects.get(pk=live_id)
+
+    # An identical deck may have finished converting while this one waited in the queue.
+    cached = _cached_preview(live)
+    if cached:
+        _reuse_cached(live, cached)
+        return live.pptx_preview_status
+
+    try:
+        converted = live.generate_pptx_preview_pdf()
+    except Exception:
+        logger.exception("PPTX conversion crashed for live session %s", live_id)
+        converted = False
+    if converted:
+        # Students fall back to the whole PDF if the page images cannot be rendered.
+        render_preview_pages(live)
+    _set_status(live, LiveSession.PREVIEW_DONE if converted else LiveSession.PREVIEW_FAILED)
+    return live.pptx_preview_status
+
+
+def pending_conversion_ids(limit: Optional[int] = None) -> List[int]:
+    stale = timezone.now() - timedelta(seconds=STALE_RUNNING_SECONDS)
+    qs = (
+        LiveSession.objects.filter(
+            Q(pptx_preview_status=LiveSession.PREVIEW_PENDING)
+            | Q(pptx_preview_status=LiveSession.PREVIEW_RUNNING, pptx_preview_updated_at__lt=stale)
+        )
+        .order_by("pptx_preview_updated_at", "id")
+        .values_list("id", flat=True)
+    )
+    if limit:
+        qs = qs[:limit]
+    return list(qs)
+
+
+def conversion_workers() -> int:
+    return max(0, int(getattr(settings, "LIVE_PPTX_CONVERSION_WORKERS", 2)))
+
+
+def run_conversion_job(live_id: int) -> Optional[str]:
+    """Entry point for pool threads: each thread owns, and finally closes, its DB connection."""
+    try:
+        return convert_pptx_preview(live_id)
+    except Exception:
+        logger.exception("PPTX conversion job %s failed", live_id)
+        return None
+    finally:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, conversion_workers()),
+                    thread_name_prefix="live-pptx",
+                )
+    return _executor
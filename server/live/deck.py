@@ -0,0 +1,109 @@
+import hashlib
+import json
+from typing import Optional
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lessons.models import Lesson
+from slide.models import Slide, SlideObject
+
+DECK_CACHE_SECONDS = 60 * 60
+
+
+def bump_deck_version(lesson_id: int):
+    """Invalidate the lesson's deck snapshot; the new version becomes visible with the transaction."""
+    bump_deck_versions([lesson_id])
+
+
+def bump_deck_versions(lesson_ids):
+    """bump_deck_version for several lessons in one UPDATE (bulk writes skip the save signals)."""
+    Lesson.objects.filter(pk__in=list(lesson_ids)).update(deck_version=F("deck_version") + 1)
+
+
+def _slide_body(index: int, total: int, slide: Optional[dict]) -> bytes:
+    payload = {
+        "slide_index": index,
+        "total_slides": total,
+        "slide": {"id": slide["id"], "title": slide["title"]} if slide else None,
+        "objects": slide["objects"] if slide else [],
+    }
+    return json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False).encode("utf-8")
+
+
+def _build_snapshot(lesson_id: int, version: int) -> dict:
+    slides = list(
+        Slide.objects.filter(lesson_id=lesson_id)
+        .order_by("order", "id")
+        .values("id", "title")
+    )
+    objects_by_slide = {slide["id"]: [] for slide in slides}
+    objects = (
+        SlideObject.objects.filter(slide__lesson_id=lesson_id)
+        .only("id", "slide_id", "object_type", "data", "position", "z_index")
+        .order_by("z_index", "id")
+    )
+    for obj in objects:
+        objects_by_slide[obj.slide_id].append(
+            {
+                "id": obj.id,
+                "object_type": obj.object_type,
+                "data": obj.data or {},
+                "position": obj.position or {},
+                "z_index": obj.z_index or 0,
+            }
+        )
+
+    total = len(slides)
+    for index, slide in enumerate(slides):
+        slide["objects"] = objects_by_slide[slide["id"]]
+        slide["body"] = _slide_body(index, total, slide)
+        slide["etag"] = '"%s"' % hashlib.md5(slide["body"]).hexdigest()
+    empty_body = _slide_body(0, 0, None)
+    return {
+        "lesson_id": lesson_id,
+        "version": version,
+        "slides": slides,
+        "empty_body": empty_body,
+        "empty_etag": '"%s"' % hashlib.md5(empty_body).hexdigest(),
+    }
+
+
+def get_deck_snapshot(lesson: Lesson) -> dict:
+    """
+    Ordered slides of a lesson with their objects and the ready-made
+    current-slide JSON for each index. Cached per Lesson.deck_version.
+    """
+    lesson_id, version = lesson.id, lesson.deck_version
+    key = f"live:deck:{lesson_id}:{version}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _build_snapshot(lesson_id, version)
+        cache.set(key, snapshot, timeout=DECK_CACHE_SECONDS)
+    return snapshot
+
+
+def deck_slide_at(snapshot: dict, slide_index: int):
+    """Return (slide, safe_index, total); slide is None for an empty deck."""
+    slides = snapshot["slides"]
+    total = len(slides)
+    if total == 0:
+        return None, 0, 0
+    idx = max(0, min(int(slide_index), total - 1))
+    return slides[idx], idx, total
+
+
+@receiver(post_save, sender=Slide)
+@receiver(post_delete, sender=Slide)
+def _slide_changed(sender, instance, **kwargs):
+    if instance.lesson_id:
+        bump_deck_version(instance.lesson_id)
+
+
+@receiver(post_save, sender=SlideObject)
+@receiver(post_delete, sender=SlideObject)
+def _slide_object_changed(sender, instance, **kwargs):
+    Lesson.objects.filter(slides__id=instance.slide_id).update(deck_version=F("deck_version") + 1)
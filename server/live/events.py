@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from edu_platform.caching import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSubscription:
+    """One connected client: a bounded queue bound to the event loop that reads it."""
+
+    def __init__(self, session_id: int, user_id: Optional[int], maxsize: int = 100):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event: Dict[str, Any]):
+        # Slow clients lose the oldest events instead of blocking publishers.
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+class InProcessChannelLayer:
+    """
+    Live event fan-out inside a single process.
+    Publishers may run in any thread (sync views); delivery is marshalled onto each subscriber's loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups: Dict[int, Set[LiveSubscription]] = defaultdict(set)
+
+    def subscribe(self, session_id: int, user_id: Optional[int] = None) -> LiveSubscription:
+        subscription = LiveSubscription(session_id, user_id)
+        with self._lock:
+            self._groups[session_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        with self._lock:
+            group = self._groups.get(subscription.session_id)
+            if group is None:
+                return
+            group.discard(subscription)
+            if not group:
+                self._groups.pop(subscription.session_id, None)
+
+    def publish(self, session_id: int, event: Dict[str, Any]):
+        with self._lock:
+            targets = list(self._groups.get(session_id, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop already closed; the connection is going away.
+                self.unsubscribe(subscription)
+
+    def online_user_ids(self, session_id: int) -> Set[int]:
+        with self._lock:
+            return {s.user_id for s in self._groups.get(session_id, ()) if s.user_id is not None}
+
+
+class RedisChannelLayer(InProcessChannelLayer):
+    """
+    Live event fan-out across worker processes through Redis pub/sub.
+    publish() sends the event to Redis; every process that has sockets
+    subscribed listens on one background thread and hands what arrives to
+    its own subscribers, the one that published included.
+    """
+
+    prefix = "live:events:"
+
+    def __init__(self, url: Optional[str] = None):
+        super().__init__()
+        self.url = url or getattr(settings, "CACHE_URL", "")
+        self._client = None
+        self._listener = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def subscribe(self, session_id: int, user_id: Optional[int] = None) -> LiveSubscription:
+        with self._lock:
+            # is_alive() is False in a forked worker, which then starts its own listener.
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="live-events", daemon=True)
+                self._listener.start()
+        return super().subscribe(session_id, user_id)
+
+    def publish(self, session_id: int, event: Dict[str, Any]):
+        self._redis().publish(f"{self.prefix}{session_id}", json.dumps(event, cls=DjangoJSONEncoder))
+
+    def deliver(self, message: Dict[str, Any]):
+        """Hand one pub/sub message to the sockets of this process."""
+        channel = message["channel"]
+        channel = channel.decode() if isinstance(channel, bytes) else channel
+        session_id = int(channel[len(self.prefix) :])
+        super().publish(session_id, json.loads(message["data"]))
+
+    def _listen(self):
+        import redis
+
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + "*")
+                for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self.deliver(message)
+            except redis.RedisError:
+                logger.exception("Live event listener lost its Redis connection")
+                time.sleep(1)
+
+
+_layers: Dict[str, object] = {}
+_layer_lock = threading.Lock()
+
+
+def _layer_path() -> str:
+    path = getattr(settings, "LIVE_CHANNEL_LAYER", "")
+    if path:
+        return path
+    if cache_is_shared():
+        return "live.events.RedisChannelLayer"
+    return "live.events.InProcessChannelLayer"
+
+
+def get_channel_layer():
+    path = _layer_path()
+    layer = _layers.get(path)
+    if layer is None:
+        with _layer_lock:
+            layer = _layers.get(path)
+            if layer is None:
+                layer = _layers[path] = import_string(path)()
+    return layer
+
+
+def publish_live_event(session_id: int, event_type: str, **payload):
+    event = {"type": event_type, "session_id": session_id, **payload}
+    layer = get_channel_layer()
+    transaction.on_commit(lambda: layer.publish(session_id, event))
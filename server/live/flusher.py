@@ -0,0 +1,63 @@
+"""
+Background write-behind of live state buffered by this process.
+
+The first buffered write (a slide change or a heartbeat) starts one daemon
+thread per process that flushes every LIVE_STATE_FLUSH_SECONDS or
+LIVE_PRESENCE_FLUSH_SECONDS, whichever is shorter, so rows catch up even when
+no further write arrives. `python manage.py flush_live_state --loop` flushes
+state kept in a shared store from a separate process.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def flush_interval() -> float:
+    seconds = min(getattr(settings, "LIVE_STATE_FLUSH_SECONDS", 10), getattr(settings, "LIVE_PRESENCE_FLUSH_SECONDS", 10))
+    return max(1, seconds)
+
+
+def flush_all() -> int:
+    """Flush everything this process buffers; returns the number of rows written."""
+    from .presence import flush_presence
+    from .state import flush_live_state
+
+    written = 0
+    for flush in (flush_presence, flush_live_state):
+        try:
+            written += flush(force=True)
+        except Exception:
+            logger.exception("Live state flush failed")
+    return written
+
+
+def _run():
+    while True:
+        time.sleep(flush_interval())
+        try:
+            flush_all()
+        finally:
+            # This thread's own connection; never left open between rounds.
+            connections.close_all()
+
+
+def start_background_flush():
+    """Start this process's flusher thread unless it runs already (or LIVE_BACKGROUND_FLUSH is off)."""
+    global _thread
+    if not getattr(settings, "LIVE_BACKGROUND_FLUSH", True):
+        return
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        # is_alive() is False in a forked worker, which then starts its own thread.
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="live-flush", daemon=True)
+            _thread.start()
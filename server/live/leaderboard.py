@@ -0,0 +1,273 @@
+"""
+Incrementally maintained live leaderboards.
+
+Each process keeps, per active session, every participant in leaderboard
+order ((-points, -best_streak, joined_at, id)) together with the version at
+which each position last changed. Awards and joins move one row in place
+instead of re-running the ORDER BY, and a client that sends the version it
+holds gets back only the positions that changed since.
+
+The version is bumped on every change, so with several workers a process
+whose board is behind notices it on the next read and reloads the session
+once from the DB. A board is only ever answered at the shared version, so
+versions mean the same in every worker. It lives in the default cache when
+that is Redis, in process memory with LIVE_SINGLE_PROCESS, and otherwise in
+LiveSession.leaderboard_version (other caches cull keys and do not
+increment atomically).
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from edu_platform.caching import cache_is_shared
+
+from .models import LiveParticipant, LiveSession
+from .presence import ONLINE_WINDOW_SECONDS, get_presence_store
+from .serializers import LiveParticipantSerializer
+
+VERSION_PREFIX = "live:leaderboard:"
+# Filled in per response from the presence store; they do not move the version.
+PRESENCE_FIELDS = ("last_seen_at", "is_online")
+
+Key = Tuple[int, int, object, int]
+
+
+def _key(participant) -> Key:
+    return (-participant.points, -participant.best_streak, participant.joined_at, participant.id)
+
+
+def _row(participant_data) -> dict:
+    return {name: value for name, value in participant_data.items() if name not in PRESENCE_FIELDS}
+
+
+class _Board:
+    def __init__(self, version: int):
+        self.version = version
+        # Clients holding an older version than this get the full list.
+        self.base_version = version
+        self.keys: List[Key] = []
+        self.slot_versions: List[int] = []
+        self.rows: Dict[int, dict] = {}
+        self.key_by_id: Dict[int, Key] = {}
+        self.seen_by_id: Dict[int, object] = {}
+
+    def _mark(self, start: int, stop: int, version: int):
+        for index in range(start, stop + 1):
+            self.slot_versions[index] = version
+
+    def replace(self, entries, version: int):
+        """entries: (key, row, last_seen_at) in leaderboard order."""
+        old_ids = [key[-1] for key in self.keys]
+        old_rows = self.rows
+        self.keys = [key for key, _, _ in entries]
+        self.rows = {key[-1]: row for key, row, _ in entries}
+        self.key_by_id = {key[-1]: key for key in self.keys}
+        self.seen_by_id = {key[-1]: seen for key, _, seen in entries}
+        slot_versions = []
+        for index, key in enumerate(self.keys):
+            pid = key[-1]
+            unchanged = index < len(old_ids) and old_ids[index] == pid and old_rows.get(pid) == self.rows[pid]
+            slot_versions.append(self.slot_versions[index] if unchanged else version)
+        self.slot_versions = slot_versions
+        self.version = version
+
+    def apply(self, key: Key, row: dict, last_seen_at, version: int):
+        pid = key[-1]
+        old_key = self.key_by_id.get(pid)
+        self.seen_by_id[pid] = last_seen_at
+        self.version = version
+        if old_key == key and self.rows.get(pid) == row:
+            return
+        if old_key is not None:
+            old_index = bisect_left(self.keys, old_key)
+            del self.keys[old_index]
+            del self.slot_versions[old_index]
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.slot_versions.insert(index, version)
+        if old_key is None:
+            self._mark(index, len(self.keys) - 1, version)
+        else:
+            self._mark(min(index, old_index), max(index, old_index), version)
+        self.rows[pid] = row
+        self.key_by_id[pid] = key
+
+    def window(self, since: Optional[int], limit: Optional[int]):
+        """(full, [(rank, participant_id)]) of the positions a client holding `since` needs."""
+        size = len(self.keys) if not limit else min(limit, len(self.keys))
+        if since is None or since < self.base_version or since > self.version:
+            return True, [(index + 1, self.keys[index][-1]) for index in range(size)]
+        return False, [
+            (index + 1, self.keys[index][-1]) for index in range(size) if self.slot_versions[index] > since
+        ]
+
+
+class LocalLeaderboardStore:
+    """Leaderboards of the active sessions kept in process memory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards: Dict[int, _Board] = {}
+
+    def version(self, session_id: int) -> Optional[int]:
+        with self._lock:
+            board = self._boards.get(session_id)
+            return board.version if board else None
+
+    def load(self, session_id: int, version: int, entries):
+        with self._lock:
+            board = self._boards.get(session_id)
+            if board is None:
+                board = self._boards[session_id] = _Board(version)
+            board.replace(entries, version)
+
+    def apply(self, session_id: int, previous_version: int, version: int, key: Key, row: dict, last_seen_at) -> bool:
+        """Move one row; False when this board missed a change in between (it is reloaded on the next read)."""
+        with self._lock:
+            board = self._boards.get(session_id)
+            if board is None or board.version != previous_version:
+                return False
+            board.apply(key, row, last_seen_at, version)
+            return True
+
+    def read(self, session_id: int, since: Optional[int], limit: Optional[int]):
+        """(version, full, size, [(rank, row, last_seen_at)]) or None if the session is not loaded."""
+        with self._lock:
+            board = self._boards.get(session_id)
+            if board is None:
+                return None
+            full, positions = board.window(since, limit)
+            size = len(board.keys) if not limit else min(limit, len(board.keys))
+            rows = [(rank, dict(board.rows[pid]), board.seen_by_id.get(pid)) for rank, pid in positions]
+            return board.version, full, size, rows
+
+    def forget_session(self, session_id: int):
+        with self._lock:
+            self._boards.pop(session_id, None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_leaderboard_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, "LIVE_LEADERBOARD_STORE", "live.leaderboard.LocalLeaderboardStore")
+                _store = import_string(path)()
+    return _store
+
+
+_local_versions: Dict[int, int] = {}
+_versions_lock = threading.Lock()
+
+
+def _versions_in_process() -> bool:
+    return not cache_is_shared() and getattr(settings, "LIVE_SINGLE_PROCESS", False)
+
+
+def shared_version(session_id: int) -> int:
+    if _versions_in_process():
+        with _versions_lock:
+            return _local_versions.setdefault(session_id, int(time.time() * 1000))
+    if not cache_is_shared():
+        return LiveSession.objects.values_list("leaderboard_version", flat=True).get(pk=session_id)
+    key = VERSION_PREFIX + str(session_id)
+    version = cache.get(key)
+    if version is None:
+        # Millisecond start: survives an eviction without reusing old numbers and stays exact in JavaScript.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(session_id: int) -> int:
+    if _versions_in_process():
+        with _versions_lock:
+            version = _local_versions.get(session_id, int(time.time() * 1000)) + 1
+            _local_versions[session_id] = version
+            return version
+    if not cache_is_shared():
+        # The UPDATE keeps the row locked until the read, so every bump gets its own number.
+        with transaction.atomic():
+            sessions = LiveSession.objects.filter(pk=session_id)
+            sessions.update(leaderboard_version=F("leaderboard_version") + 1)
+            return sessions.values_list("leaderboard_version", flat=True).get()
+    try:
+        return cache.incr(VERSION_PREFIX + str(session_id))
+    except ValueError:
+        return shared_version(session_id)
+
+
+def _load_board(session_id: int, version: int):
+    participants = list(
+        LiveParticipant.objects.filter(live_session_id=session_id)
+        .select_related("student")
+        .order_by("-points", "-best_streak", "joined_at", "id")
+    )
+    data = LiveParticipantSerializer(participants, many=True).data
+    entries = [(_key(p), _row(row), p.last_seen_at) for p, row in zip(participants, data)]
+    get_leaderboard_store().load(session_id, version, entries)
+
+
+def leaderboard_changed(participant, participant_data):
+    """
+    Record that a participant's standing or row changed (participant_data is
+    its LiveParticipantSerializer output). Applied once the transaction commits.
+    """
+    session_id = participant.live_session_id
+    key, row, seen = _key(participant), _row(participant_data), participant.last_seen_at
+
+    def apply():
+        version = _bump_version(session_id)
+        get_leaderboard_store().apply(session_id, version - 1, version, key, row, seen)
+
+    transaction.on_commit(apply)
+
+
+def _with_presence(session_id: int, rank: int, row: dict, stored_seen_at) -> dict:
+    seen_at = get_presence_store().last_seen(session_id, row["id"])
+    if seen_at is None or (stored_seen_at and stored_seen_at > seen_at):
+        seen_at = stored_seen_at
+    row["rank"] = rank
+    row["last_seen_at"] = serializers.DateTimeField().to_representation(seen_at) if seen_at else None
+    row["is_online"] = bool(seen_at) and seen_at >= timezone.now() - timedelta(seconds=ONLINE_WINDOW_SECONDS)
+    return row
+
+
+def leaderboard_payload(session_id: int, since: Optional[int] = None, limit: Optional[int] = 12) -> dict:
+    """
+    Response fields for the top `limit` rows. Without `since` (or with one
+    this process cannot diff from) the full list comes back as "leaderboard";
+    otherwise "leaderboard_unchanged" or only the changed positions as
+    "leaderboard_changes" (rows carry their "rank"; "leaderboard_size" is the
+    list length to truncate to).
+    """
+    store = get_leaderboard_store()
+    version = shared_version(session_id)
+    if store.version(session_id) != version:
+        _load_board(session_id, version)
+    result = store.read(session_id, since, limit)
+    if result is None:
+        # The session was forgotten (ended) in between.
+        _load_board(session_id, version)
+        result = store.read(session_id, since, limit)
+    version, full, size, rows = result
+    rows = [_with_presence(session_id, rank, row, seen_at) for rank, row, seen_at in rows]
+    if full:
+        return {"leaderboard": rows, "leaderboard_version": version}
+    if not rows and since == version:
+        return {"leaderboard_unchanged": True, "leaderboard_version": version}
+    return {"leaderboard_changes": rows, "leaderboard_size": size, "leaderboard_version": version}
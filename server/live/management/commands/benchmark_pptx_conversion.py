@@ -0,0 +1,70 @@
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from live.office import ConversionFailed, convert_to_pdf
+
+
+class Command(BaseCommand):
+    help = "Measure PPTX -> PDF conversion latency and throughput (office server vs. one-off soffice)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pptx", help="Path to a .pptx file to convert repeatedly.")
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument(
+            "--mode",
+            choices=["server", "subprocess", "both"],
+            default="both",
+            help="server uses LIVE_OFFICE_SERVER, subprocess spawns soffice per job.",
+        )
+
+    def _run(self, source, runs, concurrency):
+        out_dir = tempfile.mkdtemp(prefix="live_bench_")
+
+        def one(index):
+            started = time.perf_counter()
+            convert_to_pdf(source, os.path.join(out_dir, f"{index}.pdf"))
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(one, range(runs)))
+        wall = time.perf_counter() - started
+        return latencies, wall
+
+    def _report(self, label, latencies, wall):
+        p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+        self.stdout.write(
+            f"{label:<10} runs={len(latencies)} "
+            f"p50={statistics.median(latencies) * 1000:.0f}ms p95={p95 * 1000:.0f}ms "
+            f"max={latencies[-1] * 1000:.0f}ms throughput={len(latencies) / wall:.2f}/s"
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options["pptx"])
+        if not os.path.exists(source):
+            raise CommandError(f"File not found: {source}")
+        runs = max(1, options["runs"])
+        concurrency = max(1, options["concurrency"])
+
+        modes = ["server", "subprocess"] if options["mode"] == "both" else [options["mode"]]
+        if "server" in modes and not getattr(settings, "LIVE_OFFICE_SERVER", ""):
+            raise CommandError("LIVE_OFFICE_SERVER is not set; start run_office_server and export it.")
+
+        for mode in modes:
+            server = settings.LIVE_OFFICE_SERVER if mode == "server" else ""
+            with override_settings(LIVE_OFFICE_SERVER=server):
+                try:
+                    latencies, wall = self._run(source, runs, concurrency)
+                except ConversionFailed as exc:
+                    raise CommandError(f"{mode}: {exc}")
+            self._report(mode, latencies, wall)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
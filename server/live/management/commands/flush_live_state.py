@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from live.state import flush_live_state
+
+
+class Command(BaseCommand):
+    help = "Write the hot state of active live sessions (slide, timer) from the shared store to their rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep flushing instead of exiting.")
+        parser.add_argument("--interval", type=float, default=10.0, help="Seconds between flushes with --loop.")
+
+    def handle(self, *args, **options):
+        written = 0
+        while True:
+            written += flush_live_state(force=True)
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Live sessions flushed: {written}"))
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from live.conversion import pending_conversion_ids, run_conversion_job
+from live.models import LiveSession
+
+
+class Command(BaseCommand):
+    help = "Convert queued live-session PPTX uploads to PDF previews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Parallel soffice conversions.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the queue instead of exiting.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="live-pptx") as pool:
+            while True:
+                ids = pending_conversion_ids(limit=workers * 4)
+                for status in pool.map(run_conversion_job, ids):
+                    if status == LiveSession.PREVIEW_DONE:
+                        done += 1
+                    elif status == LiveSession.PREVIEW_FAILED:
+                        failed += 1
+                if not ids:
+                    if not options["loop"]:
+                        break
+                    time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"PPTX conversions done: {done}, failed: {failed}"))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from live.office import OfficePool, OfficeServer, OfficeUnavailable, SofficeInstance
+
+
+class Command(BaseCommand):
+    help = "Keep warm LibreOffice instances and serve PPTX -> PDF conversion jobs on a local socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--address",
+            default=getattr(settings, "LIVE_OFFICE_SERVER", "") or "127.0.0.1:8765",
+            help="host:port to listen on (defaults to LIVE_OFFICE_SERVER).",
+        )
+        parser.add_argument("--instances", type=int, default=2, help="Number of soffice processes.")
+        parser.add_argument("--base-port", type=int, default=2002, help="First UNO listener port.")
+        parser.add_argument("--soffice", default="soffice", help="Path to the soffice binary.")
+
+    def handle(self, *args, **options):
+        instances = [
+            SofficeInstance(options["base_port"] + offset, binary=options["soffice"])
+            for offset in range(max(1, options["instances"]))
+        ]
+        pool = OfficePool(instances)
+        try:
+            pool.start()
+        except ImportError as exc:
+            raise CommandError(f"LibreOffice Python bindings (python3-uno) are required: {exc}")
+        except OfficeUnavailable as exc:
+            pool.stop()
+            raise CommandError(str(exc))
+
+        server = OfficeServer(options["address"], pool)
+        self.stdout.write(
+            self.style.SUCCESS(f"Office server on {options['address']} with {len(instances)} soffice instance(s)")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            pool.stop()
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0005_livesession_timer_duration_seconds_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='pptx_preview_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='pptx_preview_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='pptx_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0006_livesession_pptx_preview_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='pptx_pages',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
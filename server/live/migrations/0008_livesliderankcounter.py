@@ -0,0 +1,26 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0007_livesession_pptx_pages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveSlideRankCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slide_index', models.PositiveIntegerField(default=0)),
+                ('ranked_count', models.PositiveIntegerField(default=0)),
+                ('live_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rank_counters', to='live.livesession')),
+            ],
+            options={
+                'unique_together': {('live_session', 'slide_index')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:39
+
+from django.db import migrations, models
+
+from live.codes import normalize_live_code
+
+
+def backfill_live_code_normalized(apps, schema_editor):
+    LiveSession = apps.get_model('live', 'LiveSession')
+    seen = set()
+    for live in LiveSession.objects.order_by('-is_active', '-id').only('id', 'live_code', 'is_active'):
+        normalized = normalize_live_code(live.live_code)
+        # An older active session sharing a code with a newer one is left out of the unique index.
+        if live.is_active and normalized in seen:
+            normalized = ''
+        seen.add(normalized)
+        LiveSession.objects.filter(pk=live.pk).update(live_code_normalized=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0008_livesliderankcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveCodeAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='live_code_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=8),
+        ),
+        migrations.AlterField(
+            model_name='livesession',
+            name='live_code',
+            field=models.CharField(blank=True, default='', max_length=8),
+        ),
+        # Fill the normalized codes before the unique index over active sessions exists
+        migrations.RunPython(backfill_live_code_normalized, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='livesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True), models.Q(('live_code_normalized', ''), _negated=True)), fields=('live_code_normalized',), name='live_session_active_code_unique'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_checkin_correctness(apps, schema_editor):
+    LiveSlideCheckin = apps.get_model('live', 'LiveSlideCheckin')
+    # Older rows only kept the points; a correct answer after the timer ran out stays False.
+    LiveSlideCheckin.objects.filter(points_awarded__gt=0).update(is_correct=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0009_live_code_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveslidecheckin',
+            name='is_correct',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='liveslidecheckin',
+            name='selected_object_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_checkin_correctness, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='LiveSlideAnswerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slide_index', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('selection_counts', models.JSONField(blank=True, default=dict)),
+                ('reaction_buckets', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('live_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_stats', to='live.livesession')),
+            ],
+            options={
+                'unique_together': {('live_session', 'slide_index')},
+            },
+        ),
+    ]
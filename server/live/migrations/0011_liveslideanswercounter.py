@@ -0,0 +1,27 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0010_slide_answer_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveSlideAnswerCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slide_index', models.PositiveIntegerField(default=0)),
+                ('name', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('live_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_counters', to='live.livesession')),
+            ],
+            options={
+                'unique_together': {('live_session', 'slide_index', 'name')},
+            },
+        ),
+    ]
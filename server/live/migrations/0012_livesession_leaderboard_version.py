@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0011_liveslideanswercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='leaderboard_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -6,9 +6,11 @@ from pathlib import Path
 from datetime import timedelta
 import os
 import shutil
-import subprocess
 import tempfile
 
+from .codes import live_code_for, normalize_live_code
+from .office import convert_to_pdf
+
 
 class LiveSession(models.Model):
     SOURCE_SLIDES = "slides"
@@ -22,6 +24,17 @@ class LiveSession(models.Model):
         (SOURCE_PPTX, "PPTX"),
     )
 
+    PREVIEW_PENDING = "pending"
+    PREVIEW_RUNNING = "running"
+    PREVIEW_DONE = "done"
+    PREVIEW_FAILED = "failed"
+    PREVIEW_STATUS_CHOICES = (
+        (PREVIEW_PENDING, "Pending"),
+        (PREVIEW_RUNNING, "Running"),
+        (PREVIEW_DONE, "Done"),
+        (PREVIEW_FAILED, "Failed"),
+    )
+
     lesson = models.ForeignKey(
         "lessons.Lesson",
         on_delete=models.CASCADE,
@@ -35,7 +48,9 @@ class LiveSession(models.Model):
 
     is_active = models.BooleanField(default=True)
     current_slide_index = models.IntegerField(default=0)
-    live_code = models.CharField(max_length=8, blank=True, default="", db_index=True)
+    live_code = models.CharField(max_length=8, blank=True, default="")
+    # normalize_live_code(live_code), kept by save(); unique among active sessions.
+    live_code_normalized = models.CharField(max_length=8, blank=True, default="", editable=False)
 
     source_type = models.CharField(
         max_length=16,
@@ -50,20 +65,52 @@ class LiveSession(models.Model):
         blank=True,
         null=True,
     )
+    # PPTX -> PDF conversion queue (live.conversion); empty status = never queued.
+    pptx_preview_status = models.CharField(
+        max_length=16,
+        choices=PREVIEW_STATUS_CHOICES,
+        blank=True,
+        default="",
+        db_index=True,
+    )
+    pptx_preview_updated_at = models.DateTimeField(null=True, blank=True)
+    pptx_sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    # Per-page images of the preview PDF: {"count", "widths", "ext", "prefix"} (live.conversion).
+    pptx_pages = models.JSONField(default=dict, blank=True)
     timer_duration_seconds = models.PositiveIntegerField(default=0)
     timer_started_at = models.DateTimeField(null=True, blank=True)
     timer_ends_at = models.DateTimeField(null=True, blank=True)
+    # Leaderboard version when no Redis cache is shared by the workers (live.leaderboard).
+    leaderboard_version = models.BigIntegerField(default=0)
 
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-started_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["live_code_normalized"],
+                condition=models.Q(is_active=True) & ~models.Q(live_code_normalized=""),
+                name="live_session_active_code_unique",
+            )
+        ]
 
     def __str__(self):
         return f"Live: lesson_id={self.lesson_id} teacher_id={self.teacher_id}"
 
+    def save(self, *args, **kwargs):
+        self.live_code_normalized = normalize_live_code(self.live_code)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "live_code" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"live_code_normalized"}
+        super().save(*args, **kwargs)
+
     def end(self):
+        # Slide, timer and answer counters live in the hot-state store while the session runs (live.state).
+        from .state import reconcile_answer_stats, take_hot_state
+
+        take_hot_state(self)
         self.is_active = False
         self.ended_at = timezone.now()
         self.timer_started_at = None
@@ -72,10 +119,13 @@ class LiveSession(models.Model):
             update_fields=[
                 "is_active",
                 "ended_at",
+                "current_slide_index",
+                "timer_duration_seconds",
                 "timer_started_at",
                 "timer_ends_at",
             ]
         )
+        reconcile_answer_stats(self)
 
     @property
     def timer_is_running(self):
@@ -90,7 +140,7 @@ class LiveSession(models.Model):
         remaining = int((self.timer_ends_at - timezone.now()).total_seconds())
         return max(0, remaining)
 
-    def start_timer(self, duration_seconds: int):
+    def start_timer(self, duration_seconds: int, save: bool = True):
         now = timezone.now()
         self.timer_duration_seconds = max(0, int(duration_seconds or 0))
         self.timer_started_at = now
@@ -98,18 +148,20 @@ class LiveSession(models.Model):
             self.timer_ends_at = now + timedelta(seconds=self.timer_duration_seconds)
         else:
             self.timer_ends_at = None
-        self.save(
-            update_fields=[
-                "timer_duration_seconds",
-                "timer_started_at",
-                "timer_ends_at",
-            ]
-        )
+        if save:
+            self.save(
+                update_fields=[
+                    "timer_duration_seconds",
+                    "timer_started_at",
+                    "timer_ends_at",
+                ]
+            )
 
-    def stop_timer(self):
+    def stop_timer(self, save: bool = True):
         self.timer_started_at = None
         self.timer_ends_at = None
-        self.save(update_fields=["timer_started_at", "timer_ends_at"])
+        if save:
+            self.save(update_fields=["timer_started_at", "timer_ends_at"])
 
     def generate_pptx_preview_pdf(self):
         """
@@ -125,28 +177,14 @@ class LiveSession(models.Model):
 
         temp_dir = tempfile.mkdtemp(prefix="live_pptx_")
         try:
-            subprocess.run(
-                [
-                    "soffice",
-                    "--headless",
-                    "--convert-to",
-                    "pdf:impress_pdf_Export",
-                    "--outdir",
-                    temp_dir,
-                    source_path,
-                ],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-
-            expected_pdf = Path(temp_dir) / (Path(source_path).stem + ".pdf")
-            if not expected_pdf.exists():
+            # Warm office server (run_office_server) if configured, otherwise a one-off soffice.
+            target_pdf = Path(temp_dir) / (Path(source_path).stem + ".pdf")
+            convert_to_pdf(source_path, str(target_pdf))
+            if not target_pdf.exists():
                 return False
 
             output_name = f"{Path(self.pptx_file.name).stem}.pdf"
-            with expected_pdf.open("rb") as fh:
+            with target_pdf.open("rb") as fh:
                 self.pptx_preview_pdf.save(output_name, File(fh), save=False)
             self.save(update_fields=["pptx_preview_pdf"])
             return True
@@ -206,6 +244,8 @@ class LiveSlideCheckin(models.Model):
     slide_index = models.PositiveIntegerField(default=0)
     reaction_ms = models.PositiveIntegerField(default=0)
     points_awarded = models.IntegerField(default=0)
+    is_correct = models.BooleanField(default=False)
+    selected_object_ids = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -221,3 +261,84 @@ class LiveSlideCheckin(models.Model):
             f"Checkin<live={self.live_session_id}, student={self.participant_id}, "
             f"slide={self.slide_index}, points={self.points_awarded}>"
         )
+
+
+class LiveSlideRankCounter(models.Model):
+    """Point-earning answers handed out so far on one slide of a live session (live.scoring)."""
+
+    live_session = models.ForeignKey(
+        "live.LiveSession",
+        on_delete=models.CASCADE,
+        related_name="rank_counters",
+    )
+    slide_index = models.PositiveIntegerField(default=0)
+    ranked_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("live_session", "slide_index")
+
+    def __str__(self):
+        return f"RankCounter<live={self.live_session_id}, slide={self.slide_index}, ranked={self.ranked_count}>"
+
+
+class LiveSlideAnswerStats(models.Model):
+    """Final answer counters of one slide of an ended live session (live.state.reconcile_answer_stats)."""
+
+    live_session = models.ForeignKey(
+        "live.LiveSession",
+        on_delete=models.CASCADE,
+        related_name="answer_stats",
+    )
+    slide_index = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    # {"<checkbox object id>": count}
+    selection_counts = models.JSONField(default=dict, blank=True)
+    # Counts per live.state.REACTION_BUCKETS_MS bucket, the open-ended one last.
+    reaction_buckets = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("live_session", "slide_index")
+
+    def __str__(self):
+        return f"AnswerStats<live={self.live_session_id}, slide={self.slide_index}, answered={self.answered}>"
+
+
+class LiveSlideAnswerCounter(models.Model):
+    """
+    One answer counter of a slide of an active live session, used instead of
+    the hot-state store when there is none shared by the workers (live.state).
+    """
+
+    live_session = models.ForeignKey(
+        "live.LiveSession",
+        on_delete=models.CASCADE,
+        related_name="answer_counters",
+    )
+    slide_index = models.PositiveIntegerField(default=0)
+    # "answered", "correct", "sel:<checkbox object id>" or "rt:<reaction bucket>"
+    name = models.CharField(max_length=32)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("live_session", "slide_index", "name")
+
+    def __str__(self):
+        return f"AnswerCounter<live={self.live_session_id}, slide={self.slide_index}, {self.name}={self.count}>"
+
+
+class LiveCodeAllocation(models.Model):
+    """
+    One row per allocated live code: the autoincrement id is the position in
+    the permuted code space (live.codes), so allocating is a single INSERT.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def allocate(cls) -> str:
+        return live_code_for(cls.objects.create().id)
+
+    def __str__(self):
+        return f"LiveCodeAllocation<{self.id}>"
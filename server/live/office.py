@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import socket
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+try:
+    from PIL import Image
+except ImportError:  # pages stay PNG without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PDF_EXPORT_FILTER = "impress_pdf_Export"
+DEFAULT_JOB_TIMEOUT = 120
+
+
+class OfficeUnavailable(Exception):
+    pass
+
+
+class ConversionFailed(Exception):
+    pass
+
+
+def _parse_address(value: str) -> Tuple[str, int]:
+    host, _, port = (value or "").rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+# --- client -----------------------------------------------------------------
+
+
+def _request_server(address: str, source_path: str, target_path: str, timeout: float) -> dict:
+    host, port = _parse_address(address)
+    try:
+        conn = socket.create_connection((host, port), timeout=5)
+    except OSError as exc:
+        raise OfficeUnavailable(str(exc)) from exc
+    with conn:
+        # Queueing behind other jobs counts against the same budget as the conversion.
+        conn.settimeout(timeout + 30)
+        request = {"source": source_path, "target": target_path, "timeout": timeout}
+        conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        reply = conn.makefile("rb").readline()
+    if not reply:
+        raise OfficeUnavailable("office server closed the connection")
+    return json.loads(reply)
+
+
+def _convert_with_subprocess(source_path: str, target_path: str, timeout: float):
+    temp_dir = tempfile.mkdtemp(prefix="live_pptx_")
+    try:
+        subprocess.run(
+            [
+                "soffice",
+                "--headless",
+                "--convert-to",
+                f"pdf:{PDF_EXPORT_FILTER}",
+                "--outdir",
+                temp_dir,
+                source_path,
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout,
+        )
+        produced = Path(temp_dir) / (Path(source_path).stem + ".pdf")
+        if not produced.exists():
+            raise ConversionFailed("soffice did not produce a PDF")
+        shutil.move(str(produced), target_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def convert_to_pdf(source_path: str, target_path: str, timeout: Optional[float] = None):
+    """Convert `source_path` into the PDF file `target_path`; raises ConversionFailed on error."""
+    timeout = timeout or getattr(settings, "LIVE_OFFICE_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT)
+    address = getattr(settings, "LIVE_OFFICE_SERVER", "")
+    if address:
+        try:
+            reply = _request_server(address, source_path, target_path, timeout)
+        except (OfficeUnavailable, OSError, ValueError) as exc:
+            logger.warning("Office server %s unavailable (%s); spawning soffice", address, exc)
+        else:
+            if not reply.get("ok"):
+                raise ConversionFailed(reply.get("error") or "conversion failed")
+            return
+    try:
+        _convert_with_subprocess(source_path, target_path, timeout)
+    except (OSError, subprocess.SubprocessError) as exc:
+        raise ConversionFailed(str(exc)) from exc
+
+
+def render_pdf_pages(pdf_path: str, out_dir: str, widths, timeout: Optional[float] = None):
+    """
+    Rasterize every PDF page at each width with pdftoppm (poppler-utils).
+    Returns (extension, {width: [page paths in order]}); pages are WebP when Pillow is available.
+    """
+    timeout = timeout or getattr(settings, "LIVE_OFFICE_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT)
+    ext = "webp" if Image is not None else "png"
+    pages = {}
+    for width in widths:
+        width_dir = Path(out_dir) / str(width)
+        width_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            subprocess.run(
+                ["pdftoppm", "-png", "-scale-to-x", str(width), "-scale-to-y", "-1", pdf_path, str(width_dir / "page")],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+        except (OSError, subprocess.SubprocessError) as exc:
+            raise ConversionFailed(f"pdftoppm failed: {exc}") from exc
+
+        # pdftoppm zero-pads page numbers by page count (page-1.png or page-01.png ...).
+        rendered = sorted(width_dir.glob("page-*.png"), key=lambda path: int(path.stem.rsplit("-", 1)[1]))
+        if ext == "webp":
+            converted = []
+            for png_path in rendered:
+                webp_path = png_path.with_suffix(".webp")
+                with Image.open(png_path) as image:
+                    image.save(webp_path, "WEBP", quality=80, method=4)
+                png_path.unlink()
+                converted.append(webp_path)
+            rendered = converted
+        pages[width] = [str(path) for path in rendered]
+    return ext, pages
+
+
+# --- server -----------------------------------------------------------------
+
+
+class SofficeInstance:
+    """One headless soffice process in UNO listener mode with its own user profile."""
+
+    def __init__(self, port: int, binary: str = "soffice"):
+        self.port = port
+        self.binary = binary
+        self.profile_dir = tempfile.mkdtemp(prefix=f"live_office_{port}_")
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+
+    def start(self, connect_timeout: float = 30):
+        import uno  # LibreOffice's Python bindings (python3-uno), only needed by the server.
+
+        self.process = subprocess.Popen(
+            [
+                self.binary,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                f"-env:UserInstallation=file://{self.profile_dir}",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise OfficeUnavailable(f"soffice on port {self.port} did not start")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def stop(self):
+        self.desktop = None
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait(timeout=10)
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    @staticmethod
+    def _props(**values):
+        from com.sun.star.beans import PropertyValue
+
+        props = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def convert(self, source_path: str, target_path: str):
+        import uno
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(source_path)), "_blank", 0, self._props(Hidden=True)
+        )
+        if document is None:
+            raise ConversionFailed("LibreOffice could not open the file")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(target_path)),
+                self._props(FilterName=PDF_EXPORT_FILTER),
+            )
+        finally:
+            document.close(True)
+
+
+class OfficePool:
+    """
+    Hands idle instances to jobs. A job that overruns its timeout, or an
+    instance that died, gets the instance killed and restarted.
+    """
+
+    def __init__(self, instances):
+        self.instances = list(instances)
+        self._idle: "queue.Queue" = queue.Queue()
+        for instance in self.instances:
+            self._idle.put(instance)
+
+    def start(self):
+        for instance in self.instances:
+            instance.start()
+
+    def stop(self):
+        for instance in self.instances:
+            instance.stop()
+
+    def _recover(self, instance):
+        try:
+            instance.restart()
+        except Exception:
+            logger.exception("Could not restart office instance on port %s", instance.port)
+
+    def convert(self, source_path: str, target_path: str, timeout: float, wait: float = 300):
+        try:
+            instance = self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise ConversionFailed("all office instances are busy")
+        try:
+            if not instance.is_alive():
+                self._recover(instance)
+            outcome = {}
+
+            def run():
+                try:
+                    instance.convert(source_path, target_path)
+                except Exception as exc:
+                    outcome["error"] = exc
+
+            worker = threading.Thread(target=run, daemon=True)
+            worker.start()
+            worker.join(timeout)
+            if worker.is_alive():
+                # Killing soffice makes the blocked UNO call fail and frees the thread.
+                self._recover(instance)
+                raise ConversionFailed(f"conversion timed out after {timeout:g}s")
+            if "error" in outcome:
+                if not instance.is_alive():
+                    self._recover(instance)
+                raise ConversionFailed(str(outcome["error"]))
+        finally:
+            self._idle.put(instance)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        started = time.monotonic()
+        try:
+            job = json.loads(line)
+            timeout = float(job.get("timeout") or DEFAULT_JOB_TIMEOUT)
+            self.server.pool.convert(job["source"], job["target"], timeout)
+            reply = {"ok": True}
+        except (ConversionFailed, KeyError, ValueError, TypeError) as exc:
+            reply = {"ok": False, "error": str(exc)}
+        reply["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class OfficeServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: str, pool: OfficePool):
+        self.pool = pool
+        super().__init__(_parse_address(address), _JobHandler)
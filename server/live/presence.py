@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .flusher import start_background_flush
+from .models import LiveParticipant
+
+ONLINE_WINDOW_SECONDS = 20
+
+
+class LocalPresenceStore:
+    """
+    Last-seen timestamps of live participants kept in process memory.
+    Participants are also filed into fixed-width time buckets, so "who is online"
+    only touches the few buckets inside the online window instead of every row.
+    """
+
+    bucket_seconds = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_seen: Dict[int, Dict[int, datetime]] = defaultdict(dict)
+        self._buckets: Dict[int, Dict[int, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self._dirty: Dict[int, datetime] = {}
+        self._last_flush = time.monotonic()
+
+    def _bucket(self, moment: datetime) -> int:
+        return int(moment.timestamp()) // self.bucket_seconds
+
+    def touch(self, session_id: int, participant_id: int, seen_at: Optional[datetime] = None):
+        seen_at = seen_at or timezone.now()
+        with self._lock:
+            seen = self._last_seen[session_id]
+            buckets = self._buckets[session_id]
+            previous = seen.get(participant_id)
+            if previous is not None:
+                if previous >= seen_at:
+                    return
+                old_bucket = buckets.get(self._bucket(previous))
+                if old_bucket is not None:
+                    old_bucket.discard(participant_id)
+            seen[participant_id] = seen_at
+            buckets[self._bucket(seen_at)].add(participant_id)
+            self._dirty[participant_id] = seen_at
+
+    def last_seen(self, session_id: int, participant_id: int) -> Optional[datetime]:
+        with self._lock:
+            return self._last_seen.get(session_id, {}).get(participant_id)
+
+    def online_ids(self, session_id: int, window_seconds: int = ONLINE_WINDOW_SECONDS) -> Optional[Set[int]]:
+        """None means this store has not seen the session yet."""
+        threshold = timezone.now() - timedelta(seconds=window_seconds)
+        first_bucket = self._bucket(threshold)
+        with self._lock:
+            if session_id not in self._last_seen:
+                return None
+            seen = self._last_seen[session_id]
+            buckets = self._buckets[session_id]
+            online: Set[int] = set()
+            for index in list(buckets.keys()):
+                members = buckets[index]
+                if index < first_bucket or not members:
+                    del buckets[index]
+                elif index == first_bucket:
+                    online.update(pid for pid in members if seen[pid] >= threshold)
+                else:
+                    online.update(members)
+            return online
+
+    def online_count(self, session_id: int, window_seconds: int = ONLINE_WINDOW_SECONDS) -> Optional[int]:
+        """None means this store has not seen the session yet (caller falls back to the DB)."""
+        online = self.online_ids(session_id, window_seconds)
+        return None if online is None else len(online)
+
+    def flush_due(self, interval_seconds: float) -> bool:
+        with self._lock:
+            return bool(self._dirty) and time.monotonic() - self._last_flush >= interval_seconds
+
+    def drain_dirty(self) -> Dict[int, datetime]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+            return dirty
+
+    def forget_session(self, session_id: int):
+        with self._lock:
+            participant_ids = set(self._last_seen.pop(session_id, {}).keys())
+            self._buckets.pop(session_id, None)
+            # Dirty entries stay so the final flush still lands.
+            return participant_ids
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, "LIVE_PRESENCE_STORE", "live.presence.LocalPresenceStore")
+                _store = import_string(path)()
+    return _store
+
+
+def flush_presence(force: bool = False) -> int:
+    """Write buffered last-seen timestamps to LiveParticipant with a single bulk_update."""
+    store = get_presence_store()
+    interval = getattr(settings, "LIVE_PRESENCE_FLUSH_SECONDS", 10)
+    if not force and not store.flush_due(interval):
+        return 0
+    dirty = store.drain_dirty()
+    if not dirty:
+        return 0
+    rows = [LiveParticipant(id=pid, last_seen_at=seen_at) for pid, seen_at in dirty.items()]
+    LiveParticipant.objects.bulk_update(rows, ["last_seen_at"], batch_size=500)
+    return len(rows)
+
+
+def mark_seen(participant, seen_at: Optional[datetime] = None):
+    seen_at = seen_at or timezone.now()
+    get_presence_store().touch(participant.live_session_id, participant.id, seen_at)
+    participant.last_seen_at = seen_at
+    start_background_flush()
+    flush_presence()
+
+
+def online_count(session_id: int, window_seconds: int = ONLINE_WINDOW_SECONDS) -> int:
+    """
+    Participants seen within the window. With LIVE_SINGLE_PROCESS the store
+    has every heartbeat; otherwise the ones other workers flushed to
+    LiveParticipant.last_seen_at are merged with the ones buffered here.
+    """
+    store = get_presence_store()
+    if getattr(settings, "LIVE_SINGLE_PROCESS", False):
+        online = store.online_count(session_id, window_seconds)
+        if online is not None:
+            return online
+    threshold = timezone.now() - timedelta(seconds=window_seconds)
+    flushed = LiveParticipant.objects.filter(live_session_id=session_id, last_seen_at__gte=threshold)
+    return len(set(flushed.values_list("id", flat=True)) | (store.online_ids(session_id, window_seconds) or set()))
+
+
+def participant_last_seen(participant) -> Optional[datetime]:
+    seen_at = get_presence_store().last_seen(participant.live_session_id, participant.id)
+    if seen_at is None or (participant.last_seen_at and participant.last_seen_at > seen_at):
+        return participant.last_seen_at
+    return seen_at
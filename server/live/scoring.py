@@ -0,0 +1,104 @@
+"""
+Race-free scoring for live slide checkins.
+
+The checkin row is inserted first: the (participant, slide_index) unique
+constraint rejects a repeated or concurrent duplicate, so no prior SELECT
+is needed. Ranks come from a per-(session, slide) LiveSlideRankCounter row
+incremented in place (the UPDATE holds its row lock until commit, so two
+answers never get the same rank). The participant row is locked while its
+points and streak change. All of it is one transaction.
+"""
+from typing import List, NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import LiveParticipant, LiveSession, LiveSlideCheckin, LiveSlideRankCounter
+
+RANK_POINTS = {1: 100, 2: 70, 3: 50}
+BASE_POINTS = 30
+
+
+class CheckinResult(NamedTuple):
+    created: bool
+    participant: LiveParticipant
+    awarded: int
+    rank: Optional[int]
+
+
+def time_factor(live: LiveSession) -> float:
+    """1.0 without a timer; otherwise the remaining share of it (at least 0.3), 0 once it ran out."""
+    if live.timer_duration_seconds > 0 and live.timer_started_at and live.timer_ends_at:
+        if live.timer_remaining_seconds <= 0:
+            return 0.0
+        return max(0.3, live.timer_remaining_seconds / float(live.timer_duration_seconds))
+    return 1.0
+
+
+def _take_rank(live_id: int, slide_index: int, take: bool) -> int:
+    counter, _ = LiveSlideRankCounter.objects.get_or_create(live_session_id=live_id, slide_index=slide_index)
+    counters = LiveSlideRankCounter.objects.filter(pk=counter.pk)
+    if not take:
+        # Answers that earn nothing do not use up a rank.
+        return counters.values_list("ranked_count", flat=True).get() + 1
+    counters.update(ranked_count=F("ranked_count") + 1)
+    return counters.values_list("ranked_count", flat=True).get()
+
+
+def record_checkin(
+    live: LiveSession,
+    participant_id: int,
+    slide_index: int,
+    reaction_ms: int,
+    is_correct: bool,
+    selected_ids: Optional[List[int]] = None,
+) -> CheckinResult:
+    """Store a checkin and score it; `created` is False (nothing changed) for a duplicate."""
+    factor = time_factor(live)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                checkin = LiveSlideCheckin.objects.create(
+                    live_session=live,
+                    participant_id=participant_id,
+                    slide_index=slide_index,
+                    reaction_ms=reaction_ms,
+                    is_correct=is_correct,
+                    selected_object_ids=list(selected_ids or []),
+                )
+        except IntegrityError:
+            return CheckinResult(False, LiveParticipant.objects.get(pk=participant_id), 0, None)
+
+        rank = None
+        awarded = 0
+        if is_correct:
+            rank = _take_rank(live.id, slide_index, take=factor > 0)
+            awarded = max(0, int(round(RANK_POINTS.get(rank, BASE_POINTS) * factor)))
+            if awarded:
+                LiveSlideCheckin.objects.filter(pk=checkin.pk).update(points_awarded=awarded)
+
+        participant = LiveParticipant.objects.select_for_update().get(pk=participant_id)
+        if is_correct:
+            if participant.last_checked_slide_index + 1 == slide_index:
+                participant.streak += 1
+            else:
+                participant.streak = 1
+        else:
+            participant.streak = 0
+        participant.best_streak = max(participant.best_streak, participant.streak)
+        participant.last_checked_slide_index = slide_index
+        participant.current_slide_index = max(participant.current_slide_index, slide_index)
+        participant.checkins_count += 1
+        participant.points += awarded
+        participant.save(
+            update_fields=[
+                "streak",
+                "best_streak",
+                "last_checked_slide_index",
+                "current_slide_index",
+                "checkins_count",
+                "points",
+                "last_seen_at",
+            ]
+        )
+    return CheckinResult(True, participant, awarded, rank)
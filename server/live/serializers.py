@@ -3,6 +3,7 @@ from datetime import timedelta
 from django.utils import timezone
 
 from .models import LiveSession, LiveParticipant
+from .presence import ONLINE_WINDOW_SECONDS, online_count, participant_last_seen
 from lessons.models import Lesson
 
 
@@ -30,6 +31,7 @@ class LiveSessionSerializer(serializers.ModelSerializer):
             "external_view_url",
             "pptx_file",
             "pptx_preview_pdf",
+            "pptx_preview_status",
             "pptx_file_url",
             "pptx_preview_url",
             "content_url",
@@ -46,6 +48,7 @@ class LiveSessionSerializer(serializers.ModelSerializer):
             "teacher",
             "live_code",
             "pptx_preview_pdf",
+            "pptx_preview_status",
             "pptx_file_url",
             "pptx_preview_url",
             "content_url",
@@ -92,14 +95,14 @@ class LiveSessionSerializer(serializers.ModelSerializer):
         return obj.timer_remaining_seconds
 
     def get_participants_online(self, obj):
-        threshold = timezone.now() - timedelta(seconds=20)
-        return obj.participants.filter(last_seen_at__gte=threshold).count()
+        return online_count(obj.id, ONLINE_WINDOW_SECONDS)
 
 
 class LiveParticipantSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source="student.username", read_only=True)
     full_name = serializers.CharField(source="student.full_name", read_only=True)
     name = serializers.SerializerMethodField()
+    last_seen_at = serializers.SerializerMethodField()
     is_online = serializers.SerializerMethodField()
 
     class Meta:
@@ -125,8 +128,11 @@ class LiveParticipantSerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         return obj.resolved_name
 
+    def get_last_seen_at(self, obj):
+        return serializers.DateTimeField().to_representation(participant_last_seen(obj))
+
     def get_is_online(self, obj):
-        return obj.last_seen_at >= timezone.now() - timedelta(seconds=20)
+        return participant_last_seen(obj) >= timezone.now() - timedelta(seconds=ONLINE_WINDOW_SECONDS)
 
 
 class StartLiveSessionSerializer(serializers.Serializer):
@@ -180,6 +186,7 @@ class LiveTimerSerializer(serializers.Serializer):
 
 class JoinLiveSerializer(serializers.Serializer):
     display_name = serializers.CharField(max_length=120, required=False, allow_blank=True)
+    leaderboard_version = serializers.IntegerField(min_value=0, required=False)
 
 
 class HeartbeatSerializer(serializers.Serializer):
@@ -190,6 +197,7 @@ class SlideCheckinSerializer(serializers.Serializer):
     slide_index = serializers.IntegerField(min_value=0)
     reaction_ms = serializers.IntegerField(min_value=0, max_value=120000, required=False, default=0)
     answer_data = serializers.JSONField(required=False, default=dict)
+    leaderboard_version = serializers.IntegerField(min_value=0, required=False)
 
     def validate_answer_data(self, value):
         if value in (None, ""):
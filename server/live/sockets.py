@@ -0,0 +1,128 @@
+import asyncio
+import json
+import re
+from typing import Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .events import get_channel_layer
+from .flusher import start_background_flush
+from .models import LiveParticipant, LiveSession
+from .presence import get_presence_store
+from .serializers import LiveSessionSerializer
+from .state import load_hot_state
+
+LIVE_SOCKET_PATH_RE = re.compile(r"^/ws/live/sessions/(?P<pk>\d+)/$")
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+@sync_to_async
+def _authenticate(raw_token: str):
+    if not raw_token:
+        return None
+    auth = JWTAuthentication()
+    try:
+        validated = auth.get_validated_token(raw_token)
+        return auth.get_user(validated)
+    except (InvalidToken, TokenError):
+        return None
+
+
+@sync_to_async
+def _session_state(session_id: int) -> Optional[dict]:
+    live = LiveSession.objects.select_related("lesson").filter(pk=session_id, is_active=True).first()
+    if not live:
+        return None
+    return dict(LiveSessionSerializer(load_hot_state(live)).data)
+
+
+@sync_to_async
+def _participant_id(session_id: int, user_id: int) -> Optional[int]:
+    return LiveParticipant.objects.filter(live_session_id=session_id, student_id=user_id).values_list("id", flat=True).first()
+
+
+def _token_from_scope(scope) -> str:
+    query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    token = (query.get("token") or [""])[0]
+    if token:
+        return token
+    for name, value in scope.get("headers") or []:
+        if name == b"authorization":
+            parts = value.decode("latin-1").split()
+            if len(parts) == 2 and parts[0].lower() == "bearer":
+                return parts[1]
+    return ""
+
+
+async def live_socket_application(scope, receive, send):
+    """
+    WS /ws/live/sessions/<pk>/?token=<access JWT>
+    Pushes slide, timer and leaderboard events for one live session.
+    """
+    match = LIVE_SOCKET_PATH_RE.match(scope.get("path", ""))
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    if not match:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    session_id = int(match.group("pk"))
+
+    user = await _authenticate(_token_from_scope(scope))
+    if user is None or not user.is_active:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+
+    state = await _session_state(session_id)
+    if state is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    await send({"type": "websocket.accept"})
+    participant_id = await _participant_id(session_id, user.id)
+    presence = get_presence_store()
+    if participant_id:
+        presence.touch(session_id, participant_id)
+        start_background_flush()
+    layer = get_channel_layer()
+    subscription = layer.subscribe(session_id, user.id)
+    await send({"type": "websocket.send", "text": json.dumps({"type": "session.state", "session": state}, cls=DjangoJSONEncoder)})
+
+    async def pump_events():
+        while True:
+            event = await subscription.get()
+            await send({"type": "websocket.send", "text": json.dumps(event, cls=DjangoJSONEncoder)})
+            if event.get("type") == "session.ended":
+                await send({"type": "websocket.close", "code": 1000})
+                return
+
+    async def read_client():
+        while True:
+            incoming = await receive()
+            if incoming["type"] == "websocket.disconnect":
+                return
+            if incoming["type"] == "websocket.receive" and incoming.get("text"):
+                try:
+                    payload = json.loads(incoming["text"])
+                except ValueError:
+                    continue
+                if isinstance(payload, dict) and payload.get("type") == "ping":
+                    # A socket ping counts as a heartbeat; the next flush persists it.
+                    if participant_id:
+                        presence.touch(session_id, participant_id)
+                    await send({"type": "websocket.send", "text": json.dumps({"type": "pong"})})
+
+    tasks = [asyncio.ensure_future(pump_events()), asyncio.ensure_future(read_client())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        layer.unsubscribe(subscription)
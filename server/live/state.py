@@ -0,0 +1,456 @@
+"""
+Hot state of active live sessions: the current slide, the timer and the
+answer counters of every slide (answered, correct, selections per checkbox,
+reaction-time buckets).
+
+Teacher clicks write the store instead of the LiveSession row, and views
+overlay the stored values on the row they already fetched
+(load_hot_state). Rows catch up write-behind: flush_live_state() compares
+the store with the active rows and writes the ones that differ with one
+bulk UPDATE, from a background thread (live.flusher) or from
+`manage.py flush_live_state`, and LiveSession.end() persists the final state.
+
+The store is picked by get_live_state_store(): LIVE_STATE_STORE if set,
+otherwise CacheLiveStateStore when the default cache is Redis (shared by
+every worker), LocalLiveStateStore with LIVE_SINGLE_PROCESS, and no store at
+all otherwise: with several workers and a per-process or evicting cache,
+slide and timer changes are written straight to the row and answer counters
+are LiveSlideAnswerCounter rows incremented with F().
+Answer counters are seeded from LiveSlideCheckin rows when missing, and
+reconciled from them into LiveSlideAnswerStats when the session ends.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from edu_platform.caching import bump_cache_tags, cache_is_shared
+
+from .flusher import start_background_flush
+from .models import LiveSession, LiveSlideAnswerCounter, LiveSlideAnswerStats, LiveSlideCheckin
+
+HOT_FIELDS = ("current_slide_index", "timer_duration_seconds", "timer_started_at", "timer_ends_at")
+TIMER_FIELDS = ("timer_duration_seconds", "timer_started_at", "timer_ends_at")
+# Upper edges of the reaction-time buckets; the last bucket is open-ended.
+REACTION_BUCKETS_MS = (1000, 2000, 3000, 5000, 10000, 20000)
+
+
+class LocalLiveStateStore:
+    """Hot state kept in process memory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, dict] = {}
+        self._answers: Dict[int, Dict[int, Dict[str, int]]] = {}
+
+    def get_many(self, session_ids: Iterable[int]) -> Dict[int, dict]:
+        with self._lock:
+            return {sid: dict(self._states[sid]) for sid in session_ids if sid in self._states}
+
+    def seed(self, session_id: int, state: dict) -> dict:
+        """Store `state` unless the session already has one; returns the stored state."""
+        with self._lock:
+            return dict(self._states.setdefault(session_id, dict(state)))
+
+    def update(self, session_id: int, fields: dict):
+        with self._lock:
+            self._states.setdefault(session_id, {}).update(fields)
+
+    def add_answer(self, session_id: int, slide_index: int, names: List[str], seed) -> Dict[str, int]:
+        if self.counters(session_id, slide_index, []) is None:
+            seeded = seed()
+            if self.seed_counters(session_id, slide_index, seeded):
+                return {name: seeded.get(name, 0) for name in names}
+        with self._lock:
+            counters = self._answers[session_id][slide_index]
+            for name in names:
+                counters[name] = counters.get(name, 0) + 1
+            return {name: counters[name] for name in names}
+
+    def counters(self, session_id: int, slide_index: int, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        """None when the slide has no counters yet."""
+        with self._lock:
+            counters = self._answers.get(session_id, {}).get(slide_index)
+            if counters is None:
+                return None
+            return {name: counters.get(name, 0) for name in names}
+
+    def seed_counters(self, session_id: int, slide_index: int, counters: Dict[str, int]) -> bool:
+        """False when the slide already had counters."""
+        with self._lock:
+            slides = self._answers.setdefault(session_id, {})
+            if slide_index in slides:
+                return False
+            slides[slide_index] = dict(counters)
+            return True
+
+    def forget(self, session_id: int):
+        with self._lock:
+            self._states.pop(session_id, None)
+            self._answers.pop(session_id, None)
+
+
+class CacheLiveStateStore:
+    """
+    Hot state in the default cache, one key per field so a slide change and a
+    timer change never overwrite each other. Answer counters use cache.incr,
+    so the cache must be Redis (atomic increments, no culling).
+    """
+
+    prefix = "live:state:"
+
+    def _timeout(self) -> int:
+        return int(getattr(settings, "LIVE_STATE_TTL_SECONDS", 12 * 60 * 60))
+
+    def _field_key(self, session_id: int, field: str) -> str:
+        return f"{self.prefix}{session_id}:{field}"
+
+    def _answers_key(self, session_id: int, slide_index: int, name: str) -> str:
+        return f"{self.prefix}{session_id}:answers:{slide_index}:{name}"
+
+    def get_many(self, session_ids: Iterable[int]) -> Dict[int, dict]:
+        session_ids = list(session_ids)
+        keys = {self._field_key(sid, field): (sid, field) for sid in session_ids for field in HOT_FIELDS}
+        found = cache.get_many(list(keys))
+        states: Dict[int, dict] = {}
+        for key, value in found.items():
+            sid, field = keys[key]
+            states.setdefault(sid, {})[field] = value
+        # A session with a field evicted is reseeded from its row as a whole.
+        return {sid: state for sid, state in states.items() if len(state) == len(HOT_FIELDS)}
+
+    def seed(self, session_id: int, state: dict) -> dict:
+        timeout = self._timeout()
+        for field in HOT_FIELDS:
+            cache.add(self._field_key(session_id, field), state[field], timeout)
+        return self.get_many([session_id]).get(session_id, dict(state))
+
+    def update(self, session_id: int, fields: dict):
+        cache.set_many({self._field_key(session_id, field): value for field, value in fields.items()}, self._timeout())
+
+    def add_answer(self, session_id: int, slide_index: int, names: List[str], seed) -> Dict[str, int]:
+        if cache.get(self._answers_key(session_id, slide_index, "answered")) is None:
+            seeded = seed()
+            if self.seed_counters(session_id, slide_index, seeded):
+                return {name: seeded.get(name, 0) for name in names}
+        values = {}
+        for name in names:
+            key = self._answers_key(session_id, slide_index, name)
+            try:
+                values[name] = cache.incr(key)
+            except ValueError:
+                cache.add(key, 0, self._timeout())
+                values[name] = cache.incr(key)
+        return values
+
+    def counters(self, session_id: int, slide_index: int, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        names = list(names)
+        keys = {self._answers_key(session_id, slide_index, name): name for name in ["answered"] + names}
+        found = cache.get_many(list(keys))
+        if self._answers_key(session_id, slide_index, "answered") not in found:
+            return None
+        return {name: found.get(key, 0) for key, name in keys.items() if name in names}
+
+    def seed_counters(self, session_id: int, slide_index: int, counters: Dict[str, int]) -> bool:
+        timeout = self._timeout()
+        for name, value in counters.items():
+            if name != "answered":
+                cache.add(self._answers_key(session_id, slide_index, name), value, timeout)
+        # "answered" goes last: its presence marks the slide as seeded.
+        return cache.add(self._answers_key(session_id, slide_index, "answered"), counters.get("answered", 0), timeout)
+
+    def forget(self, session_id: int):
+        # Answer keys are left to expire: the slides they cover are not tracked here.
+        cache.delete_many([self._field_key(session_id, field) for field in HOT_FIELDS])
+
+
+_stores: Dict[str, object] = {}
+_store_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _store_path() -> str:
+    path = getattr(settings, "LIVE_STATE_STORE", "")
+    if path:
+        return path
+    if cache_is_shared():
+        return "live.state.CacheLiveStateStore"
+    if getattr(settings, "LIVE_SINGLE_PROCESS", False):
+        return "live.state.LocalLiveStateStore"
+    return ""
+
+
+def get_live_state_store():
+    """The hot-state store, or None when hot state is written straight to the rows."""
+    path = _store_path()
+    if not path:
+        return None
+    store = _stores.get(path)
+    if store is None:
+        with _store_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = import_string(path)()
+                if isinstance(store, CacheLiveStateStore) and not cache_is_shared():
+                    raise ImproperlyConfigured(
+                        "CacheLiveStateStore needs a Redis CACHE_URL: other cache backends cull keys "
+                        "and do not increment atomically across processes."
+                    )
+                _stores[path] = store
+    return store
+
+
+def _row_state(live: LiveSession) -> dict:
+    return {field: getattr(live, field) for field in HOT_FIELDS}
+
+
+def _apply(live: LiveSession, state: dict) -> LiveSession:
+    for field in HOT_FIELDS:
+        if field in state:
+            setattr(live, field, state[field])
+    return live
+
+
+def load_hot_state(live: LiveSession) -> LiveSession:
+    """Overlay the stored hot state on a fetched active session (seeding the store from the row if needed)."""
+    store = get_live_state_store()
+    if store is None or not live.is_active:
+        return live
+    state = store.get_many([live.id]).get(live.id)
+    if state is None:
+        state = store.seed(live.id, _row_state(live))
+    return _apply(live, state)
+
+
+def load_hot_states(lives):
+    """load_hot_state for a list of sessions with one store read."""
+    store = get_live_state_store()
+    if store is None:
+        return lives
+    states = store.get_many([live.id for live in lives if live.is_active])
+    for live in lives:
+        if not live.is_active:
+            continue
+        state = states.get(live.id)
+        if state is None:
+            state = store.seed(live.id, _row_state(live))
+        _apply(live, state)
+    return lives
+
+
+def _write(live: LiveSession, fields: Iterable[str]):
+    values = {field: getattr(live, field) for field in fields}
+    store = get_live_state_store()
+    if store is None:
+        LiveSession.objects.filter(pk=live.pk).update(**values)
+    else:
+        store.update(live.id, values)
+        start_background_flush()
+        flush_live_state()
+    # The active sessions list serializes these fields.
+    bump_cache_tags("live_sessions")
+
+
+def set_slide_index(live: LiveSession, slide_index: int):
+    live.current_slide_index = slide_index
+    _write(live, ["current_slide_index"])
+
+
+def start_timer(live: LiveSession, duration_seconds: int):
+    live.start_timer(duration_seconds, save=False)
+    _write(live, TIMER_FIELDS)
+
+
+def stop_timer(live: LiveSession):
+    live.stop_timer(save=False)
+    _write(live, TIMER_FIELDS)
+
+
+def _answer_names(is_correct: bool, selected_ids: Iterable[int], reaction_ms: int) -> List[str]:
+    names = ["answered", f"rt:{bisect_left(REACTION_BUCKETS_MS, reaction_ms or 0)}"]
+    if is_correct:
+        names.append("correct")
+    names.extend(f"sel:{object_id}" for object_id in selected_ids or [])
+    return names
+
+
+def answer_counters_from_checkins(session_id: int, slide_index: Optional[int] = None) -> Dict[int, Counter]:
+    """Answer counters per slide rebuilt from LiveSlideCheckin rows (cold start and reconciliation)."""
+    checkins = LiveSlideCheckin.objects.filter(live_session_id=session_id)
+    if slide_index is not None:
+        checkins = checkins.filter(slide_index=slide_index)
+    counters: Dict[int, Counter] = defaultdict(Counter)
+    for index, is_correct, selected_ids, reaction_ms in checkins.values_list(
+        "slide_index", "is_correct", "selected_object_ids", "reaction_ms"
+    ).order_by():
+        counters[index].update(_answer_names(is_correct, selected_ids, reaction_ms))
+    return counters
+
+
+def _seed_from_checkins(session_id: int, slide_index: int):
+    return lambda: answer_counters_from_checkins(session_id, slide_index).get(slide_index, Counter())
+
+
+def _add_answer_rows(session_id: int, slide_index: int, names: List[str]) -> int:
+    """
+    add_answer on LiveSlideAnswerCounter rows. Must run in the checkin's
+    transaction: a seed then counts this checkin, and a concurrent seed that
+    could not see it makes this one fall back to incrementing.
+    """
+    counters = LiveSlideAnswerCounter.objects.filter(live_session_id=session_id, slide_index=slide_index)
+    if not counters.filter(name="answered").exists():
+        seeded = _seed_from_checkins(session_id, slide_index)()
+        rows = [
+            LiveSlideAnswerCounter(live_session_id=session_id, slide_index=slide_index, name=name, count=count)
+            for name, count in seeded.items()
+        ]
+        try:
+            with transaction.atomic():
+                LiveSlideAnswerCounter.objects.bulk_create(rows)
+            return seeded["answered"]
+        except IntegrityError:
+            pass
+    LiveSlideAnswerCounter.objects.bulk_create(
+        [LiveSlideAnswerCounter(live_session_id=session_id, slide_index=slide_index, name=name) for name in names],
+        ignore_conflicts=True,
+    )
+    counters.filter(name__in=names).update(count=F("count") + 1)
+    return counters.values_list("count", flat=True).get(name="answered")
+
+
+def record_answer(
+    session_id: int,
+    slide_index: int,
+    is_correct: bool = False,
+    selected_ids: Iterable[int] = (),
+    reaction_ms: int = 0,
+) -> int:
+    """
+    Count a checkin already stored on a slide; returns the slide's answer
+    count. On a cold start the counters are seeded from the rows, this one
+    included, instead of being incremented. Call it in the transaction that
+    stored the checkin.
+    """
+    names = _answer_names(is_correct, selected_ids, reaction_ms)
+    store = get_live_state_store()
+    if store is None:
+        return _add_answer_rows(session_id, slide_index, names)
+    values = store.add_answer(
+        session_id,
+        slide_index,
+        names,
+        _seed_from_checkins(session_id, slide_index),
+    )
+    return values["answered"]
+
+
+def format_answer_distribution(slide_index: int, counters: Dict[str, int], option_ids: Iterable[int]) -> dict:
+    edges = list(REACTION_BUCKETS_MS) + [None]
+    return {
+        "slide_index": slide_index,
+        "answered": counters.get("answered", 0),
+        "correct": counters.get("correct", 0),
+        "options": [{"object_id": oid, "count": counters.get(f"sel:{oid}", 0)} for oid in option_ids],
+        "reaction_ms_buckets": [
+            {"up_to_ms": edge, "count": counters.get(f"rt:{index}", 0)} for index, edge in enumerate(edges)
+        ],
+    }
+
+
+def answer_distribution(session_id: int, slide_index: int, option_ids: Iterable[int]) -> dict:
+    """Counters of one slide of an active session; the checkin rows are only read on a cold start."""
+    option_ids = list(option_ids)
+    names = ["answered", "correct"] + [f"sel:{oid}" for oid in option_ids]
+    names += [f"rt:{index}" for index in range(len(REACTION_BUCKETS_MS) + 1)]
+    store = get_live_state_store()
+    if store is None:
+        counters = dict(
+            LiveSlideAnswerCounter.objects.filter(live_session_id=session_id, slide_index=slide_index).values_list(
+                "name", "count"
+            )
+        )
+        if "answered" not in counters:
+            counters = _seed_from_checkins(session_id, slide_index)()
+        return format_answer_distribution(slide_index, counters, option_ids)
+    counters = store.counters(session_id, slide_index, names)
+    if counters is None:
+        store.seed_counters(session_id, slide_index, _seed_from_checkins(session_id, slide_index)())
+        counters = store.counters(session_id, slide_index, names) or {}
+    return format_answer_distribution(slide_index, counters, option_ids)
+
+
+def reconcile_answer_stats(live: LiveSession) -> int:
+    """Store the final per-slide answer counters of an ended session; returns the number of slides."""
+    counters = answer_counters_from_checkins(live.id)
+    buckets = len(REACTION_BUCKETS_MS) + 1
+    rows = [
+        LiveSlideAnswerStats(
+            live_session=live,
+            slide_index=index,
+            answered=slide.get("answered", 0),
+            correct=slide.get("correct", 0),
+            selection_counts={name[4:]: count for name, count in slide.items() if name.startswith("sel:")},
+            reaction_buckets=[slide.get(f"rt:{bucket}", 0) for bucket in range(buckets)],
+        )
+        for index, slide in sorted(counters.items())
+    ]
+    LiveSlideAnswerStats.objects.filter(live_session=live).delete()
+    LiveSlideAnswerStats.objects.bulk_create(rows)
+    LiveSlideAnswerCounter.objects.filter(live_session=live).delete()
+    return len(rows)
+
+
+def flush_live_state(force: bool = False) -> int:
+    """
+    Write the stored hot state of every active session whose row differs
+    with one bulk UPDATE, at most every LIVE_STATE_FLUSH_SECONDS unless forced.
+    The store itself is the dirty set, so nothing is lost when a worker exits.
+    """
+    global _last_flush
+    store = get_live_state_store()
+    if store is None:
+        return 0
+    interval = getattr(settings, "LIVE_STATE_FLUSH_SECONDS", 10)
+    with _flush_lock:
+        if not force and time.monotonic() - _last_flush < interval:
+            return 0
+        _last_flush = time.monotonic()
+    stored = list(LiveSession.objects.filter(is_active=True).values("id", *HOT_FIELDS))
+    states = store.get_many([row["id"] for row in stored])
+    rows = [
+        _apply(LiveSession(id=row["id"]), states[row["id"]])
+        for row in stored
+        if any(field in states.get(row["id"], {}) and states[row["id"]][field] != row[field] for field in HOT_FIELDS)
+    ]
+    if rows:
+        LiveSession.objects.bulk_update(rows, list(HOT_FIELDS), batch_size=500)
+    return len(rows)
+
+
+def take_hot_state(live: LiveSession) -> LiveSession:
+    """Overlay the final hot state on a session that is ending and drop it from the store."""
+    store = get_live_state_store()
+    if store is None:
+        return live
+    state = store.get_many([live.id]).get(live.id)
+    if state:
+        _apply(live, state)
+    store.forget(live.id)
+    return live
+
+
+def end_sessions(queryset) -> int:
+    """End every session in the queryset, persisting their hot state; returns how many ended."""
+    lives = list(queryset.filter(is_active=True))
+    for live in lives:
+        live.end()
+    return len(lives)
@@ -1,3 +1,721 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lessons.models import Lesson
+from live import events, leaderboard, office, presence, state
+from live.conversion import convert_pptx_preview, render_preview_pages
+from slide.models import Slide, SlideObject
+from live.codes import CODE_ALPHABET, CODE_LENGTH, live_code_for
+from live.models import (
+    LiveCodeAllocation,
+    LiveParticipant,
+    LiveSession,
+    LiveSlideAnswerCounter,
+    LiveSlideAnswerStats,
+    LiveSlideCheckin,
+    LiveSlideRankCounter,
+)
+from live.serializers import LiveParticipantSerializer
+from live.scoring import record_checkin
+from live.office import ConversionFailed, OfficePool, OfficeServer, convert_to_pdf
+from live.sockets import live_socket_application
+
+
+User = get_user_model()
+
+
+class LiveTestMixin:
+    def setUp(self):
+        presence._store = None
+        leaderboard._store = None
+        leaderboard._local_versions.clear()
+        state._stores.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_live", password="pass1234", role="teacher")
+        self.student = User.objects.create_user(username="student_live", password="pass1234", role="student")
+        self.lesson = Lesson.objects.create(owner=self.teacher, title="Live SQL", topic="SQL")
+        self.live = LiveSession.objects.create(
+            lesson=self.lesson,
+            teacher=self.teacher,
+            live_code="ABC234",
+        )
+
+    def _socket_scope(self, user=None, session_id=None):
+        query = f"token={AccessToken.for_user(user)}" if user else ""
+        return {
+            "type": "websocket",
+            "path": f"/ws/live/sessions/{session_id or self.live.id}/",
+            "query_string": query.encode(),
+            "headers": [],
+        }
+
+
+class LiveSocketTests(LiveTestMixin, TestCase):
+    def _set_slide(self, index):
+        self.client.force_authenticate(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/live/sessions/{self.live.id}/set-slide/",
+                {"slide_index": index},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_socket_pushes_slide_change(self):
+        async def scenario():
+            socket = ApplicationCommunicator(live_socket_application, self._socket_scope(self.student))
+            await socket.send_input({"type": "websocket.connect"})
+            self.assertEqual((await socket.receive_output(timeout=2))["type"], "websocket.accept")
+            state = json.loads((await socket.receive_output(timeout=2))["text"])
+            self.assertEqual(state["type"], "session.state")
+            self.assertEqual(state["session"]["current_slide_index"], 0)
+
+            await sync_to_async(self._set_slide)(2)
+            event = json.loads((await socket.receive_output(timeout=2))["text"])
+            self.assertEqual(event["type"], "slide.changed")
+            self.assertEqual(event["slide_index"], 2)
+
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(timeout=2)
+
+        async_to_sync(scenario)()
+
+    def test_redis_cache_picks_the_pubsub_layer(self):
+        redis_cache = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x"}}
+        self.assertIsInstance(events.get_channel_layer(), events.InProcessChannelLayer)
+        with override_settings(CACHES=redis_cache):
+            self.assertIsInstance(events.get_channel_layer(), events.RedisChannelLayer)
+
+    def test_pubsub_messages_reach_local_subscribers(self):
+        layer = events.RedisChannelLayer("redis://unused")
+
+        async def scenario():
+            # Subscribed without starting the Redis listener; deliver() is what it calls per message.
+            subscription = events.InProcessChannelLayer.subscribe(layer, self.live.id, self.student.id)
+            payload = json.dumps({"type": "slide.changed", "slide_index": 3})
+            layer.deliver({"type": "pmessage", "channel": f"live:events:{self.live.id}".encode(), "data": payload})
+            event = await asyncio.wait_for(subscription.get(), timeout=2)
+            self.assertEqual(event["slide_index"], 3)
+            self.assertEqual(layer.online_user_ids(self.live.id), {self.student.id})
+
+        async_to_sync(scenario)()
+
+    def test_socket_rejects_missing_token(self):
+        async def scenario():
+            socket = ApplicationCommunicator(live_socket_application, self._socket_scope())
+            await socket.send_input({"type": "websocket.connect"})
+            message = await socket.receive_output(timeout=2)
+            self.assertEqual(message, {"type": "websocket.close", "code": 4401})
+
+        async_to_sync(scenario)()
+
+
+@override_settings(LIVE_PRESENCE_FLUSH_SECONDS=3600)
+class LivePresenceTests(LiveTestMixin, TestCase):
+    def _heartbeat(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(f"/api/live/sessions/{self.live.id}/heartbeat/", {}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_heartbeat_is_buffered_until_flush(self):
+        self._heartbeat()
+        participant = LiveParticipant.objects.get(live_session=self.live, student=self.student)
+        stored_seen_at = participant.last_seen_at
+        self._heartbeat()
+
+        participant.refresh_from_db()
+        self.assertEqual(participant.last_seen_at, stored_seen_at)
+        buffered = presence.get_presence_store().last_seen(self.live.id, participant.id)
+        self.assertGreater(buffered, stored_seen_at)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(presence.flush_presence(force=True), 1)
+        participant.refresh_from_db()
+        self.assertEqual(participant.last_seen_at, buffered)
+
+    def test_online_count_comes_from_presence_store(self):
+        self._heartbeat()
+        # Only the session lookup hits the DB; the online count is answered by the store.
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/live/sessions/by-code/{self.live.live_code}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["participants_online"], 1)
+
+        self.client.force_authenticate(self.teacher)
+
+        response = self.client.get(f"/api/live/sessions/{self.live.id}/participants/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["participants"][0]["is_online"])
+
+    @override_settings(LIVE_SINGLE_PROCESS=False)
+    def test_online_count_merges_other_workers_from_the_db(self):
+        self._heartbeat()
+        # Seen by another worker, which already flushed the heartbeat.
+        LiveParticipant.objects.create(live_session=self.live, student=self.teacher, last_seen_at=timezone.now())
+        response = self.client.get(f"/api/live/sessions/by-code/{self.live.live_code}/")
+        self.assertEqual(response.data["participants_online"], 2)
+
+        presence.flush_presence(force=True)
+        self.assertEqual(presence.online_count(self.live.id), 2)
+
+
+class LiveDeckSnapshotTests(LiveTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.slide = Slide.objects.create(lesson=self.lesson, title="Intro", order=1)
+        self.option = SlideObject.objects.create(
+            slide=self.slide,
+            object_type=SlideObject.CHECKBOX,
+            data={"label": "A", "correct": True},
+        )
+        self.client.force_authenticate(self.teacher)
+
+    def _current_slide(self, **headers):
+        return self.client.get(f"/api/live/sessions/{self.live.id}/current-slide/", **headers)
+
+    def test_current_slide_revalidates_with_etag(self):
+        response = self._current_slide()
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.content)
+        self.assertEqual(payload["slide"], {"id": self.slide.id, "title": "Intro"})
+        self.assertEqual([obj["id"] for obj in payload["objects"]], [self.option.id])
+        etag = response["ETag"]
+
+        # Session lookup only: the deck comes from the cached snapshot.
+        with self.assertNumQueries(1):
+            cached = self._current_slide(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+
+    def test_slide_object_change_invalidates_snapshot(self):
+        etag = self._current_slide()["ETag"]
+        self.option.data = {"label": "B", "correct": True}
+        self.option.save()
+
+        response = self._current_slide(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(json.loads(response.content)["objects"][0]["data"]["label"], "B")
+
+
+def _fake_conversion(live):
+    live.pptx_preview_pdf.save("deck.pdf", ContentFile(b"%PDF-1.4 fake"), save=False)
+    live.save(update_fields=["pptx_preview_pdf"])
+    return True
+
+
+def _fake_pdftoppm(args, **kwargs):
+    """Writes two pages where pdftoppm would (its last argument is the output prefix)."""
+    width = int(args[args.index("-scale-to-x") + 1])
+    for number in (1, 2):
+        path = f"{args[-1]}-{number}.png"
+        if office.Image is not None:
+            office.Image.new("RGB", (width, width * 3 // 4)).save(path, "PNG")
+        else:
+            with open(path, "wb") as handle:
+                handle.write(b"png")
+
+
+@override_settings(LIVE_PPTX_CONVERSION_WORKERS=0)
+@override_settings(LIVE_STATE_FLUSH_SECONDS=3600)
+class LiveHotStateTests(LiveTestMixin, TestCase):
+    def _set_slide(self, index):
+        response = self.client.post(f"/api/live/sessions/{self.live.id}/set-slide/", {"slide_index": index}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_slide_flips_write_the_store_not_the_row(self):
+        self.client.force_authenticate(self.teacher)
+        with CaptureQueriesContext(connection) as queries:
+            for index in range(1, 21):
+                response = self._set_slide(index)
+        self.assertEqual(response.data["current_slide_index"], 20)
+        self.assertFalse([q for q in queries if q["sql"].startswith('UPDATE "live_livesession"')])
+        self.live.refresh_from_db()
+        self.assertEqual(self.live.current_slide_index, 0)
+
+        self.client.force_authenticate(self.student)
+        response = self.client.get(f"/api/live/sessions/by-code/{self.live.live_code}/")
+        self.assertEqual(response.data["current_slide_index"], 20)
+
+        # The flush finds the changed session by comparing the store with the active rows.
+        other = LiveSession.objects.create(lesson=self.lesson, teacher=self.teacher, live_code="XYZ789")
+        state.load_hot_state(other)
+        self.assertEqual(state.flush_live_state(force=True), 1)
+        self.live.refresh_from_db()
+        self.assertEqual(self.live.current_slide_index, 20)
+        self.assertEqual(state.flush_live_state(force=True), 0)
+
+    def test_cache_store_is_shared_through_the_cache(self):
+        first, second = state.CacheLiveStateStore(), state.CacheLiveStateStore()
+        first.seed(self.live.id, state._row_state(self.live))
+        first.update(self.live.id, {"current_slide_index": 7})
+        self.assertEqual(second.get_many([self.live.id])[self.live.id]["current_slide_index"], 7)
+
+    def test_cache_store_needs_redis(self):
+        with override_settings(LIVE_STATE_STORE="live.state.CacheLiveStateStore"):
+            with self.assertRaises(ImproperlyConfigured):
+                state.get_live_state_store()
+
+    @override_settings(LIVE_SINGLE_PROCESS=False)
+    def test_without_shared_store_changes_go_to_the_row(self):
+        self.assertIsNone(state.get_live_state_store())
+        self.client.force_authenticate(self.teacher)
+        self._set_slide(3)
+        self.live.refresh_from_db()
+        self.assertEqual(self.live.current_slide_index, 3)
+        response = self.client.post(f"/api/live/sessions/{self.live.id}/timer/start/", {"duration_seconds": 30}, format="json")
+        self.assertTrue(response.data["timer_is_running"])
+        self.live.refresh_from_db()
+        self.assertEqual(self.live.timer_duration_seconds, 30)
+        self.assertEqual(state.flush_live_state(force=True), 0)
+
+    def test_end_persists_slide_and_timer(self):
+        self.client.force_authenticate(self.teacher)
+        self._set_slide(4)
+        response = self.client.post(f"/api/live/sessions/{self.live.id}/timer/start/", {"duration_seconds": 45}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["timer_is_running"])
+        self.live.refresh_from_db()
+        self.assertEqual(self.live.timer_duration_seconds, 0)
+
+        response = self.client.post(f"/api/live/sessions/{self.live.id}/end/")
+        self.assertEqual(response.status_code, 200)
+        self.live.refresh_from_db()
+        self.assertFalse(self.live.is_active)
+        self.assertEqual(self.live.current_slide_index, 4)
+        self.assertEqual(self.live.timer_duration_seconds, 45)
+        self.assertIsNone(self.live.timer_ends_at)
+        self.assertEqual(state.get_live_state_store().get_many([self.live.id]), {})
+
+    def test_answer_counters_are_seeded_from_checkins(self):
+        participant = LiveParticipant.objects.create(live_session=self.live, student=self.student)
+        LiveSlideCheckin.objects.create(
+            live_session=self.live, participant=participant, slide_index=2, is_correct=True, selected_object_ids=[7]
+        )
+        self.assertEqual(state.answer_distribution(self.live.id, 2, [7])["answered"], 1)
+        LiveSlideCheckin.objects.create(
+            live_session=self.live,
+            participant=LiveParticipant.objects.create(live_session=self.live, student=self.teacher),
+            slide_index=2,
+            selected_object_ids=[8],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(state.record_answer(self.live.id, 2, False, [8], 1500), 2)
+            data = state.answer_distribution(self.live.id, 2, [7, 8])
+        self.assertEqual((data["answered"], data["correct"]), (2, 1))
+        self.assertEqual([option["count"] for option in data["options"]], [1, 1])
+
+
+class LiveAnswerDistributionTests(LiveTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        slide = Slide.objects.create(lesson=self.lesson, title="Quiz", order=1)
+        self.right = SlideObject.objects.create(slide=slide, object_type=SlideObject.CHECKBOX, data={"correct": True})
+        self.wrong = SlideObject.objects.create(slide=slide, object_type=SlideObject.CHECKBOX, data={"label": "B"})
+        self.students = User.objects.bulk_create([User(username=f"quiz_student_{i}", role="student") for i in range(5)])
+
+    def _answer(self, student, selected, reaction_ms):
+        self.client.force_authenticate(student)
+        response = self.client.post(
+            f"/api/live/sessions/{self.live.id}/checkin/",
+            {"slide_index": 0, "reaction_ms": reaction_ms, "answer_data": {"selected_object_ids": selected}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def _distribution(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(f"/api/live/sessions/{self.live.id}/answers/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_teacher_sees_counters_and_end_reconciles_them(self):
+        picks = [[self.right.id], [self.right.id], [self.wrong.id], [self.right.id, self.wrong.id], []]
+        for number, (student, selected) in enumerate(zip(self.students, picks), start=1):
+            response = self._answer(student, selected, 800 * number)
+            self.assertEqual(response.data["slide_answer_count"], number)
+
+        data = self._distribution()
+        self.assertEqual((data["answered"], data["correct"], data["participants"]), (5, 2, 5))
+        self.assertEqual(
+            data["options"],
+            [
+                {"object_id": self.right.id, "count": 3, "correct": True},
+                {"object_id": self.wrong.id, "count": 2, "correct": False},
+            ],
+        )
+        # 800, 1600, 2400, 3200 and 4000 ms.
+        self.assertEqual([bucket["count"] for bucket in data["reaction_ms_buckets"]], [1, 1, 1, 2, 0, 0, 0])
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(f"/api/live/sessions/{self.live.id}/answers/").status_code, 403)
+
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.post(f"/api/live/sessions/{self.live.id}/end/").status_code, 200)
+        stats = LiveSlideAnswerStats.objects.get(live_session=self.live, slide_index=0)
+        self.assertEqual((stats.answered, stats.correct), (5, 2))
+        self.assertEqual(stats.selection_counts, {str(self.right.id): 3, str(self.wrong.id): 2})
+        self.assertEqual(self._distribution(), data)
+
+    @override_settings(LIVE_SINGLE_PROCESS=False)
+    def test_without_shared_store_counters_are_rows(self):
+        # Answered before the counters existed: the first counted checkin seeds from the rows.
+        early = LiveParticipant.objects.create(live_session=self.live, student=self.student)
+        LiveSlideCheckin.objects.create(
+            live_session=self.live, participant=early, slide_index=0, is_correct=True, selected_object_ids=[self.right.id]
+        )
+        for number, student in enumerate(self.students[:3], start=2):
+            response = self._answer(student, [self.wrong.id], 1500)
+            self.assertEqual(response.data["slide_answer_count"], number)
+
+        counters = dict(LiveSlideAnswerCounter.objects.filter(live_session=self.live).values_list("name", "count"))
+        self.assertEqual(counters["answered"], 4)
+        self.assertEqual((counters["correct"], counters[f"sel:{self.wrong.id}"]), (1, 3))
+        data = self._distribution()
+        self.assertEqual((data["answered"], data["correct"]), (4, 1))
+        self.assertEqual([option["count"] for option in data["options"]], [1, 3])
+
+        self.client.post(f"/api/live/sessions/{self.live.id}/end/")
+        self.assertFalse(LiveSlideAnswerCounter.objects.filter(live_session=self.live).exists())
+        self.assertEqual(self._distribution()["answered"], 4)
+
+
+class LiveLeaderboardTests(LiveTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        students = User.objects.bulk_create([User(username=f"board_student_{i}", role="student") for i in range(30)])
+        self.participants = [
+            LiveParticipant.objects.create(live_session=self.live, student=student) for student in students
+        ]
+        self.client.force_authenticate(self.student)
+
+    def _get(self, version=None):
+        query = f"?version={version}" if version is not None else ""
+        response = self.client.get(f"/api/live/sessions/{self.live.id}/leaderboard/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _award(self, participant, points, best_streak=None):
+        participant.points += points
+        participant.best_streak = max(participant.best_streak, best_streak or 0)
+        participant.save(update_fields=["points", "best_streak"])
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.leaderboard_changed(participant, LiveParticipantSerializer(participant).data)
+
+    def _expected_ids(self, limit=20):
+        return list(
+            LiveParticipant.objects.filter(live_session=self.live)
+            .order_by("-points", "-best_streak", "joined_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+
+    def test_client_replaying_deltas_matches_the_database_order(self):
+        rng = random.Random(7)
+        data = self._get()
+        rows, version = data["leaderboard"], data["leaderboard_version"]
+        self.assertEqual([row["id"] for row in rows], self._expected_ids())
+
+        for _ in range(60):
+            for participant in rng.sample(self.participants, rng.randint(0, 3)):
+                self._award(participant, rng.choice([0, 30, 50, 70, 100]), rng.randint(0, 4))
+            data = self._get(version)
+            if data.get("leaderboard_unchanged"):
+                self.assertEqual(data["leaderboard_version"], version)
+            else:
+                self.assertNotIn("leaderboard", data)
+                self.assertLessEqual(len(data["leaderboard_changes"]), 20)
+                for row in data["leaderboard_changes"]:
+                    while len(rows) < row["rank"]:
+                        rows.append(None)
+                    rows[row["rank"] - 1] = row
+                del rows[data["leaderboard_size"] :]
+            version = data["leaderboard_version"]
+            self.assertEqual([row["id"] for row in rows], self._expected_ids())
+            self.assertEqual([row["rank"] for row in rows], list(range(1, len(rows) + 1)))
+
+    def test_unchanged_version_is_answered_from_memory(self):
+        version = self._get()["leaderboard_version"]
+        # Only the session lookup hits the DB.
+        with self.assertNumQueries(1):
+            data = self._get(version)
+        self.assertEqual(data, {"leaderboard_unchanged": True, "leaderboard_version": version})
+
+    def test_change_from_another_worker_reloads_the_board(self):
+        version = self._get()["leaderboard_version"]
+        last = self.participants[-1]
+        # Another process awards the points: only the shared version moves.
+        LiveParticipant.objects.filter(pk=last.pk).update(points=500)
+        leaderboard._bump_version(self.live.id)
+
+        data = self._get(version)
+        self.assertEqual(data["leaderboard_version"], version + 1)
+        self.assertEqual(data["leaderboard_changes"][0]["id"], last.id)
+        self.assertEqual(data["leaderboard_changes"][0]["rank"], 1)
+        self.assertEqual(len(data["leaderboard_changes"]), 20)
+
+        # A version the board has no history for gets the full list.
+        self.assertEqual(len(self._get(version - 5)["leaderboard"]), 20)
+
+    @override_settings(LIVE_SINGLE_PROCESS=False)
+    def test_without_shared_cache_versions_come_from_the_row(self):
+        self.test_change_from_another_worker_reloads_the_board()
+        self.live.refresh_from_db()
+        self.assertEqual(self._get()["leaderboard_version"], self.live.leaderboard_version)
+        self.assertEqual(leaderboard._bump_version(self.live.id), self.live.leaderboard_version + 1)
+        self.test_client_replaying_deltas_matches_the_database_order()
+
+
+class LiveCodeTests(LiveTestMixin, TestCase):
+    def test_allocation_is_one_insert_and_never_repeats(self):
+        with self.assertNumQueries(1):
+            code = LiveCodeAllocation.allocate()
+        self.assertEqual(len(code), CODE_LENGTH)
+        codes = {code} | {LiveCodeAllocation.allocate() for _ in range(2000)}
+        self.assertEqual(len(codes), 2001)
+        self.assertTrue(all(set(c) <= set(CODE_ALPHABET) for c in codes))
+
+    def test_lookup_ignores_case_spacing_and_cyrillic_lookalikes(self):
+        self.client.force_authenticate(self.student)
+        # Cyrillic "а", "в", "с" typed on a Kazakh keyboard.
+        response = self.client.get("/api/live/sessions/by-code/ав с-234/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["id"], self.live.id)
+
+        self.live.end()
+        response = self.client.get("/api/live/sessions/by-code/abc234/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_active_codes_are_unique_after_normalization(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LiveSession.objects.create(lesson=self.lesson, teacher=self.teacher, live_code="abc234")
+        self.live.end()
+        LiveSession.objects.create(lesson=self.lesson, teacher=self.teacher, live_code="abc234")
+
+    def test_start_allocates_a_code(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post("/api/live/sessions/start/", {"lesson_id": self.lesson.id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        live = LiveSession.objects.get(pk=response.data["id"])
+        self.assertEqual(live.live_code_normalized, live.live_code)
+        self.assertEqual(LiveCodeAllocation.objects.count(), 1)
+
+    def test_start_skips_a_code_still_held_by_an_active_session(self):
+        taken = live_code_for(LiveCodeAllocation.objects.create().id + 1)
+        LiveSession.objects.create(lesson=self.lesson, teacher=self.student, live_code=taken)
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post("/api/live/sessions/start/", {"lesson_id": self.lesson.id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.data["live_code"], taken)
+        self.assertEqual(LiveCodeAllocation.objects.count(), 3)
+
+
+class LivePptxConversionTests(LiveTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        pdftoppm = mock.patch("live.office.subprocess.run", side_effect=_fake_pdftoppm)
+        self.pdftoppm = pdftoppm.start()
+        self.addCleanup(pdftoppm.stop)
+        self.client.force_authenticate(self.teacher)
+
+    def _start(self, content=b"same deck"):
+        response = self.client.post(
+            "/api/live/sessions/start/",
+            {
+                "lesson_id": self.lesson.id,
+                "source_type": LiveSession.SOURCE_PPTX,
+                "pptx_file": SimpleUploadedFile("deck.pptx", content),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_start_queues_conversion_instead_of_blocking(self):
+        with mock.patch.object(LiveSession, "generate_pptx_preview_pdf", autospec=True) as convert:
+            data = self._start()
+        convert.assert_not_called()
+        self.assertEqual(data["pptx_preview_status"], LiveSession.PREVIEW_PENDING)
+
+        with mock.patch.object(LiveSession, "generate_pptx_preview_pdf", autospec=True, side_effect=_fake_conversion):
+            self.assertEqual(convert_pptx_preview(data["id"]), LiveSession.PREVIEW_DONE)
+            # The job is no longer claimable, so a duplicate worker does nothing.
+            self.assertIsNone(convert_pptx_preview(data["id"]))
+        live = LiveSession.objects.get(pk=data["id"])
+        self.assertTrue(live.pptx_preview_pdf.name.endswith(".pdf"))
+
+    def test_same_pptx_content_reuses_converted_pdf(self):
+        first = self._start()
+        with mock.patch.object(LiveSession, "generate_pptx_preview_pdf", autospec=True, side_effect=_fake_conversion):
+            convert_pptx_preview(first["id"])
+
+        with mock.patch.object(LiveSession, "generate_pptx_preview_pdf", autospec=True) as convert:
+            second = self._start()
+        convert.assert_not_called()
+        self.assertEqual(second["pptx_preview_status"], LiveSession.PREVIEW_DONE)
+        self.assertEqual(
+            LiveSession.objects.get(pk=second["id"]).pptx_preview_pdf.name,
+            LiveSession.objects.get(pk=first["id"]).pptx_preview_pdf.name,
+        )
+
+    @override_settings(LIVE_PPTX_PAGE_WIDTHS=[320, 640])
+    def test_preview_pdf_is_split_into_pages_per_width(self):
+        self.live.source_type = LiveSession.SOURCE_PPTX
+        self.live.pptx_sha256 = "abc"
+        _fake_conversion(self.live)
+
+        self.assertTrue(render_preview_pages(self.live))
+        ext = "webp" if office.Image is not None else "png"
+        self.assertEqual(
+            self.live.pptx_pages,
+            {"count": 2, "widths": [320, 640], "ext": ext, "prefix": "live/pptx_pages/abc"},
+        )
+        self.assertEqual(self.pdftoppm.call_count, 2)
+        for width in (320, 640):
+            for number in (1, 2):
+                self.assertTrue(os.path.isfile(os.path.join(self.media_root, "live", "pptx_pages", "abc", str(width), f"{number}.{ext}")))
+
+    def test_current_slide_serves_single_page_with_prefetch(self):
+        self.live.source_type = LiveSession.SOURCE_PPTX
+        self.live.current_slide_index = 1
+        self.live.pptx_preview_status = LiveSession.PREVIEW_DONE
+        self.live.pptx_pages = {"count": 3, "widths": [640, 1280], "ext": "webp", "prefix": "live/pptx_pages/abc"}
+        self.live.save()
+
+        self.client.force_authenticate(self.student)
+        response = self.client.get(f"/api/live/sessions/{self.live.id}/current-slide/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_slides"], 3)
+        self.assertTrue(response.data["page"]["urls"]["640"].endswith("/media/live/pptx_pages/abc/640/2.webp"))
+        self.assertEqual(len(response.data["prefetch"]), 2)
+        self.assertTrue(response.data["prefetch"][0].endswith("/640/3.webp"))
+        self.assertIn("rel=prefetch", response["Link"])
+
+
+class _FakeOfficeInstance:
+    port = 0
+
+    def __init__(self):
+        self.restarts = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def restart(self):
+        self.restarts += 1
+
+    def is_alive(self):
+        return True
+
+    def convert(self, source_path, target_path):
+        if source_path.endswith("slow.pptx"):
+            time.sleep(0.5)
+        with open(target_path, "wb") as fh:
+            fh.write(b"%PDF-1.4 fake")
+
+
+class OfficeServerTests(SimpleTestCase):
+    def setUp(self):
+        self.instance = _FakeOfficeInstance()
+        self.server = OfficeServer("127.0.0.1:0", OfficePool([self.instance]))
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address
+        self.address = f"{host}:{port}"
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+
+    def test_conversion_goes_through_warm_instance(self):
+        target = f"{self.work_dir}/deck.pdf"
+        with override_settings(LIVE_OFFICE_SERVER=self.address):
+            convert_to_pdf(f"{self.work_dir}/deck.pptx", target)
+        with open(target, "rb") as fh:
+            self.assertTrue(fh.read().startswith(b"%PDF"))
+
+    def test_job_timeout_restarts_instance(self):
+        with override_settings(LIVE_OFFICE_SERVER=self.address):
+            with self.assertRaises(ConversionFailed):
+                convert_to_pdf(f"{self.work_dir}/slow.pptx", f"{self.work_dir}/slow.pdf", timeout=0.1)
+        self.assertEqual(self.instance.restarts, 1)
+
+
+class LiveScoringConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username="teacher_scoring", password="pass1234", role="teacher")
+        lesson = Lesson.objects.create(owner=teacher, title="Live scoring", topic="SQL")
+        self.live = LiveSession.objects.create(lesson=lesson, teacher=teacher, live_code="SCR234")
+        students = User.objects.bulk_create(
+            [User(username=f"scoring_student_{i}", role="student") for i in range(200)]
+        )
+        self.participants = LiveParticipant.objects.bulk_create(
+            [LiveParticipant(live_session=self.live, student=student) for student in students]
+        )
+
+    def _checkin(self, participant_id, is_correct):
+        deadline = time.monotonic() + 60
+        try:
+            while True:
+                try:
+                    return record_checkin(self.live, participant_id, 0, 100, is_correct)
+                except OperationalError as exc:
+                    # The shared-cache test database reports a busy writer as "locked"; retry the transaction.
+                    if "locked" not in str(exc) or time.monotonic() > deadline:
+                        raise
+                    time.sleep(random.uniform(0.001, 0.01))
+        finally:
+            connection.close()
+
+    def test_simultaneous_checkins_get_unique_ranks_and_exact_points(self):
+        # Every participant answers twice at once; every fifth one answers wrong.
+        jobs = [(p.id, idx % 5 != 0) for idx, p in enumerate(self.participants)] * 2
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda job: self._checkin(*job), jobs))
+
+        created = [result for result in results if result.created]
+        correct = [result for result in created if result.rank is not None]
+        self.assertEqual(len(created), 200)
+        self.assertEqual(sorted(result.rank for result in correct), list(range(1, 161)))
+        expected_total = 100 + 70 + 50 + 30 * 157
+        self.assertEqual(sum(result.awarded for result in created), expected_total)
+
+        self.assertEqual(LiveSlideCheckin.objects.filter(live_session=self.live).count(), 200)
+        self.assertEqual(LiveSlideRankCounter.objects.get(live_session=self.live, slide_index=0).ranked_count, 160)
+        totals = LiveParticipant.objects.filter(live_session=self.live).aggregate(
+            points=Sum("points"), checkins=Sum("checkins_count"), streaks=Sum("streak")
+        )
+        self.assertEqual(totals, {"points": expected_total, "checkins": 200, "streaks": 160})
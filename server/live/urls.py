@@ -11,6 +11,7 @@ from .views import (
     LiveSlideCheckinView,
     LiveLeaderboardView,
     LiveParticipantsView,
+    LiveAnswerDistributionView,
     StartLiveTimerView,
     StopLiveTimerView,
 )
@@ -25,6 +26,7 @@ urlpatterns = [
     path("sessions/<int:pk>/checkin/", LiveSlideCheckinView.as_view(), name="live-checkin"),
     path("sessions/<int:pk>/leaderboard/", LiveLeaderboardView.as_view(), name="live-leaderboard"),
     path("sessions/<int:pk>/participants/", LiveParticipantsView.as_view(), name="live-participants"),
+    path("sessions/<int:pk>/answers/", LiveAnswerDistributionView.as_view(), name="live-answers"),
     path("sessions/<int:pk>/timer/start/", StartLiveTimerView.as_view(), name="live-timer-start"),
     path("sessions/<int:pk>/timer/stop/", StopLiveTimerView.as_view(), name="live-timer-stop"),
     path("sessions/active/", ActiveLiveSessionsView.as_view(), name="live-active"),
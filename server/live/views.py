@@ -1,18 +1,37 @@
-import random
-import string
-from typing import Optional, Tuple, List
+from typing import List, Optional, Tuple
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from rest_framework import status, permissions, generics
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from edu_platform.caching import cache_response
 from lessons.models import Lesson
-from slide.models import Slide, SlideObject
-from .models import LiveSession, LiveParticipant, LiveSlideCheckin
+from slide.models import SlideObject
+from .codes import normalize_live_code
+from .conversion import enqueue_pptx_preview, preview_page_urls
+from .deck import deck_slide_at, get_deck_snapshot
+from .events import publish_live_event
+from .leaderboard import get_leaderboard_store, leaderboard_changed, leaderboard_payload
+from .models import LiveCodeAllocation, LiveSession, LiveParticipant, LiveSlideAnswerStats
+from .presence import flush_presence, get_presence_store, mark_seen
+from .scoring import record_checkin
+from .state import (
+    answer_distribution,
+    end_sessions,
+    format_answer_distribution,
+    load_hot_state,
+    load_hot_states,
+    record_answer,
+    set_slide_index,
+    start_timer,
+    stop_timer,
+)
 from .serializers import (
     LiveSessionSerializer,
     LiveParticipantSerializer,
@@ -24,42 +43,30 @@ from .serializers import (
     LiveTimerSerializer,
 )
 
-CLEAR_CODE_TRANSLATION = str.maketrans(
-    {
-        "А": "A",
-        "В": "B",
-        "С": "C",
-        "Е": "E",
-        "Н": "H",
-        "К": "K",
-        "М": "M",
-        "О": "O",
-        "Р": "P",
-        "Т": "T",
-        "У": "Y",
-        "Х": "X",
-        "І": "I",
-    }
-)
+def _get_active_live(queryset, **lookup) -> LiveSession:
+    return load_hot_state(get_object_or_404(queryset, is_active=True, **lookup))
 
 
-def _require_teacher(user):
-    if getattr(user, "role", None) != "teacher":
-        raise PermissionDenied("Тек мұғалім live сабақты басқара алады.")
+# Codes handed out before the allocator existed may still be held by active sessions.
+LIVE_CODE_ATTEMPTS = 5
 
 
-def _generate_live_code():
-    alphabet = string.ascii_uppercase.replace("O", "") + "23456789"
-    for _ in range(20):
-        code = "".join(random.choice(alphabet) for _ in range(6))
-        if not LiveSession.objects.filter(is_active=True, live_code=code).exists():
-            return code
-    return "".join(random.choice(alphabet) for _ in range(8))
+def _create_live_session(**fields) -> LiveSession:
+    """Create an active session with a freshly allocated code, moving on to the next code on a clash."""
+    for attempt in range(LIVE_CODE_ATTEMPTS):
+        # Allocated outside the savepoint, so a rolled-back clash does not hand the same code out again.
+        live_code = LiveCodeAllocation.allocate()
+        try:
+            with transaction.atomic():
+                return LiveSession.objects.create(live_code=live_code, **fields)
+        except IntegrityError:
+            if attempt == LIVE_CODE_ATTEMPTS - 1:
+                raise
 
 
-def _normalize_live_code(value: str) -> str:
-    raw = (value or "").strip().upper().translate(CLEAR_CODE_TRANSLATION)
-    return "".join(ch for ch in raw if ch.isalnum())
+def _require_teacher(user):
+    if getattr(user, "role", None) != "teacher":
+        raise PermissionDenied("Тек мұғалім live сабақты басқара алады.")
 
 
 class StartLiveSessionView(APIView):
@@ -80,18 +87,13 @@ class StartLiveSessionView(APIView):
         lesson = get_object_or_404(Lesson, id=lesson_id, owner=request.user)
 
         # Бұрынғы active live-тарды жабамыз
-        LiveSession.objects.filter(
-            lesson=lesson,
-            teacher=request.user,
-            is_active=True,
-        ).update(is_active=False, ended_at=timezone.now())
+        end_sessions(LiveSession.objects.filter(lesson=lesson, teacher=request.user))
 
         source_type = serializer.validated_data.get("source_type", LiveSession.SOURCE_SLIDES)
-        live = LiveSession.objects.create(
+        live = _create_live_session(
             lesson=lesson,
             teacher=request.user,
             is_active=True,
-            live_code=_generate_live_code(),
             source_type=source_type,
             canva_embed_url=(
                 serializer.validated_data.get("canva_embed_url", "")
@@ -111,7 +113,7 @@ class StartLiveSessionView(APIView):
         )
 
         if source_type == LiveSession.SOURCE_PPTX and live.pptx_file:
-            live.generate_pptx_preview_pdf()
+            enqueue_pptx_preview(live)
 
         return Response(
             LiveSessionSerializer(live, context={"request": request}).data,
@@ -137,6 +139,10 @@ class EndLiveSessionView(APIView):
             )
 
         live.end()
+        get_presence_store().forget_session(live.id)
+        get_leaderboard_store().forget_session(live.id)
+        flush_presence(force=True)
+        publish_live_event(live.id, "session.ended")
         return Response(LiveSessionSerializer(live, context={"request": request}).data)
 
 
@@ -150,18 +156,14 @@ class UpdateSlideIndexView(APIView):
 
     def post(self, request, pk):
         _require_teacher(request.user)
-        live = get_object_or_404(
-            LiveSession,
-            pk=pk,
-            teacher=request.user,
-            is_active=True,
-        )
+        live = _get_active_live(LiveSession.objects.all(), pk=pk, teacher=request.user)
 
         serializer = SlideUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        live.current_slide_index = serializer.validated_data["slide_index"]
-        live.save(update_fields=["current_slide_index"])
+        # One store write per click; the row follows write-behind.
+        set_slide_index(live, serializer.validated_data["slide_index"])
+        publish_live_event(live.id, "slide.changed", slide_index=live.current_slide_index)
 
         return Response(LiveSessionSerializer(live, context={"request": request}).data)
 
@@ -174,17 +176,20 @@ class LiveSessionByCodeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, code):
-        normalized = _normalize_live_code(code)
+        normalized = normalize_live_code(code)
+        # Served by the partial unique index on live_code_normalized over active sessions.
         live = (
             LiveSession.objects.select_related("lesson", "teacher")
-            .filter(is_active=True, live_code__iexact=normalized)
+            .filter(is_active=True, live_code_normalized=normalized)
+            .exclude(live_code_normalized="")
             .first()
         )
         if not live:
             return Response({"detail": "Тірі сабақ табылмады."}, status=status.HTTP_404_NOT_FOUND)
-        if live.source_type == LiveSession.SOURCE_PPTX and live.pptx_file and not live.pptx_preview_pdf:
-            live.generate_pptx_preview_pdf()
-            live.refresh_from_db(fields=["pptx_preview_pdf"])
+        load_hot_state(live)
+        # Sessions started before the conversion queue existed are queued on first lookup.
+        if live.source_type == LiveSession.SOURCE_PPTX and live.pptx_file and not live.pptx_preview_status:
+            enqueue_pptx_preview(live)
         return Response(LiveSessionSerializer(live, context={"request": request}).data)
 
 
@@ -200,12 +205,14 @@ class ActiveLiveSessionsView(generics.ListAPIView):
     def get_queryset(self):
         return LiveSession.objects.filter(is_active=True).select_related("lesson", "teacher")
 
-
-def _leaderboard_data(live: LiveSession, limit: Optional[int] = 20):
-    qs = live.participants.select_related("student").order_by("-points", "-best_streak", "joined_at", "id")
-    if limit:
-        qs = qs[:limit]
-    return LiveParticipantSerializer(qs, many=True).data
+    # Timer and presence fields are computed at serialization time, hence the short TTL.
+    @cache_response(tags=["live_sessions"], timeout=lambda: settings.LIVE_ACTIVE_SESSIONS_CACHE_SECONDS)
+    def list(self, request, *args, **kwargs):
+        lives = load_hot_states(list(self.filter_queryset(self.get_queryset())))
+        page = self.paginate_queryset(lives)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(lives, many=True).data)
 
 
 def _upsert_participant(live: LiveSession, user, display_name: str = ""):
@@ -225,63 +232,38 @@ def _upsert_participant(live: LiveSession, user, display_name: str = ""):
         participant.current_slide_index = live.current_slide_index
         updated_fields.append("current_slide_index")
     if updated_fields:
-        updated_fields.append("last_seen_at")
         participant.save(update_fields=updated_fields)
-    else:
-        participant.save(update_fields=["last_seen_at"])
+    # last_seen_at is buffered in the presence store and flushed in batches.
+    mark_seen(participant)
     return participant
 
 
-def _live_slide_at_index(live: LiveSession, slide_index: Optional[int] = None) -> Tuple[Optional[Slide], int, int]:
-    slides = list(
-        Slide.objects.filter(lesson=live.lesson)
-        .only("id", "title", "order")
-        .order_by("order", "id")
-    )
-    total = len(slides)
-    if total == 0:
-        return None, 0, 0
+def _live_slide_at_index(live: LiveSession, slide_index: Optional[int] = None) -> Tuple[Optional[dict], int, int]:
     idx = slide_index if slide_index is not None else live.current_slide_index
-    idx = max(0, min(int(idx), total - 1))
-    return slides[idx], idx, total
+    return deck_slide_at(get_deck_snapshot(live.lesson), idx)
 
 
-def _slide_objects_payload(slide: Slide) -> List[dict]:
-    objects = (
-        SlideObject.objects.filter(slide=slide)
-        .only("id", "object_type", "data", "position", "z_index")
-        .order_by("z_index", "id")
-    )
-    return [
-        {
-            "id": obj.id,
-            "object_type": obj.object_type,
-            "data": obj.data or {},
-            "position": obj.position or {},
-            "z_index": obj.z_index or 0,
-        }
-        for obj in objects
-    ]
+def _checkbox_objects(slide: Optional[dict]) -> List[dict]:
+    return [obj for obj in (slide or {}).get("objects", []) if obj["object_type"] == SlideObject.CHECKBOX]
 
 
-def _evaluate_slide_answer(slide: Slide, answer_data: dict) -> Tuple[bool, bool, str]:
-    checkbox_objects = list(
-        SlideObject.objects.filter(slide=slide, object_type=SlideObject.CHECKBOX).only("id", "data")
-    )
+def _evaluate_slide_answer(slide: dict, answer_data: dict) -> Tuple[bool, bool, str, List[int]]:
+    """(is_answerable, is_correct, detail, selected checkbox ids)."""
+    checkbox_objects = _checkbox_objects(slide)
     if not checkbox_objects:
-        return False, False, "Бұл слайдта бағаланатын жауап жоқ."
+        return False, False, "Бұл слайдта бағаланатын жауап жоқ.", []
 
     correct_ids = sorted(
-        obj.id for obj in checkbox_objects if bool((obj.data or {}).get("correct"))
+        obj["id"] for obj in checkbox_objects if bool(obj["data"].get("correct"))
     )
     if not correct_ids:
-        return False, False, "Бұл слайдта дұрыс жауап белгіленбеген."
+        return False, False, "Бұл слайдта дұрыс жауап белгіленбеген.", []
 
     raw_selected = answer_data.get("selected_object_ids")
     if not isinstance(raw_selected, list):
         raw_selected = []
 
-    allowed_ids = {obj.id for obj in checkbox_objects}
+    allowed_ids = {obj["id"] for obj in checkbox_objects}
     selected_ids = []
     for item in raw_selected:
         try:
@@ -294,8 +276,8 @@ def _evaluate_slide_answer(slide: Slide, answer_data: dict) -> Tuple[bool, bool,
 
     is_correct = selected_ids == correct_ids
     if is_correct:
-        return True, True, "Дұрыс жауап. Ұпай қосылды."
-    return True, False, "Қате жауап. Ұпай қосылмайды."
+        return True, True, "Дұрыс жауап. Ұпай қосылды.", selected_ids
+    return True, False, "Қате жауап. Ұпай қосылмайды.", selected_ids
 
 
 class JoinLiveSessionView(APIView):
@@ -307,7 +289,7 @@ class JoinLiveSessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
+        live = _get_active_live(LiveSession.objects.all(), pk=pk)
         serializer = JoinLiveSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -316,10 +298,13 @@ class JoinLiveSessionView(APIView):
             request.user,
             serializer.validated_data.get("display_name", ""),
         )
+        participant_data = LiveParticipantSerializer(participant).data
+        leaderboard_changed(participant, participant_data)
+        publish_live_event(live.id, "leaderboard.updated", participant=participant_data, awarded_points=0)
         return Response(
             {
-                "participant": LiveParticipantSerializer(participant).data,
-                "leaderboard": _leaderboard_data(live, limit=12),
+                "participant": participant_data,
+                **leaderboard_payload(live.id, serializer.validated_data.get("leaderboard_version"), limit=12),
             }
         )
 
@@ -333,17 +318,15 @@ class LiveHeartbeatView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
+        live = _get_active_live(LiveSession.objects.all(), pk=pk)
         serializer = HeartbeatSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         participant = _upsert_participant(live, request.user)
-        fields_to_update = ["last_seen_at"]
         next_slide = serializer.validated_data.get("current_slide_index")
-        if next_slide is not None:
+        if next_slide is not None and participant.current_slide_index != max(0, int(next_slide)):
             participant.current_slide_index = max(0, int(next_slide))
-            fields_to_update.append("current_slide_index")
-        participant.save(update_fields=list(set(fields_to_update)))
+            participant.save(update_fields=["current_slide_index"])
         return Response(
             {
                 "ok": True,
@@ -352,6 +335,31 @@ class LiveHeartbeatView(APIView):
         )
 
 
+def _pptx_page_response(request, live: LiveSession):
+    """Only the current page image (plus a prefetch hint for the next one) instead of the whole PDF."""
+    total = (live.pptx_pages or {}).get("count", 0)
+    idx = max(0, min(int(live.current_slide_index), total - 1)) if total else 0
+    page = preview_page_urls(live, idx)
+    next_page = preview_page_urls(live, idx + 1)
+    absolute = request.build_absolute_uri
+    page_urls = {width: absolute(url) for width, url in (page or {}).items()}
+    prefetch = [absolute(url) for url in (next_page or {}).values()]
+    response = Response(
+        {
+            "slide_index": idx,
+            "total_slides": total,
+            "slide": None,
+            "objects": [],
+            "pptx_preview_status": live.pptx_preview_status,
+            "page": {"urls": page_urls} if page else None,
+            "prefetch": prefetch,
+        }
+    )
+    if prefetch:
+        response["Link"] = ", ".join(f"<{url}>; rel=prefetch" for url in prefetch)
+    return response
+
+
 class LiveCurrentSlideView(APIView):
     """
     GET /api/live/sessions/<pk>/current-slide/
@@ -360,29 +368,23 @@ class LiveCurrentSlideView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
+        live = _get_active_live(LiveSession.objects.select_related("lesson"), pk=pk)
         if request.user.id != live.teacher_id:
             _upsert_participant(live, request.user)
-
-        slide, safe_index, total = _live_slide_at_index(live)
-        if not slide:
-            return Response(
-                {
-                    "slide_index": 0,
-                    "total_slides": 0,
-                    "slide": None,
-                    "objects": [],
-                }
-            )
-
-        return Response(
-            {
-                "slide_index": safe_index,
-                "total_slides": total,
-                "slide": {"id": slide.id, "title": slide.title},
-                "objects": _slide_objects_payload(slide),
-            }
-        )
+        if live.source_type == LiveSession.SOURCE_PPTX:
+            return _pptx_page_response(request, live)
+
+        snapshot = get_deck_snapshot(live.lesson)
+        slide, _, _ = deck_slide_at(snapshot, live.current_slide_index)
+        # The deck is pre-serialized per slide, so revalidation is a 304 without touching the DB.
+        body, etag = (slide["body"], slide["etag"]) if slide else (snapshot["empty_body"], snapshot["empty_etag"])
+        if request.META.get("HTTP_IF_NONE_MATCH") == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
 
 class LiveSlideCheckinView(APIView):
@@ -394,33 +396,16 @@ class LiveSlideCheckinView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
+        live = _get_active_live(LiveSession.objects.select_related("lesson"), pk=pk)
         serializer = SlideCheckinSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         slide_index = serializer.validated_data["slide_index"]
         reaction_ms = serializer.validated_data.get("reaction_ms", 0)
         answer_data = serializer.validated_data.get("answer_data") or {}
+        leaderboard_version = serializer.validated_data.get("leaderboard_version")
         participant = _upsert_participant(live, request.user)
 
-        existing = LiveSlideCheckin.objects.filter(
-            participant=participant,
-            slide_index=slide_index,
-        ).first()
-        if existing:
-            return Response(
-                {
-                    "awarded_points": 0,
-                    "rank": None,
-                    "is_correct": False,
-                    "is_answerable": True,
-                    "detail": "Бұл слайд үшін чек-ин бұрын жіберілген.",
-                    "participant": LiveParticipantSerializer(participant).data,
-                    "leaderboard": _leaderboard_data(live, limit=12),
-                },
-                status=status.HTTP_200_OK,
-            )
-
         if live.source_type != LiveSession.SOURCE_SLIDES:
             return Response(
                 {
@@ -430,7 +415,7 @@ class LiveSlideCheckinView(APIView):
                     "is_answerable": False,
                     "detail": "Ұпай есептеу тек Slides режиміндегі сұрақтарда жұмыс істейді.",
                     "participant": LiveParticipantSerializer(participant).data,
-                    "leaderboard": _leaderboard_data(live, limit=12),
+                    **leaderboard_payload(live.id, leaderboard_version, limit=12),
                 },
                 status=status.HTTP_200_OK,
             )
@@ -445,7 +430,7 @@ class LiveSlideCheckinView(APIView):
                     "is_answerable": False,
                     "detail": "Бұл live сабақта слайд табылмады.",
                     "participant": LiveParticipantSerializer(participant).data,
-                    "leaderboard": _leaderboard_data(live, limit=12),
+                    **leaderboard_payload(live.id, leaderboard_version, limit=12),
                 },
                 status=status.HTTP_200_OK,
             )
@@ -458,12 +443,12 @@ class LiveSlideCheckinView(APIView):
                     "is_answerable": False,
                     "detail": "Мұғалім басқа слайдқа ауысты. Қайта жауап беріңіз.",
                     "participant": LiveParticipantSerializer(participant).data,
-                    "leaderboard": _leaderboard_data(live, limit=12),
+                    **leaderboard_payload(live.id, leaderboard_version, limit=12),
                 },
                 status=status.HTTP_200_OK,
             )
 
-        is_answerable, is_correct, answer_detail = _evaluate_slide_answer(current_slide, answer_data)
+        is_answerable, is_correct, answer_detail, selected_ids = _evaluate_slide_answer(current_slide, answer_data)
         if not is_answerable:
             return Response(
                 {
@@ -473,68 +458,42 @@ class LiveSlideCheckinView(APIView):
                     "is_answerable": False,
                     "detail": answer_detail,
                     "participant": LiveParticipantSerializer(participant).data,
-                    "leaderboard": _leaderboard_data(live, limit=12),
+                    **leaderboard_payload(live.id, leaderboard_version, limit=12),
                 },
                 status=status.HTTP_200_OK,
             )
 
-        rank = None
-        base_points = 30
-        if is_correct:
-            rank = (
-                LiveSlideCheckin.objects.filter(
-                    live_session=live,
-                    slide_index=slide_index,
-                    points_awarded__gt=0,
-                ).count()
-                + 1
+        # Duplicates are rejected by the (participant, slide_index) unique constraint.
+        # One transaction with the answer counters, so a cold-start seed never misses this checkin.
+        with transaction.atomic():
+            result = record_checkin(live, participant.id, slide_index, reaction_ms, bool(is_correct), selected_ids)
+            if result.created:
+                answer_count = record_answer(live.id, slide_index, bool(is_correct), selected_ids, reaction_ms)
+        participant = result.participant
+        if not result.created:
+            return Response(
+                {
+                    "awarded_points": 0,
+                    "rank": None,
+                    "is_correct": False,
+                    "is_answerable": True,
+                    "detail": "Бұл слайд үшін чек-ин бұрын жіберілген.",
+                    "participant": LiveParticipantSerializer(participant).data,
+                    **leaderboard_payload(live.id, leaderboard_version, limit=12),
+                },
+                status=status.HTTP_200_OK,
             )
-            if rank == 1:
-                base_points = 100
-            elif rank == 2:
-                base_points = 70
-            elif rank == 3:
-                base_points = 50
-
-        time_factor = 1.0
-        if live.timer_duration_seconds > 0 and live.timer_started_at and live.timer_ends_at:
-            if live.timer_remaining_seconds <= 0:
-                time_factor = 0.0
-            else:
-                time_factor = max(0.3, live.timer_remaining_seconds / float(live.timer_duration_seconds))
-
-        awarded = max(0, int(round(base_points * time_factor))) if is_correct else 0
-
-        LiveSlideCheckin.objects.create(
-            live_session=live,
-            participant=participant,
+        awarded, rank = result.awarded, result.rank
+
+        participant_data = LiveParticipantSerializer(participant).data
+        leaderboard_changed(participant, participant_data)
+        publish_live_event(
+            live.id,
+            "leaderboard.updated",
+            participant=participant_data,
+            awarded_points=awarded,
             slide_index=slide_index,
-            reaction_ms=reaction_ms,
-            points_awarded=awarded,
-        )
-
-        if is_correct:
-            if participant.last_checked_slide_index + 1 == slide_index:
-                participant.streak += 1
-            else:
-                participant.streak = 1
-        else:
-            participant.streak = 0
-        participant.best_streak = max(participant.best_streak, participant.streak)
-        participant.last_checked_slide_index = slide_index
-        participant.current_slide_index = max(participant.current_slide_index, slide_index)
-        participant.checkins_count += 1
-        participant.points += awarded
-        participant.save(
-            update_fields=[
-                "streak",
-                "best_streak",
-                "last_checked_slide_index",
-                "current_slide_index",
-                "checkins_count",
-                "points",
-                "last_seen_at",
-            ]
+            slide_answer_count=answer_count,
         )
 
         return Response(
@@ -544,8 +503,9 @@ class LiveSlideCheckinView(APIView):
                 "is_correct": bool(is_correct),
                 "is_answerable": True,
                 "detail": answer_detail,
-                "participant": LiveParticipantSerializer(participant).data,
-                "leaderboard": _leaderboard_data(live, limit=12),
+                "slide_answer_count": answer_count,
+                "participant": participant_data,
+                **leaderboard_payload(live.id, leaderboard_version, limit=12),
             },
             status=status.HTTP_201_CREATED,
         )
@@ -553,14 +513,18 @@ class LiveSlideCheckinView(APIView):
 
 class LiveLeaderboardView(APIView):
     """
-    GET /api/live/sessions/<pk>/leaderboard/
+    GET /api/live/sessions/<pk>/leaderboard/?version=<leaderboard_version>
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
-        return Response({"leaderboard": _leaderboard_data(live, limit=20)})
+        live = _get_active_live(LiveSession.objects.all(), pk=pk)
+        try:
+            since = int(request.query_params["version"])
+        except (KeyError, ValueError):
+            since = None
+        return Response(leaderboard_payload(live.id, since, limit=20))
 
 
 class LiveParticipantsView(APIView):
@@ -571,8 +535,9 @@ class LiveParticipantsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
-        live = get_object_or_404(LiveSession, pk=pk, is_active=True)
+        live = _get_active_live(LiveSession.objects.all(), pk=pk)
         _require_teacher(request.user)
+        flush_presence(force=True)
         data = LiveParticipantSerializer(
             live.participants.select_related("student").order_by("-last_seen_at", "-points", "id"),
             many=True,
@@ -580,6 +545,49 @@ class LiveParticipantsView(APIView):
         return Response({"participants": data})
 
 
+class LiveAnswerDistributionView(APIView):
+    """
+    GET /api/live/sessions/<pk>/answers/?slide_index=3
+    Мұғалімге слайд бойынша жауаптар үлестірімі (әдепкі — ағымдағы слайд).
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        _require_teacher(request.user)
+        live = get_object_or_404(LiveSession.objects.select_related("lesson"), pk=pk, teacher=request.user)
+        load_hot_state(live)
+        try:
+            slide_index = max(0, int(request.query_params["slide_index"]))
+        except (KeyError, ValueError):
+            slide_index = live.current_slide_index
+
+        options = []
+        if live.source_type == LiveSession.SOURCE_SLIDES:
+            snapshot = get_deck_snapshot(live.lesson)
+            slides = snapshot["slides"]
+            slide = slides[slide_index] if slide_index < len(slides) else None
+            options = _checkbox_objects(slide)
+        option_ids = [obj["id"] for obj in options]
+
+        if live.is_active:
+            data = answer_distribution(live.id, slide_index, option_ids)
+        else:
+            stats = LiveSlideAnswerStats.objects.filter(live_session=live, slide_index=slide_index).first()
+            counters = {}
+            if stats:
+                counters = {"answered": stats.answered, "correct": stats.correct}
+                counters.update({f"sel:{oid}": count for oid, count in stats.selection_counts.items()})
+                counters.update({f"rt:{index}": count for index, count in enumerate(stats.reaction_buckets)})
+            data = format_answer_distribution(slide_index, counters, option_ids)
+
+        correct_ids = {obj["id"] for obj in options if bool(obj["data"].get("correct"))}
+        for option in data["options"]:
+            option["correct"] = option["object_id"] in correct_ids
+        data["participants"] = live.participants.count()
+        return Response(data)
+
+
 class StartLiveTimerView(APIView):
     """
     POST /api/live/sessions/<pk>/timer/start/
@@ -590,10 +598,17 @@ class StartLiveTimerView(APIView):
 
     def post(self, request, pk):
         _require_teacher(request.user)
-        live = get_object_or_404(LiveSession, pk=pk, teacher=request.user, is_active=True)
+        live = _get_active_live(LiveSession.objects.all(), pk=pk, teacher=request.user)
         serializer = LiveTimerSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        live.start_timer(serializer.validated_data["duration_seconds"])
+        start_timer(live, serializer.validated_data["duration_seconds"])
+        publish_live_event(
+            live.id,
+            "timer.started",
+            timer_duration_seconds=live.timer_duration_seconds,
+            timer_started_at=live.timer_started_at,
+            timer_ends_at=live.timer_ends_at,
+        )
         return Response(LiveSessionSerializer(live, context={"request": request}).data)
 
 
@@ -606,6 +621,7 @@ class StopLiveTimerView(APIView):
 
     def post(self, request, pk):
         _require_teacher(request.user)
-        live = get_object_or_404(LiveSession, pk=pk, teacher=request.user, is_active=True)
-        live.stop_timer()
+        live = _get_active_live(LiveSession.objects.all(), pk=pk, teacher=request.user)
+        stop_timer(live)
+        publish_live_event(live.id, "timer.stopped")
         return Response(LiveSessionSerializer(live, context={"request": request}).data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Slide, SlideObject, SlideTemplate, Submission
+from .models import DocxImportJob, Slide, SlideObject, SlideTemplate, Submission, TemplateAnswerStats
 
 
 @admin.register(Slide)
@@ -25,3 +25,15 @@ class SlideTemplateAdmin(admin.ModelAdmin):
 @admin.register(Submission)
 class SlideSubmissionAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "slide", "template", "duration_seconds", "score", "created_at")
+
+
+@admin.register(TemplateAnswerStats)
+class TemplateAnswerStatsAdmin(admin.ModelAdmin):
+    list_display = ("id", "template", "question_index", "answer_key", "count", "wrong_count", "last_answered_at")
+    list_filter = ("template__template_type",)
+
+
+@admin.register(DocxImportJob)
+class DocxImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "author", "title", "mode", "status", "paragraphs_read", "questions_detected", "created_at")
+    list_filter = ("status",)
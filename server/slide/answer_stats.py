@@ -0,0 +1,207 @@
+import hashlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import SlideTemplate, Submission, TemplateAnswerStats
+
+# Template types whose answers are kept in TemplateAnswerStats.
+TRACKED_TEMPLATE_TYPES = {"poll", "quiz"}
+
+
+def _digest(question_index: int, answer_key: str) -> str:
+    return hashlib.md5(f"{question_index}:{answer_key}".encode("utf-8")).hexdigest()
+
+
+def _same_text(answer, expected) -> bool:
+    return str(answer).strip().casefold() == str(expected).strip().casefold()
+
+
+def answer_keys(template: SlideTemplate, payload) -> List[Tuple[int, str, bool]]:
+    """(question_index, answer_key, is_wrong) for every answer a submission payload contributes."""
+    payload = payload if isinstance(payload, dict) else {}
+    cfg = template.data if isinstance(template.data, dict) else {}
+
+    if template.template_type == "poll":
+        answer = payload.get("answer")
+        return [] if answer is None else [(0, str(answer), False)]
+
+    if template.template_type != "quiz":
+        return []
+
+    questions = cfg.get("questions") if isinstance(cfg.get("questions"), list) else None
+    if not questions:
+        answer = payload.get("answer")
+        if answer is None:
+            return []
+        return [(0, str(answer), not _same_text(answer, cfg.get("answer", "")))]
+
+    answers = payload.get("answers")
+    keys = []
+    for idx, question in enumerate(questions):
+        if not isinstance(question, dict):
+            continue
+        if isinstance(answers, list):
+            answer = answers[idx] if idx < len(answers) else None
+        else:
+            answer = payload.get("answer") if idx == 0 else None
+        if answer is None:
+            continue
+        keys.append((idx, str(answer), not _same_text(answer, question.get("answer", ""))))
+    return keys
+
+
+def _apply(template: SlideTemplate, keys, sign: int, answered_at=None):
+    _apply_weighted(template, Counter(keys), sign, answered_at)
+
+
+def _apply_weighted(template: SlideTemplate, weighted: Counter, sign: int, answered_at=None):
+    """Add `sign * n` for every (question_index, answer_key, is_wrong) -> n in one conditional UPDATE."""
+    if not weighted:
+        return
+    digests = {}
+    for (idx, key, wrong), n in weighted.items():
+        entry = digests.setdefault(_digest(idx, key), [idx, key, 0, 0])
+        entry[2] += n
+        entry[3] += n if wrong else 0
+
+    def delta(position):
+        by_amount = {}
+        for digest, entry in digests.items():
+            if entry[position]:
+                by_amount.setdefault(entry[position], []).append(digest)
+        return Case(
+            *[When(answer_digest__in=group, then=Value(sign * n)) for n, group in by_amount.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    with transaction.atomic():
+        TemplateAnswerStats.objects.bulk_create(
+            [
+                TemplateAnswerStats(template=template, question_index=idx, answer_key=key, answer_digest=digest)
+                for digest, (idx, key, _, _) in digests.items()
+            ],
+            ignore_conflicts=True,
+        )
+        changes = {"count": F("count") + delta(2), "wrong_count": F("wrong_count") + delta(3)}
+        if answered_at is not None:
+            changes["last_answered_at"] = Greatest(Coalesce("last_answered_at", Value(answered_at)), Value(answered_at))
+        TemplateAnswerStats.objects.filter(template=template, answer_digest__in=list(digests)).update(**changes)
+
+
+def rebuild_template_answer_stats(template: SlideTemplate) -> int:
+    """Recount a template's histogram from its submissions and mark it built; returns the number of stat rows."""
+    counts: Dict[str, list] = OrderedDict()
+    rows = (
+        Submission.objects.filter(template=template)
+        .order_by("created_at", "id")
+        .values_list("data", "created_at")
+    )
+    for payload, created_at in rows.iterator(chunk_size=2000):
+        for idx, key, wrong in answer_keys(template, payload):
+            entry = counts.setdefault(_digest(idx, key), [idx, key, 0, 0, None])
+            entry[2] += 1
+            entry[3] += 1 if wrong else 0
+            entry[4] = created_at
+
+    with transaction.atomic():
+        TemplateAnswerStats.objects.filter(template=template).delete()
+        TemplateAnswerStats.objects.bulk_create(
+            [
+                TemplateAnswerStats(
+                    template=template,
+                    question_index=idx,
+                    answer_key=key,
+                    answer_digest=digest,
+                    count=count,
+                    wrong_count=wrong_count,
+                    last_answered_at=last_answered_at,
+                )
+                for digest, (idx, key, count, wrong_count, last_answered_at) in counts.items()
+            ],
+            batch_size=500,
+        )
+        # update() rather than save(): the template version (compiled answer keys) must not move.
+        template.answer_stats_built_at = timezone.now()
+        SlideTemplate.objects.filter(pk=template.pk).update(answer_stats_built_at=template.answer_stats_built_at)
+    return len(counts)
+
+
+def ensure_template_answer_stats(template: SlideTemplate) -> bool:
+    """Build the histogram on first use for templates answered before it existed. True if rebuilt."""
+    if template.answer_stats_built_at is not None:
+        return False
+    with transaction.atomic():
+        # A concurrent first submission waits on the template row, then finds the marker set.
+        built_at = (
+            SlideTemplate.objects.select_for_update()
+            .filter(pk=template.pk)
+            .values_list("answer_stats_built_at", flat=True)
+            .first()
+        )
+        if built_at is not None:
+            template.answer_stats_built_at = built_at
+            return False
+        rebuild_template_answer_stats(template)
+    return True
+
+
+def record_submission_answers(submission: Submission, sign: int = 1):
+    template = submission.template
+    if template is None or template.template_type not in TRACKED_TEMPLATE_TYPES:
+        return
+    if sign > 0 and ensure_template_answer_stats(template):
+        # The rebuild already counted this (saved) submission.
+        return
+    if sign < 0 and template.answer_stats_built_at is None:
+        return
+    _apply(
+        template,
+        answer_keys(template, submission.data),
+        sign,
+        answered_at=submission.created_at if sign > 0 else None,
+    )
+
+
+def record_submissions_answers(template: SlideTemplate, submissions) -> None:
+    """record_submission_answers for many saved submissions of one template, in a single update."""
+    if template is None or template.template_type not in TRACKED_TEMPLATE_TYPES or not submissions:
+        return
+    if ensure_template_answer_stats(template):
+        return
+    weighted = Counter()
+    for submission in submissions:
+        weighted.update(answer_keys(template, submission.data))
+    _apply_weighted(template, weighted, 1, answered_at=max(submission.created_at for submission in submissions))
+
+
+def replace_submission_answers(submission: Submission, previous_data):
+    template = submission.template
+    if template is None or template.template_type not in TRACKED_TEMPLATE_TYPES:
+        return
+    if ensure_template_answer_stats(template):
+        return
+    with transaction.atomic():
+        _apply(template, answer_keys(template, previous_data), -1)
+        _apply(template, answer_keys(template, submission.data), 1, answered_at=submission.created_at)
+
+
+def answer_counts(template: SlideTemplate, question_index: Optional[int] = None):
+    """{question_index: (Counter of answers, Counter of wrong answers)}, most recently answered first."""
+    qs = template.answer_stats.filter(count__gt=0).order_by(
+        "question_index", F("last_answered_at").desc(nulls_last=True), "id"
+    )
+    if question_index is not None:
+        qs = qs.filter(question_index=question_index)
+    result: Dict[int, Tuple[Counter, Counter]] = {}
+    for idx, key, count, wrong_count in qs.values_list("question_index", "answer_key", "count", "wrong_count"):
+        counts, wrong = result.setdefault(idx, (Counter(), Counter()))
+        counts[key] = count
+        if wrong_count:
+            wrong[key] = wrong_count
+    return result
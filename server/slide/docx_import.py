@@ -0,0 +1,535 @@
+import logging
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DocxImportJob, SlideTemplate
+
+logger = logging.getLogger(__name__)
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# A job left "running" longer than this is assumed to belong to a dead worker.
+STALE_RUNNING_SECONDS = 15 * 60
+# Progress is written back every this many paragraphs.
+PROGRESS_EVERY = 500
+NO_QUESTIONS_ERROR = "DOCX ішінен сұрақ табылмады. Формат мысалы: 1) ... A) ... B) ... C) ... Дұрыс жауап: A"
+
+QUESTION_RE = re.compile(r"^(?:сұрақ\s*)?(\d+)\s*[\)\.\:\-]\s*(.+)$", re.IGNORECASE)
+OPTION_RE = re.compile(r"^([A-DА-Г])\s*[\)\.\:\-]\s*(.+)$", re.IGNORECASE)
+CORRECT_RE = re.compile(
+    r"^(?:дұрыс\s*жауап|жауап|correct\s*answer|answer)\s*[:\-]\s*(.+)$",
+    re.IGNORECASE,
+)
+OPTION_INLINE_RE = re.compile(r"([A-DА-Г])\s*[\)\.]\s*", re.IGNORECASE)
+CORRECT_ANY_RE = re.compile(
+    r"(?:дұрыс\s*жауап|жауап|correct\s*answer|answer)\s*[:\-]\s*([A-DА-Г]|.+)$",
+    re.IGNORECASE,
+)
+
+
+def _normalize_option_label(label: str) -> str:
+    raw = (label or "").upper()
+    mapping = {
+        "А": "A",
+        "Б": "B",
+        "В": "C",
+        "Г": "D",
+    }
+    return mapping.get(raw, raw)
+
+
+def _resolve_answer(current):
+    options = current.get("options", [])
+    answer_label = current.get("answer_label")
+    answer_text = (current.get("answer_text") or "").strip()
+
+    if answer_label:
+        for o in options:
+            if o.get("label") == answer_label:
+                return o.get("text", "").strip()
+
+    if answer_text:
+        normalized = answer_text.lower().strip()
+        if len(normalized) == 1:
+            letter = _normalize_option_label(normalized)
+            for o in options:
+                if o.get("label") == letter:
+                    return o.get("text", "").strip()
+        for o in options:
+            if o.get("text", "").strip().lower() == normalized:
+                return o.get("text", "").strip()
+
+    for o in options:
+        text = (o.get("text") or "").strip()
+        if text.startswith("*"):
+            return text.lstrip("*").strip()
+
+    return (options[0].get("text") or "").strip() if options else ""
+
+
+def parse_quiz_questions(lines):
+    """Questions found in an iterable of paragraph lines; consumes it once, front to back."""
+    questions = []
+    warnings = []
+    current = None
+
+    def parse_inline_question(raw_line: str):
+        raw = (raw_line or "").strip()
+        if not raw or "?" not in raw:
+            return None
+
+        correct_match = CORRECT_ANY_RE.search(raw)
+        if correct_match:
+            body = raw[:correct_match.start()].strip()
+            answer_token = (correct_match.group(1) or "").strip()
+        else:
+            body = raw
+            answer_token = ""
+
+        option_matches = list(OPTION_INLINE_RE.finditer(body))
+        if len(option_matches) < 2:
+            return None
+
+        question_text = body[: option_matches[0].start()].strip()
+        if not question_text:
+            return None
+
+        options = []
+        for idx, match in enumerate(option_matches):
+            start = match.end()
+            end = option_matches[idx + 1].start() if idx + 1 < len(option_matches) else len(body)
+            opt_text = body[start:end].strip()
+            if not opt_text:
+                continue
+            options.append(
+                {
+                    "label": _normalize_option_label(match.group(1)),
+                    "text": opt_text.lstrip("*").strip(),
+                }
+            )
+
+        if len(options) < 2:
+            return None
+
+        answer = _resolve_answer(
+            {
+                "options": options,
+                "answer_label": _normalize_option_label(answer_token) if len(answer_token) == 1 else "",
+                "answer_text": answer_token if len(answer_token) != 1 else "",
+            }
+        )
+        if not answer:
+            answer = options[0]["text"]
+
+        return {
+            "question": question_text,
+            "options": [o["text"] for o in options],
+            "answer": answer,
+        }
+
+    def push_current():
+        nonlocal current
+        if not current:
+            return
+        q_text = (current.get("question") or "").strip()
+        opts = []
+        seen = set()
+        for opt in current.get("options", []):
+            txt = (opt.get("text") or "").strip()
+            if not txt:
+                continue
+            if txt in seen:
+                continue
+            seen.add(txt)
+            opts.append({"label": opt.get("label", ""), "text": txt.lstrip("*").strip()})
+
+        if not q_text or len(opts) < 2:
+            warnings.append(f"Сұрақ өткізіліп кетті: {q_text[:60] or '(бос)'}")
+            current = None
+            return
+
+        answer = _resolve_answer({**current, "options": opts})
+        if not answer:
+            answer = opts[0]["text"]
+
+        questions.append(
+            {
+                "question": q_text,
+                "options": [o["text"] for o in opts],
+                "answer": answer,
+            }
+        )
+        current = None
+
+    for line in lines:
+        raw = (line or "").strip()
+        if not raw:
+            continue
+
+        inline = parse_inline_question(raw)
+        if inline:
+            push_current()
+            questions.append(inline)
+            continue
+
+        q_match = QUESTION_RE.match(raw)
+        if q_match:
+            push_current()
+            current = {
+                "question": q_match.group(2).strip(),
+                "options": [],
+                "answer_label": "",
+                "answer_text": "",
+            }
+            continue
+
+        if current is None:
+            if "?" in raw:
+                current = {
+                    "question": raw,
+                    "options": [],
+                    "answer_label": "",
+                    "answer_text": "",
+                }
+            continue
+
+        opt_match = OPTION_RE.match(raw)
+        if opt_match:
+            label = _normalize_option_label(opt_match.group(1))
+            text = opt_match.group(2).strip()
+            current["options"].append({"label": label, "text": text})
+            continue
+
+        correct_match = CORRECT_RE.match(raw)
+        if correct_match:
+            token = correct_match.group(1).strip()
+            if len(token) == 1:
+                current["answer_label"] = _normalize_option_label(token)
+            else:
+                current["answer_text"] = token
+            continue
+
+        # continue question/options multi-line
+        if current["options"]:
+            current["options"][-1]["text"] = f"{current['options'][-1]['text']} {raw}".strip()
+        else:
+            current["question"] = f"{current['question']} {raw}".strip()
+
+    push_current()
+    return questions, warnings
+
+
+# --- streaming reader -------------------------------------------------------
+
+
+class _CountingReader:
+    """File wrapper that remembers how many bytes iterparse has consumed."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+RUSSIAN_LETTERS = "АБВГДЕЖЗИКЛМНОПРСТУФХЦЧШЩЭЮЯ"
+
+
+def _numbering_formats(zf: zipfile.ZipFile) -> Dict[str, Dict[str, Tuple[str, int]]]:
+    """{numId: {ilvl: (numFmt, start)}} from word/numbering.xml (small, parsed whole)."""
+    try:
+        root = ElementTree.fromstring(zf.read("word/numbering.xml"))
+    except (KeyError, ElementTree.ParseError):
+        return {}
+    abstract = {}
+    for node in root.iter(f"{W}abstractNum"):
+        levels = {}
+        for lvl in node.iter(f"{W}lvl"):
+            fmt = lvl.find(f"{W}numFmt")
+            start = lvl.find(f"{W}start")
+            levels[lvl.get(f"{W}ilvl", "0")] = (
+                fmt.get(f"{W}val", "") if fmt is not None else "",
+                int(start.get(f"{W}val", "1")) if start is not None else 1,
+            )
+        abstract[node.get(f"{W}abstractNumId")] = levels
+    formats = {}
+    for num in root.iter(f"{W}num"):
+        ref = num.find(f"{W}abstractNumId")
+        if ref is not None:
+            formats[num.get(f"{W}numId")] = abstract.get(ref.get(f"{W}val"), {})
+    return formats
+
+
+def _list_label(fmt: str, n: int) -> str:
+    """Text Word would render for auto-numbered item `n`, in the form the quiz regexes expect."""
+    if fmt == "decimal":
+        return f"{n}) "
+    if fmt in ("upperLetter", "lowerLetter") and 1 <= n <= 26:
+        return chr(ord("A") + n - 1) + ") "
+    if fmt in ("russianUpper", "russianLower") and 1 <= n <= len(RUSSIAN_LETTERS):
+        return RUSSIAN_LETTERS[n - 1] + ") "
+    return ""
+
+
+class _Numbering:
+    def __init__(self, formats):
+        self.formats = formats
+        self.counters: Dict[Tuple[str, int], int] = {}
+
+    def label(self, num_id: str, ilvl: int) -> str:
+        levels = self.formats.get(num_id)
+        if not levels or num_id == "0":
+            return ""
+        fmt, start = levels.get(str(ilvl), ("", 1))
+        key = (num_id, ilvl)
+        self.counters[key] = self.counters.get(key, start - 1) + 1
+        for deeper in [k for k in self.counters if k[0] == num_id and k[1] > ilvl]:
+            del self.counters[deeper]
+        return _list_label(fmt, self.counters[key])
+
+
+def _stream_paragraphs(zf, reader, numbering, progress) -> Iterator[str]:
+    depth = 0  # nested w:p (text boxes) are folded into the outer paragraph
+    runs = 0
+    parts: List[str] = []
+    num = None
+    body = None
+    emitted = 0
+    try:
+        for event, elem in ElementTree.iterparse(reader, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == f"{W}p":
+                    depth += 1
+                    if depth == 1:
+                        parts, num = [], None
+                elif tag == f"{W}r":
+                    runs += 1
+                elif tag == f"{W}body":
+                    body = elem
+                continue
+
+            if tag == f"{W}t" and depth:
+                parts.append(elem.text or "")
+            elif tag in (f"{W}tab", f"{W}br") and runs:
+                parts.append(" ")
+            elif tag == f"{W}r":
+                runs -= 1
+            elif tag == f"{W}numPr" and depth == 1:
+                ilvl, num_id = elem.find(f"{W}ilvl"), elem.find(f"{W}numId")
+                if num_id is not None:
+                    num = (num_id.get(f"{W}val"), int(ilvl.get(f"{W}val", "0")) if ilvl is not None else 0)
+            elif tag == f"{W}p":
+                depth -= 1
+                if depth:
+                    continue
+                # Table cells arrive here too, row by row, one line per cell paragraph.
+                line = "".join(parts).strip()
+                label = numbering.label(*num) if num else ""
+                elem.clear()
+                if body is not None:
+                    body.clear()
+                if line:
+                    emitted += 1
+                    if progress and emitted % PROGRESS_EVERY == 0:
+                        progress(reader.bytes_read, emitted)
+                    yield f"{label}{line}"
+    except ElementTree.ParseError:
+        raise ValueError("DOCX құрылымы жарамсыз.")
+    finally:
+        zf.close()
+    if progress:
+        progress(reader.bytes_read, emitted)
+
+
+def iter_docx_paragraphs(
+    uploaded_file, progress: Optional[Callable[[int, int], None]] = None
+) -> Tuple[Iterator[str], int]:
+    """
+    Open a .docx and return (lazy paragraph iterator, uncompressed document.xml size).
+    The body is parsed with iterparse and discarded paragraph by paragraph, so memory stays
+    flat however long the file is. `progress(bytes_read, paragraphs)` is called periodically.
+    """
+    filename = (getattr(uploaded_file, "name", "") or "").lower()
+    if not filename.endswith(".docx"):
+        raise ValueError("Тек .docx файл жүктеңіз.")
+
+    try:
+        uploaded_file.seek(0)
+    except Exception:
+        pass
+
+    try:
+        zf = zipfile.ZipFile(uploaded_file)
+        info = zf.getinfo("word/document.xml")
+        reader = _CountingReader(zf.open(info))
+    except Exception:
+        raise ValueError("DOCX файлын оқу мүмкін болмады.")
+
+    numbering = _Numbering(_numbering_formats(zf))
+    return _stream_paragraphs(zf, reader, numbering, progress), info.file_size
+
+
+def create_quiz_templates(author, base_title: str, mode: str, questions: List[dict]) -> List[dict]:
+    with transaction.atomic():
+        if mode == "single_quiz":
+            first = questions[0]
+            tpl = SlideTemplate.objects.create(
+                title=base_title,
+                author=author,
+                template_type="quiz",
+                data={
+                    # backward compatibility for old renderers
+                    "question": first["question"],
+                    "options": first["options"],
+                    "answer": first["answer"],
+                    # new multi-question format
+                    "questions": questions,
+                },
+            )
+            return [{"id": tpl.id, "title": tpl.title}]
+
+        templates = SlideTemplate.objects.bulk_create(
+            [
+                SlideTemplate(
+                    title=f"{base_title} · {idx}",
+                    author=author,
+                    template_type="quiz",
+                    data={"question": q["question"], "options": q["options"], "answer": q["answer"]},
+                )
+                for idx, q in enumerate(questions, start=1)
+            ],
+            batch_size=500,
+        )
+        return [{"id": tpl.id, "title": tpl.title} for tpl in templates]
+
+
+def import_payload(mode: str, created: List[dict], warnings: List[str], questions_detected: int) -> dict:
+    return {
+        "mode": mode,
+        "created_count": len(created),
+        "created": created,
+        "warnings": warnings[:20],
+        "questions_detected": questions_detected,
+    }
+
+
+# --- background jobs --------------------------------------------------------
+
+
+def async_threshold_bytes() -> int:
+    return int(getattr(settings, "SLIDE_DOCX_ASYNC_BYTES", 2 * 1024 * 1024))
+
+
+def import_workers() -> int:
+    return max(0, int(getattr(settings, "SLIDE_DOCX_IMPORT_WORKERS", 1)))
+
+
+def enqueue_docx_import(job: DocxImportJob):
+    if import_workers() > 0:
+        job_id = job.pk
+        transaction.on_commit(lambda: _get_executor().submit(run_docx_import_job, job_id))
+
+
+def _claim(job_id: int) -> bool:
+    """Move a job to "running"; the conditional UPDATE is the per-job lock."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_RUNNING_SECONDS)
+    claimable = Q(status=DocxImportJob.PENDING) | Q(status=DocxImportJob.RUNNING, updated_at__lt=stale)
+    claimed = DocxImportJob.objects.filter(claimable, pk=job_id).update(status=DocxImportJob.RUNNING, updated_at=now)
+    return claimed == 1
+
+
+def _finish(job: DocxImportJob, status: str, **fields):
+    # The upload is only needed until the import ends.
+    job.file.delete(save=False)
+    DocxImportJob.objects.filter(pk=job.pk).update(status=status, file="", updated_at=timezone.now(), **fields)
+
+
+def process_docx_import(job_id: int) -> Optional[str]:
+    """Run one queued import. Returns the final status, or None if another worker owns the job."""
+    if not _claim(job_id):
+        return None
+    job = DocxImportJob.objects.select_related("author").get(pk=job_id)
+
+    def report(bytes_read, paragraphs):
+        DocxImportJob.objects.filter(pk=job_id).update(
+            bytes_read=bytes_read, paragraphs_read=paragraphs, updated_at=timezone.now()
+        )
+
+    try:
+        with job.file.open("rb") as handle:
+            paragraphs, total = iter_docx_paragraphs(handle, progress=report)
+            DocxImportJob.objects.filter(pk=job_id).update(bytes_total=total)
+            questions, warnings = parse_quiz_questions(paragraphs)
+        if not questions:
+            raise ValueError(NO_QUESTIONS_ERROR)
+        created = create_quiz_templates(job.author, job.title, job.mode, questions)
+    except ValueError as exc:
+        _finish(job, DocxImportJob.FAILED, error=str(exc))
+        return DocxImportJob.FAILED
+    except Exception:
+        logger.exception("DOCX import job %s crashed", job_id)
+        _finish(job, DocxImportJob.FAILED, error="DOCX импорты сәтсіз аяқталды.")
+        return DocxImportJob.FAILED
+
+    _finish(
+        job,
+        DocxImportJob.DONE,
+        questions_detected=len(questions),
+        result=import_payload(job.mode, created, warnings, len(questions)),
+    )
+    return DocxImportJob.DONE
+
+
+def pending_import_ids(limit: Optional[int] = None) -> List[int]:
+    stale = timezone.now() - timedelta(seconds=STALE_RUNNING_SECONDS)
+    qs = (
+        DocxImportJob.objects.filter(
+            Q(status=DocxImportJob.PENDING) | Q(status=DocxImportJob.RUNNING, updated_at__lt=stale)
+        )
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)
+    )
+    if limit:
+        qs = qs[:limit]
+    return list(qs)
+
+
+def run_docx_import_job(job_id: int) -> Optional[str]:
+    """Entry point for pool threads: each thread owns, and finally closes, its DB connection."""
+    try:
+        return process_docx_import(job_id)
+    except Exception:
+        logger.exception("DOCX import job %s failed", job_id)
+        return None
+    finally:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, import_workers()),
+                    thread_name_prefix="slide-docx",
+                )
+    return _executor
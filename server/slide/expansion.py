@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Max
+
+from lessons.models import Lesson
+from live.deck import bump_deck_versions
+
+from .models import Slide, SlideObject, SlideTemplate
+
+# (slide title, [SlideObject field dicts]) for every slide a template expands to.
+SlidePlan = List[Tuple[str, List[dict]]]
+
+
+def _obj(object_type: str, data: dict, x, y, width, height, z_index: int = 1) -> dict:
+    return {
+        "object_type": object_type,
+        "data": data,
+        "position": {"x": x, "y": y, "width": width, "height": height},
+        "z_index": z_index,
+    }
+
+
+def _quiz(template, cfg) -> SlidePlan:
+    objects = [_obj("text", {"text": cfg.get("question", "")}, 80, 80, 900, 60)]
+    y = 180
+    for opt in cfg.get("options", []):
+        objects.append(_obj("checkbox", {"label": opt, "correct": (opt == cfg.get("answer"))}, 120, y, 600, 40))
+        y += 60
+    return [(f"Quiz: {template.title}", objects)]
+
+
+def _matching(template, cfg) -> SlidePlan:
+    left = cfg.get("left", [])
+    right = cfg.get("right", [])
+    objects = [_obj("text", {"text": "Match left to right"}, 80, 60, 700, 40)]
+    y = 120
+    for i in range(max(len(left), len(right))):
+        ltxt = left[i] if i < len(left) else ""
+        rtxt = right[i] if i < len(right) else ""
+        objects.append(_obj("text", {"text": f"{i+1}. {ltxt}"}, 80, y, 400, 40))
+        objects.append(_obj("text", {"text": rtxt}, 600, y, 400, 40))
+        y += 50
+    return [(f"Matching: {template.title}", objects)]
+
+
+def _flashcards(template, cfg) -> SlidePlan:
+    plan = []
+    for idx, card in enumerate(cfg.get("cards", []), start=1):
+        plan.append((
+            f"Card {idx}: {template.title}",
+            [
+                _obj("text", {"text": card.get("front", "(front)")}, 100, 140, 1000, 120),
+                _obj("text", {"text": card.get("back", "(back)"), "color": "#666", "fontSize": 22}, 100, 320, 1000, 120),
+            ],
+        ))
+    return plan
+
+
+def _poll(template, cfg) -> SlidePlan:
+    objects = [_obj("text", {"text": cfg.get("question", "Poll")}, 80, 80, 900, 60)]
+    y = 180
+    for opt in cfg.get("options", []):
+        objects.append(_obj("checkbox", {"label": opt}, 120, y, 600, 40))
+        y += 60
+    return [(f"Poll: {template.title}", objects)]
+
+
+def _crossword(template, cfg) -> SlidePlan:
+    rows = int(cfg.get("rows", 5))
+    cols = int(cfg.get("cols", 5))
+    cell_w, cell_h = 40, 40
+    start_x, start_y = 80, 120
+    objects = [
+        _obj(
+            "shape",
+            {"shapeType": "rect", "stroke": "#333", "strokeWidth": 2, "fill": "transparent"},
+            start_x - 4, start_y - 4, cols * cell_w + 8, rows * cell_h + 8,
+            z_index=0,
+        )
+    ]
+    for cell in cfg.get("cells", []):
+        r, c = cell.get("r", 0), cell.get("c", 0)
+        x = start_x + c * cell_w + 12
+        y = start_y + r * cell_h + 8
+        objects.append(_obj("text", {"text": cell.get("letter", ""), "fontSize": 22}, x, y, cell_w, cell_h))
+    return [(f"Crossword: {template.title}", objects)]
+
+
+def _sorting(template, cfg) -> SlidePlan:
+    objects = [_obj("text", {"text": "Қадамдарды дұрыс ретпен орналастырыңыз"}, 80, 60, 900, 40)]
+    y = 140
+    for item in cfg.get("items", []):
+        objects.append(_obj("text", {"text": item}, 120, y, 800, 40))
+        y += 55
+    return [(f"Sorting: {template.title}", objects)]
+
+
+def _grouping(template, cfg) -> SlidePlan:
+    objects = [_obj("text", {"text": "Элементтерді тиісті топтарға бөліңіз"}, 80, 60, 900, 40)]
+    x = 80
+    for group in cfg.get("groups", [])[:3]:
+        objects.append(_obj("text", {"text": group.get("title", "Топ")}, x, 120, 280, 30))
+        y = 170
+        for item in group.get("items", [])[:5]:
+            objects.append(_obj("text", {"text": item}, x, y, 280, 30))
+            y += 40
+        x += 320
+    return [(f"Grouping: {template.title}", objects)]
+
+
+EXPANDERS = {
+    "quiz": _quiz,
+    "matching": _matching,
+    "flashcards": _flashcards,
+    "poll": _poll,
+    "crossword": _crossword,
+    "sorting": _sorting,
+    "grouping": _grouping,
+}
+
+
+def plan_template_slides(template: SlideTemplate) -> Optional[SlidePlan]:
+    """Slides and objects the template expands to, without touching the DB. None for unsupported types."""
+    expander = EXPANDERS.get(template.template_type)
+    if expander is None:
+        return None
+    return expander(template, template.data or {})
+
+
+def materialize_plan(plan: SlidePlan, lesson_ids) -> Dict[int, List[Slide]]:
+    """
+    Append the planned slides to the end of every lesson: one locking read, one order
+    lookup and two bulk INSERTs however many slides, objects and lessons are involved.
+    """
+    lesson_ids = sorted(set(lesson_ids))
+    created: Dict[int, List[Slide]] = {lesson_id: [] for lesson_id in lesson_ids}
+    if not plan or not lesson_ids:
+        return created
+
+    with transaction.atomic():
+        # Locking the lessons serializes concurrent appends to the same deck.
+        list(Lesson.objects.select_for_update().filter(pk__in=lesson_ids).values_list("pk", flat=True))
+        last_order = dict(
+            Slide.objects.filter(lesson_id__in=lesson_ids)
+            .order_by()
+            .values("lesson_id")
+            .annotate(last=Max("order"))
+            .values_list("lesson_id", "last")
+        )
+
+        # Slide.save() is bypassed on purpose: the order range is reserved above.
+        slides = []
+        for lesson_id in lesson_ids:
+            start = last_order.get(lesson_id) or 0
+            for offset, (title, _) in enumerate(plan, start=1):
+                slide = Slide(lesson_id=lesson_id, title=title, order=start + offset)
+                created[lesson_id].append(slide)
+                slides.append(slide)
+        Slide.objects.bulk_create(slides)
+
+        objects = []
+        for lesson_id in lesson_ids:
+            for slide, (_, specs) in zip(created[lesson_id], plan):
+                objects.extend(SlideObject(slide=slide, **spec) for spec in specs)
+        SlideObject.objects.bulk_create(objects, batch_size=500)
+        bump_deck_versions(lesson_ids)
+    return created
@@ -0,0 +1,231 @@
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from .models import SlideTemplate
+
+# Graded result: (score, extra response fields).
+Grade = Tuple[float, dict]
+
+
+class Grader(NamedTuple):
+    # template.data -> compiled answer key, computed once per template version
+    compile: Callable[[dict], Any]
+    # (compiled key, submission payload) -> Grade
+    grade: Callable[[Any, dict], Grade]
+
+
+GRADERS: Dict[str, Grader] = {}
+
+
+def register_grader(template_type: str, compile: Callable[[dict], Any]):
+    """Decorator registering `grade(key, payload)` for a template type."""
+
+    def decorator(grade):
+        GRADERS[template_type] = Grader(compile, grade)
+        return grade
+
+    return decorator
+
+
+class _LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_keys = _LRUCache(int(getattr(settings, "SLIDE_ANSWER_KEY_CACHE_SIZE", 1024)))
+
+
+def compiled_answer_key(template: SlideTemplate, grader: Grader):
+    data = template.data if isinstance(template.data, dict) else {}
+    if template.pk is None:
+        return grader.compile(data)
+    # created_at guards against reused ids (rolled-back transactions, restored dumps).
+    key = (template.pk, template.version, template.created_at, template.template_type)
+    return _keys.get_or_compute(key, lambda: grader.compile(data))
+
+
+def grade_submission(template: Optional[SlideTemplate], payload) -> Optional[Grade]:
+    """Score a submission payload against the template; None for ungraded types (poll)."""
+    grader = GRADERS.get(template.template_type) if template else None
+    if grader is None:
+        return None
+    return grader.grade(compiled_answer_key(template, grader), payload if isinstance(payload, dict) else {})
+
+
+# --- answer normalization ---------------------------------------------------
+
+_MISSING = object()
+
+
+def _normalize(value):
+    """Comparable form of an answer: text is stripped and casefolded, other JSON values kept as is."""
+    if value is None:
+        return _MISSING
+    if isinstance(value, str):
+        return ("text", value.strip().casefold())
+    return ("value", value)
+
+
+def _matches(expected_norm, given) -> bool:
+    if expected_norm is _MISSING or given is None:
+        return False
+    kind, expected = expected_norm
+    if kind == "text":
+        return isinstance(given, str) and given.strip().casefold() == expected
+    return not isinstance(given, str) and given == expected
+
+
+# --- quiz -------------------------------------------------------------------
+
+
+def _compile_quiz(cfg: dict):
+    questions = cfg.get("questions") if isinstance(cfg.get("questions"), list) else None
+    if not questions:
+        return {"single": _normalize(cfg.get("answer"))}
+    compiled = []
+    for idx, question in enumerate(questions):
+        if not isinstance(question, dict) or question.get("answer") is None:
+            continue
+        compiled.append((idx, question.get("question", ""), question["answer"], _normalize(question["answer"])))
+    return {"questions": compiled}
+
+
+@register_grader("quiz", _compile_quiz)
+def _grade_quiz(key, payload) -> Grade:
+    if "single" in key:
+        correct = _matches(key["single"], payload.get("answer"))
+        return (1.0 if correct else 0.0), {"correct": correct}
+
+    answers = payload.get("answers")
+    if not isinstance(answers, list):
+        single = payload.get("answer")
+        answers = [single] if single is not None else []
+    details = []
+    correct_count = 0
+    for idx, question, expected, normalized in key["questions"]:
+        given = answers[idx] if idx < len(answers) else None
+        is_ok = _matches(normalized, given)
+        correct_count += is_ok
+        details.append(
+            {"index": idx + 1, "question": question, "given": given, "expected": expected, "correct": is_ok}
+        )
+    total = len(key["questions"])
+    return (correct_count / total) if total else 0.0, {
+        "correct": bool(total and correct_count == total),
+        "correct_count": correct_count,
+        "total_questions": total,
+        "details": details,
+    }
+
+
+# --- sorting / matching / grouping / flashcards -----------------------------
+
+
+def _binary(correct: bool) -> Grade:
+    return (1.0 if correct else 0.0), {"correct": bool(correct)}
+
+
+@register_grader("sorting", lambda cfg: list(cfg.get("items") or []))
+def _grade_sorting(expected, payload) -> Grade:
+    given = payload.get("order")
+    return _binary(bool(expected) and isinstance(given, list) and given == expected)
+
+
+def _compile_matching(cfg: dict):
+    left = cfg.get("left") or []
+    right = cfg.get("right") or []
+    if not left or not right or len(left) != len(right):
+        return None
+    return list(zip(left, right))
+
+
+@register_grader("matching", _compile_matching)
+def _grade_matching(pairs_key, payload) -> Grade:
+    pairs = payload.get("pairs")
+    if pairs_key is None or not isinstance(pairs, dict):
+        return _binary(False)
+    return _binary(all(pairs.get(left) == right for left, right in pairs_key))
+
+
+def _compile_grouping(cfg: dict):
+    """[(title, multiset of items)], or None when the template can never be answered correctly."""
+    groups = cfg.get("groups") or []
+    compiled = []
+    for group in groups:
+        title = group.get("title") if isinstance(group, dict) else None
+        items = group.get("items") if isinstance(group, dict) else None
+        if title is None or not isinstance(items or [], list):
+            return None
+        compiled.append((title, Counter(items or [])))
+    return compiled or None
+
+
+@register_grader("grouping", _compile_grouping)
+def _grade_grouping(groups, payload) -> Grade:
+    submitted = payload.get("groups")
+    if groups is None or not isinstance(submitted, dict):
+        return _binary(False)
+    for title, items in groups:
+        got = submitted.get(title)
+        if not isinstance(got, list) or Counter(got) != items:
+            return _binary(False)
+    return _binary(True)
+
+
+@register_grader("flashcards", lambda cfg: None)
+def _grade_flashcards(_key, payload) -> Grade:
+    return _binary(bool(payload.get("correct")))
+
+
+# --- crossword --------------------------------------------------------------
+
+
+def _cell_key(cell: dict) -> Tuple[str, str]:
+    # Stringified so a cell sent as {"r": "1"} still matches r=1 in the template.
+    return str(cell.get("r")), str(cell.get("c"))
+
+
+def _compile_crossword(cfg: dict) -> Dict[Tuple[str, str], str]:
+    expected = {}
+    for cell in cfg.get("cells", []) or []:
+        if not isinstance(cell, dict) or cell.get("r") is None or cell.get("c") is None:
+            continue
+        expected[_cell_key(cell)] = str(cell.get("letter", "")).strip().upper()
+    return expected
+
+
+@register_grader("crossword", _compile_crossword)
+def _grade_crossword(expected, payload) -> Grade:
+    submitted = payload.get("cells")
+    total = len(expected)
+    correct = 0
+    if isinstance(submitted, list) and total:
+        for cell in submitted:
+            if not isinstance(cell, dict):
+                continue
+            letter = expected.get(_cell_key(cell))
+            if letter is not None and str(cell.get("letter", "")).strip().upper() == letter:
+                correct += 1
+    return (correct / total) if total else 0.0, {"correct": bool(total and correct == total)}
@@ -0,0 +1,97 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from slide.models import SlideTemplate, Submission
+from slide.views import SubmissionViewSet
+
+
+User = get_user_model()
+
+OPTIONS = ["A", "B", "C", "D"]
+
+
+def _per_question_rescan(queryset, questions):
+    """The previous mistakes algorithm: one full pass over the submissions per question."""
+    rows = []
+    for idx, q in enumerate(questions):
+        wrong_counts = Counter()
+        total = 0
+        for sub in queryset:
+            payload = sub.data if isinstance(sub.data, dict) else {}
+            answers = payload.get("answers")
+            answer = answers[idx] if isinstance(answers, list) and idx < len(answers) else None
+            if answer is None:
+                continue
+            total += 1
+            if str(answer).strip().casefold() != str(q["answer"]).strip().casefold():
+                wrong_counts[str(answer)] += 1
+        rows.append((total, wrong_counts.most_common()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Time submission stats/mistakes aggregation on synthetic quiz submissions (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--submissions", type=int, default=100000)
+        parser.add_argument("--questions", type=int, default=10)
+        parser.add_argument("--skip-baseline", action="store_true", help="Do not time the per-question rescan.")
+
+    def _timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label:<28} {(time.perf_counter() - started) * 1000:10.0f} ms")
+        return result
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        questions = [
+            {"question": f"Question {i + 1}", "answer": rng.choice(OPTIONS)} for i in range(options["questions"])
+        ]
+        factory = APIRequestFactory()
+        stats_view = SubmissionViewSet.as_view({"get": "stats"})
+        mistakes_view = SubmissionViewSet.as_view({"get": "mistakes"})
+
+        with transaction.atomic():
+            author, _ = User.objects.get_or_create(username="bench_stats_teacher", defaults={"role": "teacher"})
+            template = SlideTemplate.objects.create(
+                title="Benchmark quiz",
+                author=author,
+                template_type="quiz",
+                data={"questions": questions},
+            )
+            Submission.objects.bulk_create(
+                (
+                    Submission(
+                        template=template,
+                        data={"answers": [rng.choice(OPTIONS) for _ in questions]},
+                        score=rng.random(),
+                    )
+                    for _ in range(options["submissions"])
+                ),
+                batch_size=5000,
+            )
+            self.stdout.write(f"{options['submissions']} submissions x {len(questions)} questions")
+
+            def call(view, name):
+                request = factory.get(f"/api/slide/submissions/{name}/", {"template": template.id})
+                force_authenticate(request, user=author)
+                response = view(request)
+                assert response.status_code == 200, response.data
+                return response
+
+            self._timed("stats (quiz)", lambda: call(stats_view, "stats"))
+            self._timed("mistakes (single pass)", lambda: call(mistakes_view, "mistakes"))
+            if not options["skip_baseline"]:
+                queryset = Submission.objects.filter(template=template)
+                self._timed("mistakes (per-question scan)", lambda: _per_question_rescan(queryset, questions))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (data rolled back)."))
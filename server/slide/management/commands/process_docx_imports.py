@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from slide.docx_import import pending_import_ids, run_docx_import_job
+from slide.models import DocxImportJob
+
+
+class Command(BaseCommand):
+    help = "Run queued background DOCX quiz imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling the queue instead of exiting.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        while True:
+            ids = pending_import_ids(limit=10)
+            for job_id in ids:
+                status = run_docx_import_job(job_id)
+                if status == DocxImportJob.DONE:
+                    done += 1
+                elif status == DocxImportJob.FAILED:
+                    failed += 1
+            if not ids:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"DOCX imports done: {done}, failed: {failed}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from slide.answer_stats import TRACKED_TEMPLATE_TYPES, rebuild_template_answer_stats
+from slide.models import SlideTemplate
+
+
+class Command(BaseCommand):
+    help = "Recount poll/quiz answer histograms (TemplateAnswerStats) from a full rescan of submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--template",
+            action="append",
+            type=int,
+            default=[],
+            help="Template id to rebuild (repeatable). Defaults to every poll and quiz template.",
+        )
+
+    def handle(self, *args, **options):
+        templates = SlideTemplate.objects.filter(template_type__in=TRACKED_TEMPLATE_TYPES).order_by("id")
+        if options["template"]:
+            templates = templates.filter(id__in=options["template"])
+
+        rebuilt = 0
+        rows = 0
+        for template in templates.iterator():
+            rows += rebuild_template_answer_stats(template)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt answer stats: {rebuilt} templates, {rows} rows"))
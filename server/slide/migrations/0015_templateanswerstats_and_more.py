@@ -0,0 +1,34 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slide', '0014_submission_duration_seconds_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateAnswerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_index', models.IntegerField(default=0)),
+                ('answer_key', models.TextField()),
+                ('answer_digest', models.CharField(max_length=32)),
+                ('count', models.IntegerField(default=0)),
+                ('wrong_count', models.IntegerField(default=0)),
+                ('last_answered_at', models.DateTimeField(blank=True, null=True)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_stats', to='slide.slidetemplate')),
+            ],
+            options={
+                'ordering': ['template_id', 'question_index', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='templateanswerstats',
+            constraint=models.UniqueConstraint(fields=('template', 'answer_digest'), name='uniq_template_answer_digest'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import slide.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('slide', '0015_templateanswerstats_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocxImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='slide/docx_imports/')),
+                ('title', models.CharField(default='Word Quiz', max_length=255)),
+                ('mode', models.CharField(default='separate', max_length=16)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16)),
+                ('bytes_read', models.BigIntegerField(default=0)),
+                ('bytes_total', models.BigIntegerField(default=0)),
+                ('paragraphs_read', models.IntegerField(default=0)),
+                ('questions_detected', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, default=slide.models._empty_dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='docx_import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', 'id'],
+            },
+        ),
+    ]
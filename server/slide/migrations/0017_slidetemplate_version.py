@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-17 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slide', '0016_docximportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slidetemplate',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-17 06:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_built_templates(apps, schema_editor):
+    SlideTemplate = apps.get_model('slide', 'SlideTemplate')
+    TemplateAnswerStats = apps.get_model('slide', 'TemplateAnswerStats')
+    # Templates that already have stat rows were built by the old "any rows" check.
+    SlideTemplate.objects.filter(id__in=TemplateAnswerStats.objects.values('template_id')).update(
+        answer_stats_built_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slide', '0017_slidetemplate_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slidetemplate',
+            name='answer_stats_built_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_built_templates, migrations.RunPython.noop),
+    ]
@@ -142,6 +142,10 @@ class SlideTemplate(models.Model):
     template_type = models.CharField(max_length=32, choices=TEMPLATE_TYPE_CHOICES, default="quiz")
 
     data = models.JSONField(help_text="Template config (quiz/matching/etc.)")
+    # Bumped on every save; compiled answer keys (slide.grading) are cached per version.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Set once TemplateAnswerStats holds every submission (slide.answer_stats); None = build on first use.
+    answer_stats_built_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -150,6 +154,14 @@ class SlideTemplate(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            self.version = (self.version or 0) + 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version"}
+        super().save(*args, **kwargs)
+
 
 class Submission(models.Model):
     slide = models.ForeignKey(
@@ -195,3 +207,70 @@ class Submission(models.Model):
             parts.append(f"template={self.template_id}")
         descriptor = ", ".join(parts) or "unlinked"
         return f"Submission {self.pk or 'unsaved'} ({descriptor})"
+
+
+class TemplateAnswerStats(models.Model):
+    """Running answer histogram per template question (poll options, quiz answers)."""
+
+    template = models.ForeignKey(SlideTemplate, on_delete=models.CASCADE, related_name="answer_stats")
+    question_index = models.IntegerField(default=0)
+    answer_key = models.TextField()
+    # md5 of "<question_index>:<answer_key>", so long answers still fit a unique index.
+    answer_digest = models.CharField(max_length=32)
+    count = models.IntegerField(default=0)
+    wrong_count = models.IntegerField(default=0)
+    # Newest submission with this answer; stats list answers most recent first, like Submission ordering.
+    last_answered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["template_id", "question_index", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["template", "answer_digest"], name="uniq_template_answer_digest")
+        ]
+
+    def __str__(self):
+        return f"{self.template_id}[{self.question_index}] {self.answer_key!r}: {self.count}"
+
+
+class DocxImportJob(models.Model):
+    """A large DOCX quiz import parsed in the background; the request only uploads the file."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    author = models.ForeignKey(USER_MODEL, on_delete=models.CASCADE, related_name="docx_import_jobs")
+    file = models.FileField(upload_to="slide/docx_imports/")
+    title = models.CharField(max_length=255, default="Word Quiz")
+    mode = models.CharField(max_length=16, default="separate")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    # Progress: uncompressed document.xml bytes read so far out of the total.
+    bytes_read = models.BigIntegerField(default=0)
+    bytes_total = models.BigIntegerField(default=0)
+    paragraphs_read = models.IntegerField(default=0)
+    questions_detected = models.IntegerField(default=0)
+    result = models.JSONField(default=_empty_dict, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at", "id"]
+
+    @property
+    def progress(self) -> float:
+        if self.status == self.DONE:
+            return 100.0
+        if not self.bytes_total:
+            return 0.0
+        return round(min(self.bytes_read / self.bytes_total, 1.0) * 100.0, 1)
+
+    def __str__(self):
+        return f"DOCX import {self.pk} ({self.status})"
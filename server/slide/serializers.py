@@ -133,3 +133,23 @@ class SubmissionSerializer(serializers.ModelSerializer):
             )
 
         return attrs
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves ids from context["prefetched"][Model] (loaded once per batch) before querying."""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get("prefetched", {}).get(self.get_queryset().model)
+        if prefetched is not None:
+            try:
+                return prefetched[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class SubmissionBatchItemSerializer(SubmissionSerializer):
+    slide = PrefetchedPrimaryKeyRelatedField(queryset=Slide.objects.all(), required=False, allow_null=True)
+    template = PrefetchedPrimaryKeyRelatedField(
+        queryset=SlideTemplate.objects.all(), required=False, allow_null=True
+    )
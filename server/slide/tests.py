@@ -1,3 +1,364 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from slide import answer_stats
+from slide.answer_stats import answer_counts, rebuild_template_answer_stats
+from slide.docx_import import process_docx_import
+from slide.grading import GRADERS, Grader
+from lessons import adaptive
+from lessons.models import Lesson
+from slide.models import DocxImportJob, Slide, SlideObject, SlideTemplate, Submission
+
+
+User = get_user_model()
+
+
+class SubmissionStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_stats", password="pass1234", role="teacher")
+        self.client.force_authenticate(self.teacher)
+
+    def test_multi_question_mistakes_are_counted_per_question(self):
+        template = SlideTemplate.objects.create(
+            title="Quiz",
+            author=self.teacher,
+            template_type="quiz",
+            data={"questions": [{"question": "Q1", "answer": "A"}, {"question": "Q2", "answer": "b"}]},
+        )
+        for answers in (["A", "B"], ["C", "C"], ["c", "B"], ["A"]):
+            Submission.objects.create(template=template, data={"answers": answers})
+
+        response = self.client.get("/api/slide/submissions/mistakes/", {"template": template.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["mode"], "multi")
+        first, second = response.data["rows"]
+        self.assertEqual(first["total"], 4)
+        self.assertEqual(
+            sorted((row["answer"], row["count"], row["percentage"]) for row in first["wrong"]),
+            [("C", 1, 25.0), ("c", 1, 25.0)],
+        )
+        self.assertEqual(second["total"], 3)
+        self.assertEqual([row["answer"] for row in second["wrong"]], ["C"])
+        self.assertEqual(response.data["total"], 7)
+        self.assertEqual(response.data["wrong"][0], {"answer": "C", "count": 2, "percentage": 2 / 7 * 100.0})
+
+    def test_poll_stats_keep_template_option_order(self):
+        template = SlideTemplate.objects.create(
+            title="Poll",
+            author=self.teacher,
+            template_type="poll",
+            data={"options": ["Yes", "No"]},
+        )
+        for answer in ("No", "No", "Yes", None):
+            Submission.objects.create(template=template, data={"answer": answer} if answer else {})
+
+        vote = self.client.post(
+            "/api/slide/submissions/", {"template": template.id, "data": {"answer": "Yes"}}, format="json"
+        )
+        self.assertEqual(vote.status_code, 201)
+        self.assertEqual([(row["option"], row["count"]) for row in vote.data["results"]], [("Yes", 2), ("No", 2)])
+
+        response = self.client.get("/api/slide/submissions/stats/", {"template": template.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 5)
+        self.assertEqual(
+            [(row["option"], row["count"]) for row in response.data["results"]],
+            [("Yes", 2), ("No", 2)],
+        )
+
+    def test_answer_stats_follow_votes_edits_and_deletes(self):
+        template = SlideTemplate.objects.create(
+            title="Quiz",
+            author=self.teacher,
+            template_type="quiz",
+            data={"question": "2+2", "answer": "4"},
+        )
+        created = []
+        for answer in ("4", "5", "5"):
+            response = self.client.post(
+                "/api/slide/submissions/", {"template": template.id, "data": {"answer": answer}}, format="json"
+            )
+            self.assertEqual(response.status_code, 201)
+            created.append(response.data["id"])
+
+        counts, wrong = answer_counts(template)[0]
+        self.assertEqual(dict(counts), {"4": 1, "5": 2})
+        self.assertEqual(dict(wrong), {"5": 2})
+
+        self.client.patch(f"/api/slide/submissions/{created[1]}/", {"data": {"answer": "4"}}, format="json")
+        self.client.delete(f"/api/slide/submissions/{created[2]}/")
+        counts, wrong = answer_counts(template)[0]
+        self.assertEqual(dict(counts), {"4": 2})
+        self.assertEqual(dict(wrong), {})
+
+        incremental = answer_counts(template)
+        rebuild_template_answer_stats(template)
+        self.assertEqual(answer_counts(template), incremental)
+
+        response = self.client.get("/api/slide/submissions/mistakes/", {"template": template.id})
+        self.assertEqual(response.data["total"], 2)
+        self.assertEqual(response.data["wrong"], [])
+
+    def test_histogram_is_built_once_even_without_answers(self):
+        template = SlideTemplate.objects.create(
+            title="Quiz",
+            author=self.teacher,
+            template_type="quiz",
+            data={"questions": [{"question": "2+2", "answer": "4"}]},
+        )
+        with mock.patch(
+            "slide.answer_stats.rebuild_template_answer_stats", wraps=answer_stats.rebuild_template_answer_stats
+        ) as rebuild:
+            # Skipped questions contribute no answer keys, so no stat rows exist afterwards.
+            for _ in range(3):
+                response = self.client.post(
+                    "/api/slide/submissions/", {"template": template.id, "data": {"answers": [None]}}, format="json"
+                )
+                self.assertEqual(response.status_code, 201)
+        self.assertEqual(rebuild.call_count, 1)
+        template.refresh_from_db()
+        self.assertIsNotNone(template.answer_stats_built_at)
+        self.assertEqual(template.version, 1)
+        self.assertFalse(template.answer_stats.exists())
+
+    def test_answer_key_is_compiled_once_per_template_version(self):
+        template = SlideTemplate.objects.create(
+            title="Crossword",
+            author=self.teacher,
+            template_type="crossword",
+            data={"cells": [{"r": 0, "c": 0, "letter": "a"}, {"r": 0, "c": 1, "letter": "b"}]},
+        )
+        grader = GRADERS["crossword"]
+        compile_spy = mock.Mock(side_effect=grader.compile)
+
+        def submit(letters):
+            cells = [{"r": 0, "c": c, "letter": letter} for c, letter in enumerate(letters)]
+            return self.client.post(
+                "/api/slide/submissions/", {"template": template.id, "data": {"cells": cells}}, format="json"
+            )
+
+        with mock.patch.dict(GRADERS, {"crossword": Grader(compile_spy, grader.grade)}):
+            self.assertTrue(submit("AB").data["correct"])
+            self.assertEqual(submit("AC").data["score"], 0.5)
+            self.assertEqual(compile_spy.call_count, 1)
+
+            template.data = {"cells": [{"r": 0, "c": 0, "letter": "a"}, {"r": 0, "c": 1, "letter": "c"}]}
+            template.save()
+            self.assertTrue(submit("AC").data["correct"])
+            self.assertEqual(compile_spy.call_count, 2)
+
+    def test_batch_replay_grades_and_tallies_in_request_order(self):
+        student = User.objects.create_user(username="student_batch", password="pass1234", role="student")
+        quiz = SlideTemplate.objects.create(
+            title="Quiz", author=self.teacher, template_type="quiz", data={"question": "2+2", "answer": "4"}
+        )
+        poll = SlideTemplate.objects.create(
+            title="Poll", author=self.teacher, template_type="poll", data={"options": ["Yes", "No"]}
+        )
+        items = [
+            {"template": quiz.id, "data": {"answer": " 4 "}},
+            {"template": poll.id, "data": {"answer": "No"}},
+            {"template": quiz.id, "data": {}},
+            {"template": quiz.id, "data": {"answer": "5"}},
+            {"template": poll.id, "data": {"answer": "Yes"}},
+        ]
+        self.client.force_authenticate(student)
+        with mock.patch("lessons.adaptive._save_profile", wraps=adaptive._save_profile) as save_profile:
+            response = self.client.post("/api/slide/submissions/batch/", items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(save_profile.call_count, 1)
+
+        results = response.data["results"]
+        self.assertEqual(response.data["created_count"], 4)
+        self.assertEqual([row["index"] for row in results], [0, 1, 2, 3, 4])
+        self.assertEqual([row["ok"] for row in results], [True, True, False, True, True])
+        self.assertEqual((results[0]["correct"], results[0]["score"]), (True, 1.0))
+        self.assertEqual((results[3]["correct"], results[3]["score"]), (False, 0.0))
+        self.assertIn("data", results[2]["errors"])
+        self.assertEqual([(row["option"], row["count"]) for row in results[4]["results"]], [("Yes", 1), ("No", 1)])
+
+        counts, wrong = answer_counts(quiz)[0]
+        self.assertEqual((dict(counts), dict(wrong)), ({" 4 ": 1, "5": 1}, {"5": 1}))
+        profile = student.student_profile
+        self.assertEqual(profile.average_score, 0.5)
+
+
+class SlideObjectBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_batch", password="pass1234", role="teacher")
+        self.client.force_authenticate(self.teacher)
+        self.lesson = Lesson.objects.create(owner=self.teacher, title="Deck")
+        self.slide = Slide.objects.create(lesson=self.lesson, title="One")
+        self.objects = [
+            SlideObject.objects.create(slide=self.slide, object_type="shape", data={"shapeType": "rect"}, z_index=i)
+            for i in range(20)
+        ]
+
+    def test_batch_update_writes_in_bulk_and_bumps_deck(self):
+        version = Lesson.objects.get(pk=self.lesson.pk).deck_version
+        items = [{"id": obj.id, "z_index": 100 + i, "position": {"x": i}} for i, obj in enumerate(self.objects)]
+        items.append({"id": self.objects[0].id, "is_locked": True})
+
+        with self.assertNumQueries(6):
+            response = self.client.patch("/api/slide/objects/batch/", items, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["updated"]), 20)
+
+        first = SlideObject.objects.get(pk=self.objects[0].pk)
+        self.assertEqual((first.z_index, first.position, first.is_locked), (100, {"x": 0}, True))
+        self.assertGreater(first.updated_at, self.objects[0].updated_at)
+        self.assertEqual(Lesson.objects.get(pk=self.lesson.pk).deck_version, version + 1)
+
+    def test_stale_updated_at_is_a_conflict(self):
+        obj = self.objects[0]
+        stale = obj.updated_at.isoformat()
+        fresh = self.client.patch(
+            "/api/slide/objects/batch/", [{"id": obj.id, "z_index": 5, "updated_at": stale}], format="json"
+        )
+        self.assertEqual(fresh.status_code, 200)
+
+        response = self.client.patch(
+            "/api/slide/objects/batch/",
+            [{"id": self.objects[1].id, "z_index": 7}, {"id": obj.id, "z_index": 9, "updated_at": stale}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([row["id"] for row in response.data["conflicts"]], [obj.id])
+        self.assertEqual(SlideObject.objects.get(pk=obj.pk).z_index, 5)
+        self.assertEqual(SlideObject.objects.get(pk=self.objects[1].pk).z_index, 1)
+
+
+class ApplyTemplateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_apply", password="pass1234", role="teacher")
+        self.client.force_authenticate(self.teacher)
+        self.lessons = [Lesson.objects.create(owner=self.teacher, title=f"Deck {i}") for i in range(3)]
+        Slide.objects.create(lesson=self.lessons[0], title="Intro")
+        self.template = SlideTemplate.objects.create(
+            title="Words",
+            author=self.teacher,
+            template_type="flashcards",
+            data={"cards": [{"front": f"front {i}", "back": f"back {i}"} for i in range(30)]},
+        )
+
+    def test_flashcards_are_appended_to_many_lessons_in_bulk(self):
+        lesson_ids = [lesson.id for lesson in self.lessons]
+        with self.assertNumQueries(10):
+            response = self.client.post(
+                f"/api/slide/templates/{self.template.id}/apply/", {"lesson_ids": lesson_ids}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["created_slides"]), 90)
+
+        orders = list(Slide.objects.filter(lesson=self.lessons[0]).values_list("order", flat=True))
+        self.assertEqual(orders, list(range(1, 32)))
+        card = Slide.objects.get(lesson=self.lessons[1], order=2)
+        self.assertEqual(card.title, "Card 2: Words")
+        self.assertEqual(
+            [obj.data["text"] for obj in card.slide_objects.order_by("id")],
+            ["front 1", "back 1"],
+        )
+        self.assertEqual(SlideObject.objects.filter(slide__lesson__in=self.lessons).count(), 180)
+        self.assertEqual(Lesson.objects.get(pk=self.lessons[2].pk).deck_version, 1)
+
+    def test_foreign_lesson_is_rejected_before_writing(self):
+        other = User.objects.create_user(username="other_apply", password="pass1234", role="teacher")
+        foreign = Lesson.objects.create(owner=other, title="Theirs")
+        response = self.client.post(
+            f"/api/slide/templates/{self.template.id}/apply/",
+            {"lesson_ids": [self.lessons[1].id, foreign.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Slide.objects.filter(lesson=self.lessons[1]).exists())
+
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _docx(body: str, numbering: str = "") -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("word/document.xml", f'<w:document xmlns:w="{W_NS}"><w:body>{body}</w:body></w:document>')
+        if numbering:
+            zf.writestr("word/numbering.xml", f'<w:numbering xmlns:w="{W_NS}">{numbering}</w:numbering>')
+    return buffer.getvalue()
+
+
+def _p(text: str, num_id: str = "", ilvl: int = 0) -> str:
+    num = f'<w:pPr><w:numPr><w:ilvl w:val="{ilvl}"/><w:numId w:val="{num_id}"/></w:numPr></w:pPr>' if num_id else ""
+    return f"<w:p>{num}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+NUMBERING = (
+    '<w:abstractNum w:abstractNumId="0">'
+    '<w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="decimal"/></w:lvl>'
+    '<w:lvl w:ilvl="1"><w:start w:val="1"/><w:numFmt w:val="upperLetter"/></w:lvl>'
+    "</w:abstractNum>"
+    '<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>'
+)
+
+
+@override_settings(SLIDE_DOCX_IMPORT_WORKERS=0)
+class DocxImportTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(username="teacher_docx", password="pass1234", role="teacher")
+        self.client.force_authenticate(self.teacher)
+        self.body = (
+            # auto-numbered question with lettered options
+            _p("Capital of France?", "1") + _p("Paris", "1", 1) + _p("Rome", "1", 1) + _p("Дұрыс жауап: A")
+            # the same format typed into a table, one cell per line
+            + "<w:tbl><w:tr>"
+            + "".join(f"<w:tc>{_p(text)}</w:tc>" for text in ("2) 2+2?", "A) 3", "B) 4", "Жауап: B"))
+            + "</w:tr></w:tbl>"
+        )
+
+    def _upload(self, **extra):
+        upload = SimpleUploadedFile("bank.docx", _docx(self.body, NUMBERING))
+        return self.client.post(
+            "/api/slide/templates/import-docx-quiz/", {"file": upload, "title": "Bank", **extra}, format="multipart"
+        )
+
+    def test_numbered_lists_and_tables_are_imported(self):
+        response = self._upload(mode="single_quiz")
+        self.assertEqual(response.status_code, 201)
+        template = SlideTemplate.objects.get(pk=response.data["created"][0]["id"])
+        self.assertEqual(
+            template.data["questions"],
+            [
+                {"question": "Capital of France?", "options": ["Paris", "Rome"], "answer": "Paris"},
+                {"question": "2+2?", "options": ["3", "4"], "answer": "4"},
+            ],
+        )
+
+    def test_large_import_runs_as_a_job_with_progress(self):
+        response = self._upload(**{"async": "1"})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["job_id"]
+        self.assertEqual(response.data["status"], DocxImportJob.PENDING)
+
+        self.assertEqual(process_docx_import(job_id), DocxImportJob.DONE)
+        status_response = self.client.get(f"/api/slide/templates/import-docx-quiz/{job_id}/")
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data["progress"], 100.0)
+        self.assertEqual(status_response.data["paragraphs_read"], 8)
+        self.assertEqual(status_response.data["result"]["created_count"], 2)
+        self.assertEqual(SlideTemplate.objects.filter(author=self.teacher).count(), 2)
+        self.assertFalse(DocxImportJob.objects.get(pk=job_id).file)
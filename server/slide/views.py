@@ -2,266 +2,64 @@
 from collections import Counter
 from typing import Optional
 from datetime import datetime, time
-import re
-import zipfile
-from xml.etree import ElementTree
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction
-from django.db.models import Q
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Q
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime, parse_date
 
-from .models import Slide, SlideObject, SlideTemplate, Submission
+from .answer_stats import (
+    answer_counts,
+    ensure_template_answer_stats,
+    rebuild_template_answer_stats,
+    record_submission_answers,
+    record_submissions_answers,
+    replace_submission_answers,
+)
+from .docx_import import (
+    NO_QUESTIONS_ERROR,
+    async_threshold_bytes,
+    create_quiz_templates,
+    enqueue_docx_import,
+    import_payload,
+    iter_docx_paragraphs,
+    parse_quiz_questions,
+)
+from .expansion import materialize_plan, plan_template_slides
+from .grading import grade_submission
+from .models import DocxImportJob, Slide, SlideObject, SlideTemplate, Submission
 from .serializers import (
     SlideSerializer,
     SlideObjectSerializer,
     SlideTemplateSerializer,
+    SubmissionBatchItemSerializer,
     SubmissionSerializer,
 )
 from lessons.models import Assignment, Lesson
-from lessons.adaptive import recompute_student_profile
-
-
-QUESTION_RE = re.compile(r"^(?:сұрақ\s*)?(\d+)\s*[\)\.\:\-]\s*(.+)$", re.IGNORECASE)
-OPTION_RE = re.compile(r"^([A-DА-Г])\s*[\)\.\:\-]\s*(.+)$", re.IGNORECASE)
-CORRECT_RE = re.compile(
-    r"^(?:дұрыс\s*жауап|жауап|correct\s*answer|answer)\s*[:\-]\s*(.+)$",
-    re.IGNORECASE,
-)
-OPTION_INLINE_RE = re.compile(r"([A-DА-Г])\s*[\)\.]\s*", re.IGNORECASE)
-CORRECT_ANY_RE = re.compile(
-    r"(?:дұрыс\s*жауап|жауап|correct\s*answer|answer)\s*[:\-]\s*([A-DА-Г]|.+)$",
-    re.IGNORECASE,
+from live.deck import bump_deck_versions
+from lessons.adaptive import (
+    discard_student_entry,
+    record_slide_submission,
+    record_slide_submissions,
+    slide_submission_entry,
 )
 
 
-def _normalize_option_label(label: str) -> str:
-    raw = (label or "").upper()
-    mapping = {
-        "А": "A",
-        "Б": "B",
-        "В": "C",
-        "Г": "D",
+def _docx_job_payload(job: DocxImportJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "paragraphs_read": job.paragraphs_read,
+        "questions_detected": job.questions_detected,
+        "error": job.error,
+        "result": job.result or None,
     }
-    return mapping.get(raw, raw)
-
-
-def _extract_docx_paragraphs(uploaded_file):
-    filename = (getattr(uploaded_file, "name", "") or "").lower()
-    if not filename.endswith(".docx"):
-        raise ValueError("Тек .docx файл жүктеңіз.")
-
-    try:
-        uploaded_file.seek(0)
-    except Exception:
-        pass
-
-    try:
-        with zipfile.ZipFile(uploaded_file) as zf:
-            xml_bytes = zf.read("word/document.xml")
-    except Exception:
-        raise ValueError("DOCX файлын оқу мүмкін болмады.")
-
-    try:
-        root = ElementTree.fromstring(xml_bytes)
-    except Exception:
-        raise ValueError("DOCX құрылымы жарамсыз.")
-
-    ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
-    paragraphs = []
-    for p in root.findall(".//w:body/w:p", ns):
-        text_parts = []
-        for t in p.findall(".//w:t", ns):
-            text_parts.append(t.text or "")
-        line = "".join(text_parts).strip()
-        if line:
-            paragraphs.append(line)
-    return paragraphs
-
-
-def _resolve_answer(current):
-    options = current.get("options", [])
-    answer_label = current.get("answer_label")
-    answer_text = (current.get("answer_text") or "").strip()
-
-    if answer_label:
-        for o in options:
-            if o.get("label") == answer_label:
-                return o.get("text", "").strip()
-
-    if answer_text:
-        normalized = answer_text.lower().strip()
-        if len(normalized) == 1:
-            letter = _normalize_option_label(normalized)
-            for o in options:
-                if o.get("label") == letter:
-                    return o.get("text", "").strip()
-        for o in options:
-            if o.get("text", "").strip().lower() == normalized:
-                return o.get("text", "").strip()
-
-    for o in options:
-        text = (o.get("text") or "").strip()
-        if text.startswith("*"):
-            return text.lstrip("*").strip()
-
-    return (options[0].get("text") or "").strip() if options else ""
-
-
-def _parse_docx_quiz_questions(lines):
-    questions = []
-    warnings = []
-    current = None
-
-    def parse_inline_question(raw_line: str):
-        raw = (raw_line or "").strip()
-        if not raw or "?" not in raw:
-            return None
-
-        correct_match = CORRECT_ANY_RE.search(raw)
-        if correct_match:
-            body = raw[:correct_match.start()].strip()
-            answer_token = (correct_match.group(1) or "").strip()
-        else:
-            body = raw
-            answer_token = ""
-
-        option_matches = list(OPTION_INLINE_RE.finditer(body))
-        if len(option_matches) < 2:
-            return None
-
-        question_text = body[: option_matches[0].start()].strip()
-        if not question_text:
-            return None
-
-        options = []
-        for idx, match in enumerate(option_matches):
-            start = match.end()
-            end = option_matches[idx + 1].start() if idx + 1 < len(option_matches) else len(body)
-            opt_text = body[start:end].strip()
-            if not opt_text:
-                continue
-            options.append(
-                {
-                    "label": _normalize_option_label(match.group(1)),
-                    "text": opt_text.lstrip("*").strip(),
-                }
-            )
-
-        if len(options) < 2:
-            return None
-
-        answer = _resolve_answer(
-            {
-                "options": options,
-                "answer_label": _normalize_option_label(answer_token) if len(answer_token) == 1 else "",
-                "answer_text": answer_token if len(answer_token) != 1 else "",
-            }
-        )
-        if not answer:
-            answer = options[0]["text"]
-
-        return {
-            "question": question_text,
-            "options": [o["text"] for o in options],
-            "answer": answer,
-        }
-
-    def push_current():
-        nonlocal current
-        if not current:
-            return
-        q_text = (current.get("question") or "").strip()
-        opts = []
-        seen = set()
-        for opt in current.get("options", []):
-            txt = (opt.get("text") or "").strip()
-            if not txt:
-                continue
-            if txt in seen:
-                continue
-            seen.add(txt)
-            opts.append({"label": opt.get("label", ""), "text": txt.lstrip("*").strip()})
-
-        if not q_text or len(opts) < 2:
-            warnings.append(f"Сұрақ өткізіліп кетті: {q_text[:60] or '(бос)'}")
-            current = None
-            return
-
-        answer = _resolve_answer({**current, "options": opts})
-        if not answer:
-            answer = opts[0]["text"]
-
-        questions.append(
-            {
-                "question": q_text,
-                "options": [o["text"] for o in opts],
-                "answer": answer,
-            }
-        )
-        current = None
-
-    for line in lines:
-        raw = (line or "").strip()
-        if not raw:
-            continue
-
-        inline = parse_inline_question(raw)
-        if inline:
-            push_current()
-            questions.append(inline)
-            continue
-
-        q_match = QUESTION_RE.match(raw)
-        if q_match:
-            push_current()
-            current = {
-                "question": q_match.group(2).strip(),
-                "options": [],
-                "answer_label": "",
-                "answer_text": "",
-            }
-            continue
-
-        if current is None:
-            if "?" in raw:
-                current = {
-                    "question": raw,
-                    "options": [],
-                    "answer_label": "",
-                    "answer_text": "",
-                }
-            continue
-
-        opt_match = OPTION_RE.match(raw)
-        if opt_match:
-            label = _normalize_option_label(opt_match.group(1))
-            text = opt_match.group(2).strip()
-            current["options"].append({"label": label, "text": text})
-            continue
-
-        correct_match = CORRECT_RE.match(raw)
-        if correct_match:
-            token = correct_match.group(1).strip()
-            if len(token) == 1:
-                current["answer_label"] = _normalize_option_label(token)
-            else:
-                current["answer_text"] = token
-            continue
-
-        # continue question/options multi-line
-        if current["options"]:
-            current["options"][-1]["text"] = f"{current['options'][-1]['text']} {raw}".strip()
-        else:
-            current["question"] = f"{current['question']} {raw}".strip()
-
-    push_current()
-    return questions, warnings
 
 
 class SlideTemplateViewSet(viewsets.ModelViewSet):
@@ -288,8 +86,19 @@ class SlideTemplateViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_update(self, serializer):
+        previous = (serializer.instance.template_type, serializer.instance.data)
+        template = serializer.save()
+        # Wrong-answer counts depend on the answer key, so recount when it changes.
+        if (template.template_type, template.data) != previous and template.answer_stats_built_at is not None:
+            rebuild_template_answer_stats(template)
+
     @action(detail=False, methods=['post'], url_path='import-docx-quiz')
     def import_docx_quiz(self, request):
+        """
+        Small files are imported in the request (201). Files over SLIDE_DOCX_ASYNC_BYTES, or any file
+        with async=1, become a background job (202); poll import-docx-quiz/<job_id>/ for progress.
+        """
         if getattr(request.user, "role", None) != "teacher":
             raise PermissionDenied("Тек мұғалім импорт жасай алады.")
 
@@ -301,66 +110,39 @@ class SlideTemplateViewSet(viewsets.ModelViewSet):
         if mode not in {"separate", "single_quiz"}:
             return Response({"error": "mode мәні separate немесе single_quiz болуы керек."}, status=400)
 
+        run_async = str(request.data.get("async") or "").lower() in {"1", "true", "yes"}
+        if run_async or (uploaded_file.size or 0) > async_threshold_bytes():
+            if not (uploaded_file.name or "").lower().endswith(".docx"):
+                return Response({"error": "Тек .docx файл жүктеңіз."}, status=400)
+            with transaction.atomic():
+                job = DocxImportJob.objects.create(
+                    author=request.user, file=uploaded_file, title=base_title[:255], mode=mode
+                )
+                enqueue_docx_import(job)
+            return Response(_docx_job_payload(job), status=status.HTTP_202_ACCEPTED)
+
         try:
-            lines = _extract_docx_paragraphs(uploaded_file)
-            parsed_questions, warnings = _parse_docx_quiz_questions(lines)
+            paragraphs, _ = iter_docx_paragraphs(uploaded_file)
+            parsed_questions, warnings = parse_quiz_questions(paragraphs)
         except ValueError as exc:
             return Response({"error": str(exc)}, status=400)
 
         if not parsed_questions:
-            return Response(
-                {
-                    "error": (
-                        "DOCX ішінен сұрақ табылмады. Формат мысалы: "
-                        "1) ... A) ... B) ... C) ... Дұрыс жауап: A"
-                    )
-                },
-                status=400,
-            )
-
-        created = []
-        with transaction.atomic():
-            if mode == "single_quiz":
-                first = parsed_questions[0]
-                tpl = SlideTemplate.objects.create(
-                    title=base_title,
-                    author=request.user,
-                    template_type="quiz",
-                    data={
-                        # backward compatibility for old renderers
-                        "question": first["question"],
-                        "options": first["options"],
-                        "answer": first["answer"],
-                        # new multi-question format
-                        "questions": parsed_questions,
-                    },
-                )
-                created.append({"id": tpl.id, "title": tpl.title})
-            else:
-                for idx, q in enumerate(parsed_questions, start=1):
-                    tpl = SlideTemplate.objects.create(
-                        title=f"{base_title} · {idx}",
-                        author=request.user,
-                        template_type="quiz",
-                        data={
-                            "question": q["question"],
-                            "options": q["options"],
-                            "answer": q["answer"],
-                        },
-                    )
-                    created.append({"id": tpl.id, "title": tpl.title})
+            return Response({"error": NO_QUESTIONS_ERROR}, status=400)
 
+        created = create_quiz_templates(request.user, base_title, mode, parsed_questions)
         return Response(
-            {
-                "mode": mode,
-                "created_count": len(created),
-                "created": created,
-                "warnings": warnings[:20],
-                "questions_detected": len(parsed_questions),
-            },
+            import_payload(mode, created, warnings, len(parsed_questions)),
             status=status.HTTP_201_CREATED,
         )
 
+    @action(detail=False, methods=['get'], url_path=r'import-docx-quiz/(?P<job_id>\d+)')
+    def import_docx_quiz_status(self, request, job_id=None):
+        job = DocxImportJob.objects.filter(pk=job_id, author=request.user).first()
+        if job is None:
+            return Response({"error": "Импорт табылмады."}, status=404)
+        return Response(_docx_job_payload(job))
+
     def _default_config(self, t: str):
         if t == "quiz":
             return {
@@ -524,149 +306,40 @@ class SlideTemplateViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='apply')
     def apply_template(self, request, pk=None):
+        """
+        Body: {"lesson_id": 1} or {"lesson_ids": [1, 2, ...]} to append the template's slides to several lessons.
+        """
         template = self.get_object()
-        lesson_id = request.data.get('lesson_id')
-
-        if not lesson_id:
+        lesson_ids = request.data.get('lesson_ids')
+        if lesson_ids is None:
+            lesson_id = request.data.get('lesson_id')
+            lesson_ids = [lesson_id] if lesson_id else []
+        if not isinstance(lesson_ids, list) or not lesson_ids:
             return Response({"error": "lesson_id is required"}, status=400)
-
         try:
-            lesson = Lesson.objects.get(id=lesson_id)
-        except Lesson.DoesNotExist:
+            lesson_ids = {int(value) for value in lesson_ids}
+        except (TypeError, ValueError):
             return Response({"error": "Lesson not found"}, status=404)
-        if lesson.owner_id != request.user.id:
-            return Response({"error": "Forbidden"}, status=403)
 
-        t = template.template_type
-        cfg = template.data or {}
-
-        created_slides = []
-
-        if t == "quiz":
-            s = Slide.objects.create(lesson=lesson, title=f"Quiz: {template.title}")
-            SlideObject.objects.create(
-                slide=s, object_type="text",
-                data={"text": cfg.get("question", "")},
-                position={"x":80,"y":80,"width":900,"height":60}, z_index=1
-            )
-            y = 180
-            for opt in cfg.get("options", []):
-                SlideObject.objects.create(
-                    slide=s, object_type="checkbox",
-                    data={"label": opt, "correct": (opt == cfg.get("answer"))},
-                    position={"x":120,"y":y,"width":600,"height":40}, z_index=1
-                )
-                y += 60
-            created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "matching":
-            s = Slide.objects.create(lesson=lesson, title=f"Matching: {template.title}")
-            left = cfg.get("left", []); right = cfg.get("right", [])
-            y = 120
-            SlideObject.objects.create(
-                slide=s, object_type="text",
-                data={"text": "Match left to right"}, position={"x":80,"y":60,"width":700,"height":40}, z_index=1
-            )
-            for i in range(max(len(left), len(right))):
-                ltxt = left[i] if i < len(left) else ""
-                rtxt = right[i] if i < len(right) else ""
-                SlideObject.objects.create(slide=s, object_type="text",
-                    data={"text": f"{i+1}. {ltxt}"}, position={"x":80,"y":y,"width":400,"height":40}, z_index=1)
-                SlideObject.objects.create(slide=s, object_type="text",
-                    data={"text": rtxt}, position={"x":600,"y":y,"width":400,"height":40}, z_index=1)
-                y += 50
-            created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "flashcards":
-            cards = cfg.get("cards", [])
-            for idx, card in enumerate(cards, start=1):
-                s = Slide.objects.create(lesson=lesson, title=f"Card {idx}: {template.title}")
-                SlideObject.objects.create(slide=s, object_type="text",
-                    data={"text": card.get("front","(front)")},
-                    position={"x":100,"y":140,"width":1000,"height":120}, z_index=1)
-                SlideObject.objects.create(slide=s, object_type="text",
-                    data={"text": card.get("back","(back)"), "color":"#666", "fontSize":22},
-                    position={"x":100,"y":320,"width":1000,"height":120}, z_index=1)
-                created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "poll":
-            s = Slide.objects.create(lesson=lesson, title=f"Poll: {template.title}")
-            SlideObject.objects.create(slide=s, object_type="text",
-                data={"text": cfg.get("question","Poll")}, position={"x":80,"y":80,"width":900,"height":60}, z_index=1)
-            y = 180
-            for opt in cfg.get("options", []):
-                SlideObject.objects.create(slide=s, object_type="checkbox",
-                    data={"label": opt}, position={"x":120,"y":y,"width":600,"height":40}, z_index=1)
-                y += 60
-            created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "crossword":
-            s = Slide.objects.create(lesson=lesson, title=f"Crossword: {template.title}")
-            rows = int(cfg.get("rows", 5)); cols = int(cfg.get("cols", 5))
-            cellW, cellH = 40, 40; startX, startY = 80, 120
-            SlideObject.objects.create(slide=s, object_type="shape",
-                data={"shapeType": "rect", "stroke":"#333", "strokeWidth":2, "fill":"transparent"},
-                position={"x":startX-4,"y":startY-4,"width":cols*cellW+8,"height":rows*cellH+8}, z_index=0)
-            for cell in cfg.get("cells", []):
-                r, c = cell.get("r",0), cell.get("c",0)
-                letter = cell.get("letter","")
-                x = startX + c*cellW + 12
-                y = startY + r*cellH + 8
-                SlideObject.objects.create(slide=s, object_type="text",
-                    data={"text": letter, "fontSize":22},
-                    position={"x":x,"y":y,"width":cellW,"height":cellH}, z_index=1)
-            created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "sorting":
-            s = Slide.objects.create(lesson=lesson, title=f"Sorting: {template.title}")
-            SlideObject.objects.create(
-                slide=s, object_type="text",
-                data={"text": "Қадамдарды дұрыс ретпен орналастырыңыз"},
-                position={"x":80,"y":60,"width":900,"height":40}, z_index=1
-            )
-            y = 140
-            for item in cfg.get("items", []):
-                SlideObject.objects.create(
-                    slide=s, object_type="text",
-                    data={"text": item},
-                    position={"x":120,"y":y,"width":800,"height":40}, z_index=1
-                )
-                y += 55
-            created_slides.append({"id": s.id, "title": s.title})
-
-        elif t == "grouping":
-            s = Slide.objects.create(lesson=lesson, title=f"Grouping: {template.title}")
-            SlideObject.objects.create(
-                slide=s, object_type="text",
-                data={"text": "Элементтерді тиісті топтарға бөліңіз"},
-                position={"x":80,"y":60,"width":900,"height":40}, z_index=1
-            )
-            groups = cfg.get("groups", [])
-            x = 80
-            for g in groups[:3]:
-                SlideObject.objects.create(
-                    slide=s, object_type="text",
-                    data={"text": g.get("title", "Топ")},
-                    position={"x":x,"y":120,"width":280,"height":30}, z_index=1
-                )
-                y = 170
-                for it in g.get("items", [])[:5]:
-                    SlideObject.objects.create(
-                        slide=s, object_type="text",
-                        data={"text": it},
-                        position={"x":x,"y":y,"width":280,"height":30}, z_index=1
-                    )
-                    y += 40
-                x += 320
-            created_slides.append({"id": s.id, "title": s.title})
+        owners = dict(Lesson.objects.filter(id__in=lesson_ids).values_list('id', 'owner_id'))
+        if len(owners) != len(lesson_ids):
+            return Response({"error": "Lesson not found"}, status=404)
+        if any(owner_id != request.user.id for owner_id in owners.values()):
+            return Response({"error": "Forbidden"}, status=403)
 
-        else:
+        plan = plan_template_slides(template)
+        if plan is None:
             return Response({"error":"Unsupported template_type"}, status=400)
 
+        created = materialize_plan(plan, lesson_ids)
         return Response(
             {
                 "template_id": template.id,
-                "created_slides": created_slides,
+                "created_slides": [
+                    {"id": s.id, "title": s.title, "lesson_id": lesson_id}
+                    for lesson_id, slides in created.items()
+                    for s in slides
+                ],
             },
             status=201,
         )
@@ -695,33 +368,99 @@ class SlideObjectViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return super().get_queryset().filter(slide__lesson__owner=self.request.user)
 
+    BATCH_FIELDS = ("position", "z_index", "is_locked", "rotation", "data")
+
     @action(detail=False, methods=['patch'], url_path='batch')
     def batch_update(self, request):
         """
-        Body: [{"id": 2, "position": {...}}, {"id": 3, "z_index": 999}, ...]
+        Body: [{"id": 2, "position": {...}, "updated_at": "..."}, {"id": 3, "z_index": 999}, ...]
+        `updated_at` is optional: when given and the object changed since, nothing is saved and 409 lists the conflicts.
         """
         items = request.data
         if not isinstance(items, list):
             return Response({"detail": "List expected"}, status=status.HTTP_400_BAD_REQUEST)
 
-        updated = []
+        changes = {}
+        expected = {}
+        for it in items:
+            obj_id = it.get("id") if isinstance(it, dict) else None
+            if not obj_id:
+                return Response({"detail": "Missing id"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                obj_id = int(obj_id)
+            except (TypeError, ValueError):
+                return Response({"detail": f"Invalid id {obj_id}"}, status=status.HTTP_400_BAD_REQUEST)
+            fields = changes.setdefault(obj_id, {})
+            fields.update({f: it[f] for f in self.BATCH_FIELDS if f in it})
+            if it.get("updated_at") and obj_id not in expected:
+                seen = parse_datetime(str(it["updated_at"]))
+                if seen is None:
+                    return Response(
+                        {"detail": f"Invalid updated_at for object {obj_id}"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                expected[obj_id] = seen if timezone.is_aware(seen) else timezone.make_aware(seen)
+
         with transaction.atomic():
-            for it in items:
-                obj_id = it.get("id")
-                if not obj_id:
-                    return Response({"detail": "Missing id"}, status=status.HTTP_400_BAD_REQUEST)
-                try:
-                    obj = self.get_queryset().get(pk=obj_id)
-                except SlideObject.DoesNotExist:
+            objects = self.get_queryset().select_for_update(of=('self',)).in_bulk(list(changes))
+            for obj_id in changes:
+                if obj_id not in objects:
                     return Response({"detail": f"Object {obj_id} not found"}, status=status.HTTP_404_NOT_FOUND)
 
-                for f in ["position", "z_index", "is_locked", "rotation", "data"]:
-                    if f in it:
-                        setattr(obj, f, it[f])
-                obj.save()
-                updated.append(obj_id)
+            conflicts = [
+                {"id": obj_id, "updated_at": objects[obj_id].updated_at}
+                for obj_id, seen in expected.items()
+                if objects[obj_id].updated_at != seen
+            ]
+            if conflicts:
+                return Response(
+                    {"detail": "Objects were changed by someone else", "conflicts": conflicts},
+                    status=status.HTTP_409_CONFLICT,
+                )
 
-        return Response({"updated": updated}, status=status.HTTP_200_OK)
+            # bulk_update skips auto_now and signals, so stamp updated_at and bump the deck here.
+            now = timezone.now()
+            by_field_set = {}
+            for obj_id, fields in changes.items():
+                obj = objects[obj_id]
+                for f, value in fields.items():
+                    setattr(obj, f, value)
+                obj.updated_at = now
+                by_field_set.setdefault(tuple(sorted(fields)), []).append(obj)
+            for field_set, group in by_field_set.items():
+                SlideObject.objects.bulk_update(group, [*field_set, "updated_at"])
+            bump_deck_versions({obj.slide.lesson_id for obj in objects.values()})
+
+        return Response(
+            {
+                "updated": list(changes),
+                "objects": [{"id": obj_id, "updated_at": now} for obj_id in changes],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+# Upper bound on queued submissions replayed by one batch request.
+SUBMISSION_BATCH_LIMIT = 200
+
+
+def _weighted_payloads(queryset):
+    """
+    Yield (data, count) pairs covering every submission in the queryset exactly once.
+    PostgreSQL groups identical payloads in SQL; other backends stream one row at a time.
+    Pairs come in the order their first submission appears in the default ordering.
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        grouped = (
+            queryset.values('data')
+            .annotate(n=Count('id'), latest=Max('created_at'), first_id=Min('id'))
+            .order_by('-latest', 'first_id')
+            .values_list('data', 'n')
+        )
+        return grouped.iterator(chunk_size=2000)
+    rows = queryset.order_by('-created_at', 'id').values_list('data', flat=True)
+    return ((data, 1) for data in rows.iterator(chunk_size=2000))
 
 
 class SubmissionViewSet(viewsets.ModelViewSet):
@@ -743,7 +482,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         submission = serializer.save(user=request.user)
 
         extra_payload = self._process_submission(submission)
-        adaptive_feedback = recompute_student_profile(request.user)
+        adaptive_feedback = record_slide_submission(submission)
         response_serializer = self.get_serializer(submission)
         response_data = dict(response_serializer.data)
         response_data.update(extra_payload)
@@ -751,161 +490,122 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(response_data)
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch_create(self, request):
+        """
+        Body: [{"template": 3, "data": {...}}, ...] -- answers queued offline and replayed at once.
+        Valid items are saved even when others fail validation; results keep the request order.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "List expected"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > SUBMISSION_BATCH_LIMIT:
+            return Response(
+                {"detail": f"At most {SUBMISSION_BATCH_LIMIT} submissions per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def referenced(field):
+            values = (str(it.get(field) or '') for it in items if isinstance(it, dict))
+            return {int(value) for value in values if value.isdigit()}
+
+        context = self.get_serializer_context()
+        context["prefetched"] = {
+            SlideTemplate: SlideTemplate.objects.in_bulk(referenced("template")),
+            Slide: Slide.objects.in_bulk(referenced("slide")),
+        }
+
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            serializer = SubmissionBatchItemSerializer(data=item, context=context)
+            if not serializer.is_valid():
+                results[index] = {"index": index, "ok": False, "errors": serializer.errors}
+                continue
+            submission = Submission(user=request.user, **serializer.validated_data)
+            graded = grade_submission(submission.template, submission.data)
+            extra = {}
+            if graded is not None:
+                submission.score, extra = graded
+            pending.append((index, submission, extra))
+
+        saved = [submission for _, submission, _ in pending]
+        poll_results = {}
+        with transaction.atomic():
+            Submission.objects.bulk_create(saved)
+            by_template = {}
+            for submission in saved:
+                if submission.template is not None:
+                    by_template.setdefault(submission.template_id, []).append(submission)
+            for template_id, submissions in by_template.items():
+                template = submissions[0].template
+                record_submissions_answers(template, submissions)
+                if template.template_type == 'poll':
+                    counts = answer_counts(template, 0).get(0, (Counter(), Counter()))[0]
+                    poll_results[template_id] = self._poll_results(counts, sum(counts.values()), template)
+        adaptive_feedback = record_slide_submissions(request.user, saved) if saved else None
+
+        for index, submission, extra in pending:
+            row = {"index": index, "ok": True, **SubmissionSerializer(submission).data, **extra}
+            if submission.template_id in poll_results:
+                row["results"] = poll_results[submission.template_id]
+            results[index] = row
+
+        return Response(
+            {"created_count": len(saved), "results": results, "adaptive_feedback": adaptive_feedback},
+            status=status.HTTP_201_CREATED if saved else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def perform_update(self, serializer):
+        previous_data = serializer.instance.data
+        previous = slide_submission_entry(serializer.instance) if serializer.instance.user is not None else None
+        submission = serializer.save()
+        replace_submission_answers(submission, previous_data)
+        # The template or slide may have moved, and with it the topic the submission counts towards.
+        if previous is not None:
+            record_slide_submission(submission, previous=previous)
+
+    def perform_destroy(self, instance):
+        student = instance.user
+        entry = slide_submission_entry(instance) if student is not None else None
+        super().perform_destroy(instance)
+        record_submission_answers(instance, sign=-1)
+        if entry is not None:
+            discard_student_entry(student, entry)
+
     def _process_submission(self, submission: Submission) -> dict:
         template = submission.template
         template_type = template.template_type if template else None
         payload = submission.data or {}
         extra = {}
+        record_submission_answers(submission)
 
-        def _same_answer(a, b):
-            if a is None or b is None:
-                return False
-            if isinstance(a, str) and isinstance(b, str):
-                return a.strip().casefold() == b.strip().casefold()
-            return a == b
-
-        if template_type == 'quiz':
-            cfg = template.data if isinstance(template.data, dict) else {}
-            questions = cfg.get('questions') if isinstance(cfg.get('questions'), list) else None
-
-            if questions:
-                answers = payload.get('answers') if isinstance(payload, dict) else None
-                if not isinstance(answers, list):
-                    single = payload.get('answer') if isinstance(payload, dict) else None
-                    answers = [single] if single is not None else []
-
-                total = 0
-                correct_count = 0
-                details = []
-                for idx, question in enumerate(questions):
-                    if not isinstance(question, dict):
-                        continue
-                    expected = question.get('answer')
-                    if expected is None:
-                        continue
-                    total += 1
-                    given = answers[idx] if idx < len(answers) else None
-                    is_ok = _same_answer(expected, given)
-                    if is_ok:
-                        correct_count += 1
-                    details.append(
-                        {
-                            "index": idx + 1,
-                            "question": question.get("question", ""),
-                            "given": given,
-                            "expected": expected,
-                            "correct": bool(is_ok),
-                        }
-                    )
+        if template_type == 'poll':
+            counts = answer_counts(template, 0).get(0, (Counter(), Counter()))[0]
+            extra['results'] = self._poll_results(counts, sum(counts.values()), template)
+            return extra
 
-                submission.score = (correct_count / total) if total else 0.0
-                submission.save(update_fields=['score'])
-                extra['correct'] = bool(total and correct_count == total)
-                extra['correct_count'] = correct_count
-                extra['total_questions'] = total
-                extra['details'] = details
-            else:
-                expected = cfg.get('answer')
-                answer = payload.get('answer') if isinstance(payload, dict) else None
-                correct = _same_answer(expected, answer)
-                submission.score = 1.0 if correct else 0.0
-                submission.save(update_fields=['score'])
-                extra['correct'] = bool(correct)
-        elif template_type == 'poll':
-            queryset = self._related_queryset(submission)
-            extra['results'] = self._aggregate_poll(queryset, template)
-        elif template_type == 'sorting':
-            expected = []
-            if isinstance(template.data, dict):
-                expected = template.data.get('items') or []
-            given = payload.get('order') if isinstance(payload, dict) else None
-            correct = bool(expected) and isinstance(given, list) and given == expected
-            submission.score = 1.0 if correct else 0.0
-            submission.save(update_fields=['score'])
-            extra['correct'] = bool(correct)
-        elif template_type == 'matching':
-            left = []
-            right = []
-            if isinstance(template.data, dict):
-                left = template.data.get('left') or []
-                right = template.data.get('right') or []
-            pairs = payload.get('pairs') if isinstance(payload, dict) else None
-            correct = False
-            if isinstance(pairs, dict) and left and right and len(left) == len(right):
-                correct = all(pairs.get(l) == right[i] for i, l in enumerate(left))
-            submission.score = 1.0 if correct else 0.0
-            submission.save(update_fields=['score'])
-            extra['correct'] = bool(correct)
-        elif template_type == 'grouping':
-            groups = []
-            if isinstance(template.data, dict):
-                groups = template.data.get('groups') or []
-            submitted = payload.get('groups') if isinstance(payload, dict) else None
-            correct = False
-            if isinstance(submitted, dict) and groups:
-                correct = True
-                for g in groups:
-                    title = g.get('title')
-                    items = g.get('items') or []
-                    if title is None or not isinstance(items, list):
-                        correct = False
-                        break
-                    got = submitted.get(title)
-                    if not isinstance(got, list) or sorted(got) != sorted(items):
-                        correct = False
-                        break
-            submission.score = 1.0 if correct else 0.0
-            submission.save(update_fields=['score'])
-            extra['correct'] = bool(correct)
-        elif template_type == 'flashcards':
-            correct = bool(payload.get('correct')) if isinstance(payload, dict) else False
-            submission.score = 1.0 if correct else 0.0
-            submission.save(update_fields=['score'])
-            extra['correct'] = bool(correct)
-        elif template_type == 'crossword':
-            cfg = template.data or {}
-            expected = {}
-            for cell in cfg.get('cells', []) or []:
-                r = cell.get('r'); c = cell.get('c')
-                if r is None or c is None:
-                    continue
-                expected[f"{r},{c}"] = str(cell.get('letter', '')).strip().upper()
-            submitted_cells = payload.get('cells') if isinstance(payload, dict) else None
-            correct = 0
-            total = len(expected)
-            if isinstance(submitted_cells, list) and total:
-                for cell in submitted_cells:
-                    r = cell.get('r'); c = cell.get('c')
-                    key = f"{r},{c}"
-                    if key in expected:
-                        letter = str(cell.get('letter', '')).strip().upper()
-                        if letter == expected[key]:
-                            correct += 1
-            submission.score = (correct / total) if total else 0.0
+        graded = grade_submission(template, payload)
+        if graded is not None:
+            submission.score, graded_extra = graded
             submission.save(update_fields=['score'])
-            extra['correct'] = bool(total and correct == total)
-
+            extra.update(graded_extra)
         return extra
 
-    def _related_queryset(self, submission: Submission):
-        if submission.template_id:
-            return Submission.objects.filter(template_id=submission.template_id)
-        if submission.slide_id:
-            return Submission.objects.filter(slide_id=submission.slide_id)
-        return Submission.objects.none()
-
-    def _aggregate_poll(self, queryset, template: Optional[SlideTemplate]):
+    def _aggregate_poll(self, payloads, template: Optional[SlideTemplate]):
         counts = Counter()
         total = 0
-        for sub in queryset:
-            data = sub.data if isinstance(sub.data, dict) else {}
+        for data, weight in payloads:
+            data = data if isinstance(data, dict) else {}
             answer = data.get('answer')
             if answer is None:
                 continue
             key = str(answer)
-            counts[key] += 1
-            total += 1
+            counts[key] += weight
+            total += weight
+        return self._poll_results(counts, total, template)
 
+    def _poll_results(self, counts: Counter, total: int, template: Optional[SlideTemplate]):
         template_options = []
         if template and isinstance(template.data, dict):
             template_options = template.data.get('options') or []
@@ -932,20 +632,13 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
         return results
 
-    @action(detail=False, methods=['get'], url_path='stats')
-    def stats(self, request):
+    def _stats_queryset(self, request):
         template_id = request.query_params.get('template')
         slide_id = request.query_params.get('slide')
         date_from = request.query_params.get('from')
         date_to = request.query_params.get('to')
 
-        if not template_id and not slide_id:
-            return Response(
-                {'detail': 'Pass either template or slide query parameter.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        queryset = Submission.objects.select_related('template').all()
+        queryset = Submission.objects.all()
         if date_from:
             dt = parse_datetime(date_from) or parse_date(date_from)
             if isinstance(dt, datetime):
@@ -981,11 +674,42 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 if submission_with_template:
                     template_obj = submission_with_template.template
 
+        return queryset, template_obj, template_id, slide_id
+
+    def _answer_stats_for(self, request, template_obj: Optional[SlideTemplate]):
+        """
+        Materialized answer counts cover a whole template, so they only answer
+        template-wide requests without slide or date filters.
+        """
+        params = request.query_params
+        if not template_obj or not params.get('template'):
+            return None
+        if params.get('slide') or params.get('from') or params.get('to'):
+            return None
+        if template_obj.template_type not in {'poll', 'quiz'}:
+            return None
+        ensure_template_answer_stats(template_obj)
+        return answer_counts(template_obj)
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        if not request.query_params.get('template') and not request.query_params.get('slide'):
+            return Response(
+                {'detail': 'Pass either template or slide query parameter.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset, template_obj, template_id, slide_id = self._stats_queryset(request)
         total = queryset.count()
         template_type = template_obj.template_type if template_obj else None
 
         if template_type == 'poll':
-            results = self._aggregate_poll(queryset, template_obj)
+            answer_stats = self._answer_stats_for(request, template_obj)
+            if answer_stats is not None:
+                counts = answer_stats.get(0, (Counter(), Counter()))[0]
+                results = self._poll_results(counts, sum(counts.values()), template_obj)
+            else:
+                results = self._aggregate_poll(_weighted_payloads(queryset), template_obj)
             return Response({
                 'type': 'poll',
                 'template': template_id,
@@ -1008,10 +732,10 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
         if template_type in {'matching', 'sorting', 'grouping'}:
             counts = Counter()
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 key = str(payload)
-                counts[key] += 1
+                counts[key] += weight
             results = []
             for key, count in counts.most_common():
                 percentage = (count / total * 100.0) if total else 0.0
@@ -1041,53 +765,13 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='mistakes')
     def mistakes(self, request):
-        template_id = request.query_params.get('template')
-        slide_id = request.query_params.get('slide')
-        date_from = request.query_params.get('from')
-        date_to = request.query_params.get('to')
-
-        if not template_id and not slide_id:
+        if not request.query_params.get('template') and not request.query_params.get('slide'):
             return Response(
                 {'detail': 'Pass either template or slide query parameter.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        queryset = Submission.objects.select_related('template').all()
-        template_obj = None
-
-        if date_from:
-            dt = parse_datetime(date_from) or parse_date(date_from)
-            if isinstance(dt, datetime):
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt, timezone.get_current_timezone())
-                queryset = queryset.filter(created_at__gte=dt)
-            elif dt:
-                start = timezone.make_aware(datetime.combine(dt, time.min), timezone.get_current_timezone())
-                queryset = queryset.filter(created_at__gte=start)
-        if date_to:
-            dt = parse_datetime(date_to) or parse_date(date_to)
-            if isinstance(dt, datetime):
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt, timezone.get_current_timezone())
-                queryset = queryset.filter(created_at__lte=dt)
-            elif dt:
-                end = timezone.make_aware(datetime.combine(dt, time.max), timezone.get_current_timezone())
-                queryset = queryset.filter(created_at__lte=end)
-
-        if template_id:
-            queryset = queryset.filter(template_id=template_id)
-            template_obj = SlideTemplate.objects.filter(pk=template_id).first()
-
-        if slide_id:
-            queryset = queryset.filter(slide_id=slide_id)
-            if template_obj is None:
-                submission_with_template = (
-                    queryset.filter(template__isnull=False)
-                    .select_related('template')
-                    .first()
-                )
-                if submission_with_template:
-                    template_obj = submission_with_template.template
+        queryset, template_obj, template_id, slide_id = self._stats_queryset(request)
 
         if not template_obj:
             return Response({
@@ -1096,6 +780,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
         t = template_obj.template_type
         cfg = template_obj.data or {}
+        answer_stats = self._answer_stats_for(request, template_obj)
 
         # Quiz mistakes
         if t == 'quiz':
@@ -1105,29 +790,42 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 overall_total = 0
                 overall_wrong = Counter()
 
-                for idx, q in enumerate(questions):
-                    if not isinstance(q, dict):
-                        continue
+                # Per-question counters come from TemplateAnswerStats or from one pass over the submissions.
+                totals = [0] * len(questions)
+                wrong_by_question = [Counter() for _ in questions]
+                graded = [idx for idx, q in enumerate(questions) if isinstance(q, dict)]
+                expected = {
+                    idx: str(questions[idx].get('answer', '')).strip().casefold() for idx in graded
+                }
+                if answer_stats is not None:
+                    for idx in graded:
+                        counts, wrong_counts = answer_stats.get(idx, (Counter(), Counter()))
+                        totals[idx] = sum(counts.values())
+                        wrong_by_question[idx] = wrong_counts
+                else:
+                    for payload, weight in _weighted_payloads(queryset):
+                        payload = payload if isinstance(payload, dict) else {}
+                        answers = payload.get('answers')
+                        for idx in graded:
+                            if isinstance(answers, list):
+                                answer = answers[idx] if idx < len(answers) else None
+                            else:
+                                answer = payload.get('answer') if idx == 0 else None
+                            if answer is None:
+                                continue
+                            totals[idx] += weight
+                            if str(answer).strip().casefold() != expected[idx]:
+                                wrong_by_question[idx][str(answer)] += weight
+
+                for idx in graded:
+                    q = questions[idx]
                     q_text = q.get('question', f"Question {idx + 1}")
                     correct_answer = q.get('answer', '')
-                    wrong_counts = Counter()
-                    total = 0
-
-                    for sub in queryset:
-                        payload = sub.data if isinstance(sub.data, dict) else {}
-                        answers = payload.get('answers')
-                        if isinstance(answers, list):
-                            answer = answers[idx] if idx < len(answers) else None
-                        else:
-                            answer = payload.get('answer') if idx == 0 else None
-                        if answer is None:
-                            continue
-                        total += 1
-                        overall_total += 1
-                        if str(answer).strip().casefold() != str(correct_answer).strip().casefold():
-                            txt = str(answer)
-                            wrong_counts[txt] += 1
-                            overall_wrong[txt] += 1
+                    wrong_counts = wrong_by_question[idx]
+                    total = totals[idx]
+                    overall_total += total
+                    for txt, count in wrong_counts.items():
+                        overall_wrong[txt] += count
 
                     wrong = []
                     for opt, count in wrong_counts.most_common():
@@ -1175,14 +873,19 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             correct_answer = cfg.get('answer', '')
             wrong_counts = Counter()
             total = 0
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
-                answer = payload.get('answer')
-                if answer is None:
-                    continue
-                total += 1
-                if str(answer).strip().casefold() != str(correct_answer).strip().casefold():
-                    wrong_counts[str(answer)] += 1
+            expected_answer = str(correct_answer).strip().casefold()
+            if answer_stats is not None:
+                counts, wrong_counts = answer_stats.get(0, (Counter(), Counter()))
+                total = sum(counts.values())
+            else:
+                for payload, weight in _weighted_payloads(queryset):
+                    payload = payload if isinstance(payload, dict) else {}
+                    answer = payload.get('answer')
+                    if answer is None:
+                        continue
+                    total += weight
+                    if str(answer).strip().casefold() != expected_answer:
+                        wrong_counts[str(answer)] += weight
             results = []
             for opt, count in wrong_counts.most_common():
                 percentage = (count / total * 100.0) if total else 0.0
@@ -1204,7 +907,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
         # Poll stats (no "correct", show distribution)
         if t == 'poll':
-            results = self._aggregate_poll(queryset, template_obj)
+            if answer_stats is not None:
+                counts = answer_stats.get(0, (Counter(), Counter()))[0]
+                results = self._poll_results(counts, sum(counts.values()), template_obj)
+            else:
+                results = self._aggregate_poll(_weighted_payloads(queryset), template_obj)
             return Response({
                 'type': 'poll',
                 'template': template_id,
@@ -1220,8 +927,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             per_left = {}
             for i, l in enumerate(left):
                 per_left[l] = {'correct': right[i] if i < len(right) else None, 'counts': Counter(), 'total': 0}
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 pairs = payload.get('pairs') if isinstance(payload, dict) else None
                 if not isinstance(pairs, dict):
                     continue
@@ -1229,9 +936,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     chosen = pairs.get(l)
                     if chosen is None:
                         continue
-                    meta['total'] += 1
+                    meta['total'] += weight
                     if chosen != meta['correct']:
-                        meta['counts'][str(chosen)] += 1
+                        meta['counts'][str(chosen)] += weight
             rows = []
             for l, meta in per_left.items():
                 total = meta['total']
@@ -1260,17 +967,17 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             pos_counts = []
             for i, exp in enumerate(expected):
                 pos_counts.append({'index': i, 'correct': exp, 'counts': Counter(), 'total': 0})
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 order = payload.get('order') if isinstance(payload, dict) else None
                 if not isinstance(order, list):
                     continue
                 for i, meta in enumerate(pos_counts):
                     if i >= len(order):
                         continue
-                    meta['total'] += 1
+                    meta['total'] += weight
                     if order[i] != meta['correct']:
-                        meta['counts'][str(order[i])] += 1
+                        meta['counts'][str(order[i])] += weight
             rows = []
             for meta in pos_counts:
                 total = meta['total']
@@ -1303,8 +1010,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     expected_map[str(item)] = str(title)
             item_stats = {item: Counter() for item in expected_map.keys()}
             item_total = Counter()
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 submitted = payload.get('groups') if isinstance(payload, dict) else None
                 if not isinstance(submitted, dict):
                     continue
@@ -1315,13 +1022,13 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     for item in items:
                         item = str(item)
                         seen.add(item)
-                        item_total[item] += 1
+                        item_total[item] += weight
                         if expected_map.get(item) != str(group_title):
-                            item_stats[item][str(group_title)] += 1
+                            item_stats[item][str(group_title)] += weight
                 for item in expected_map.keys():
                     if item not in seen:
-                        item_total[item] += 1
-                        item_stats[item]['(missing)'] += 1
+                        item_total[item] += weight
+                        item_stats[item]['(missing)'] += weight
             rows = []
             for item, expected_group in expected_map.items():
                 total = item_total[item]
@@ -1355,8 +1062,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     'counts': Counter(),
                     'total': 0,
                 })
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 idx = payload.get('card_index')
                 if idx is None:
                     continue
@@ -1366,9 +1073,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     continue
                 if idx < 0 or idx >= len(rows):
                     continue
-                rows[idx]['total'] += 1
+                rows[idx]['total'] += weight
                 if not payload.get('correct'):
-                    rows[idx]['counts']['(қате)'] += 1
+                    rows[idx]['counts']['(қате)'] += weight
             out = []
             for row in rows:
                 total = row['total']
@@ -1401,8 +1108,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 key = f"{r},{c}"
                 expected[key] = str(cell.get('letter', '')).strip().upper()
             stats = {k: {'expected': v, 'counts': Counter(), 'total': 0} for k, v in expected.items()}
-            for sub in queryset:
-                payload = sub.data if isinstance(sub.data, dict) else {}
+            for payload, weight in _weighted_payloads(queryset):
+                payload = payload if isinstance(payload, dict) else {}
                 submitted_cells = payload.get('cells') if isinstance(payload, dict) else None
                 if not isinstance(submitted_cells, list):
                     continue
@@ -1413,10 +1120,10 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                         continue
                     submitted_map[f"{r},{c}"] = str(cell.get('letter', '')).strip().upper()
                 for key, meta in stats.items():
-                    meta['total'] += 1
+                    meta['total'] += weight
                     given = submitted_map.get(key, "")
                     if given != meta['expected']:
-                        meta['counts'][given if given else '(blank)'] += 1
+                        meta['counts'][given if given else '(blank)'] += weight
             rows = []
             for key, meta in stats.items():
                 total = meta['total']
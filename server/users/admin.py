@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import AdaptiveRule, LearningTrajectoryNode, StudentProfile, User
+from .models import AdaptiveRule, LearningTrajectoryNode, StudentProfile, StudentTopicStat, User
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -27,6 +27,21 @@ class StudentProfileAdmin(admin.ModelAdmin):
     list_filter = ("learning_level",)
 
 
+@admin.register(StudentTopicStat)
+class StudentTopicStatAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "student",
+        "topic",
+        "attempts",
+        "scored_attempts",
+        "score_sum",
+        "total_time_seconds",
+        "updated_at",
+    )
+    search_fields = ("student__username", "topic")
+
+
 @admin.register(LearningTrajectoryNode)
 class LearningTrajectoryNodeAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.21 on 2026-10-17 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_adaptiverule_studentprofile_learningtrajectorynode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='topic_stats_built_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StudentTopicStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=255)),
+                ('attempts', models.IntegerField(default=0)),
+                ('scored_attempts', models.IntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('total_time_seconds', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['student_id', 'topic'],
+                'unique_together': {('student', 'topic')},
+            },
+        ),
+    ]
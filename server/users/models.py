@@ -47,6 +47,11 @@ class StudentProfile(models.Model):
 
     last_recommendation = models.CharField(max_length=255, blank=True, default="")
 
+    # Set once StudentTopicStat rows hold the running aggregates for this student.
+    topic_stats_built_at = models.DateTimeField(null=True, blank=True)
+    # Set when the computed fields are stale; lessons.recompute refreshes them in the background.
+    recompute_requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -57,6 +62,29 @@ class StudentProfile(models.Model):
         return f"Profile<{self.student_id}>"
 
 
+class StudentTopicStat(models.Model):
+    student = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="topic_stats",
+    )
+    topic = models.CharField(max_length=255)
+
+    attempts = models.IntegerField(default=0)
+    scored_attempts = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+    total_time_seconds = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("student", "topic")
+        ordering = ["student_id", "topic"]
+
+    def __str__(self):
+        return f"TopicStat<{self.student_id}:{self.topic}:{self.attempts}>"
+
+
 class LearningTrajectoryNode(models.Model):
     STATUS_CHOICES = (
         ("locked", "Locked"),
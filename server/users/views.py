@@ -13,6 +13,7 @@ from .serializers import (
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import AdaptiveRule, StudentProfile, User
 from lessons.adaptive import recompute_student_profile
+from lessons.recompute import wait_for_recompute
 from lessons.models import Enrollment
 
 
@@ -77,7 +78,7 @@ class StudentProfileDetailView(generics.RetrieveAPIView):
         if not allowed:
             raise PermissionDenied("Student is not in your lessons.")
 
-        recompute_student_profile(student)
+        wait_for_recompute(student)
         profile, _ = StudentProfile.objects.get_or_create(student=student)
         return profile
 